@@ -0,0 +1,133 @@
+"""Cast cadence analysis on synthetic casts events.
+
+Run with `python -m benchmarks.cadence [--rounds N]`. A weaving rotation
+with occasional idle time is generated for fights of growing length, then
+casts are fed page by page and their cadence calculated
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+from loguru import logger
+
+from benchmarks.synthetic import CLASS_SKILLS, MINUTE, START_TIME
+from esoraider_server.analysis.cadence import (
+    GCD,
+    HEAVY_ATTACK,
+    LIGHT_ATTACK,
+    CastCadence,
+)
+from esoraider_server.data.core import Skill
+
+FIGHT_LENGTHS = (5, 15, 30, 60, 120)
+# Max number of events in a page of the API
+PAGE_SIZE = 10000
+LIGHT_ATTACK_ID = 16688
+HEAVY_ATTACK_ID = 16691
+
+
+def _skills() -> List[Skill]:
+    _, skills = CLASS_SKILLS[0]
+    return [skill.value for skill in skills][:12]
+
+
+def synthetic_casts(
+    skills: List[Skill], fight_length: int, seed: int = 0,
+) -> List[Dict]:
+    """Light attack & skill pairs, sometimes a heavy attack or a break."""
+    rng = random.Random(seed)
+    events = []
+    timestamp = START_TIME
+    end_time = START_TIME + fight_length
+    while timestamp < end_time:
+        roll = rng.random()
+        if roll < 0.03:
+            timestamp += rng.randint(GCD, 5 * GCD)
+            continue
+        if roll < 0.08:
+            events.append(_cast(timestamp, HEAVY_ATTACK_ID))
+            timestamp += 2 * GCD
+            continue
+        if roll < 0.9:
+            events.append(_cast(timestamp, LIGHT_ATTACK_ID))
+        events.append(_cast(
+            timestamp + rng.randint(0, 100), rng.choice(skills).id,
+        ))
+        timestamp += GCD + rng.randint(0, 150)
+    return events
+
+
+def _cast(timestamp: int, ability_id: int) -> Dict:
+    return {
+        'timestamp': timestamp,
+        'type': 'cast',
+        'sourceID': 1,
+        'abilityGameID': ability_id,
+    }
+
+
+def _timed(func: Callable, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def measure(fight_length: int, rounds: int) -> Dict:
+    skills = _skills()
+    events = synthetic_casts(skills, fight_length)
+    pages = [
+        events[index:index + PAGE_SIZE]
+        for index in range(0, len(events), PAGE_SIZE)
+    ]
+    abilities = {LIGHT_ATTACK_ID: LIGHT_ATTACK, HEAVY_ATTACK_ID: HEAVY_ATTACK}
+
+    def fed() -> CastCadence:  # noqa: WPS430
+        cadence = CastCadence(
+            skills, abilities, START_TIME, START_TIME + fight_length,
+        )
+        for page in pages:
+            cadence.feed(page)
+        return cadence
+
+    cadence = fed()
+    report = cadence.calculate()
+    return {
+        'casts': len(events),
+        'feedMs': _timed(fed, rounds) * 1000,
+        'calculateMs': _timed(cadence.calculate, rounds) * 1000,
+        'apm': report['apm'],
+        'weaving': report['weaving'],
+    }
+
+
+def main(rounds: int):
+    # Benchmarks shouldn't be dominated by logging
+    logger.remove()
+
+    print('{0:>8} {1:>8} {2:>9} {3:>13} {4:>7} {5:>8}'.format(
+        'minutes', 'casts', 'feed ms', 'calculate ms', 'apm', 'weaving',
+    ))
+    for minutes in FIGHT_LENGTHS:
+        results = measure(minutes * MINUTE, rounds)
+        print(
+            '{0:>8} {1:>8} {2:>9.2f} {3:>13.2f} {4:>7.1f} {5:>8.1f}'.format(
+                minutes,
+                results['casts'],
+                results['feedMs'],
+                results['calculateMs'],
+                results['apm'],
+                results['weaving'],
+            ),
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+    main(args.rounds)
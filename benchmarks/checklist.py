@@ -0,0 +1,159 @@
+"""Checklist building benchmark: rule index against per-rule loops.
+
+Run with `python -m benchmarks.checklist [rounds]`
+"""
+
+import sys
+import time
+from dataclasses import asdict
+from typing import List, Tuple, Type
+
+from esoraider_server.analysis.checklist_builder import ChecklistBuilder
+from esoraider_server.data.classes.dragonknight.passives import (
+    DRAGONKNIGHT_PASSIVES,
+)
+from esoraider_server.data.classes.necromancer.passives import (
+    NECROMANCER_PASSIVES,
+)
+from esoraider_server.data.classes.nightblade.passives import (
+    NIGHTBLADE_PASSIVES,
+)
+from esoraider_server.data.classes.sorcerer.passives import SORCERER_PASSIVES
+from esoraider_server.data.classes.templar.passives import TEMPLAR_PASSIVES
+from esoraider_server.data.classes.warden.passives import WARDEN_PASSIVES
+from esoraider_server.data.passives import Passives
+from esoraider_server.data.races import RacialPassives
+from esoraider_server.data.rules import Rules
+from esoraider_server.esologs.consts import (
+    CharClass,
+    GearSlot,
+    GearType,
+    WeaponType,
+)
+from esoraider_server.esologs.responses.common import Gear
+from esoraider_server.esologs.responses.report_data.effects import Aura
+
+CLASS_PASSIVES = (
+    (CharClass.DRAGONKNIGHT, DRAGONKNIGHT_PASSIVES),
+    (CharClass.NECROMANCER, NECROMANCER_PASSIVES),
+    (CharClass.NIGHTBLADE, NIGHTBLADE_PASSIVES),
+    (CharClass.SORCERER, SORCERER_PASSIVES),
+    (CharClass.TEMPLAR, TEMPLAR_PASSIVES),
+    (CharClass.WARDEN, WARDEN_PASSIVES),
+)
+
+
+class LegacyChecklistBuilder(ChecklistBuilder):
+    """Checklist building as it was before the rule index."""
+
+    def _add_race_rules(self):
+        race_rules = (
+            Rules.ARGONIAN,
+            Rules.BRETON,
+            Rules.DARK_ELF,
+            Rules.HIGH_ELF,
+            Rules.IMPERIAL,
+            Rules.KHAJIIT,
+            Rules.NORD,
+            Rules.ORC,
+            Rules.REDGUARD,
+            Rules.WOOD_ELF,
+        )
+
+        ids = {pas.ability for pas in self._passives}
+        for rule in race_rules:
+            for passive in rule.value.buffs:
+                if passive.id in ids:
+                    self.rule_set.add(rule)
+                    return
+
+    def _finalize(self):
+        ids = {pas.ability or pas.guid for pas in self._passives}
+        checklist = []
+
+        for rules in self.rule_set:
+            buffs = [
+                {
+                    'passive': asdict(buff),
+                    'present': buff.id in ids,
+                }
+                for buff in rules.value.buffs
+            ]
+
+            checklist.append({
+                'name': rules.value.name,
+                'icon': rules.value.icon,
+                'passives': buffs,
+                'status': all(buff['present'] for buff in buffs),
+            })
+
+        self.checklist = checklist
+
+
+def _gear(slot: GearSlot, gear_type) -> Gear:
+    return Gear(
+        id=0,
+        quality=5,
+        icon='',
+        champion_points=160,
+        trait=0,
+        enchant_type=0,
+        enchant_quality=5,
+        set_id=0,
+        slot=slot,
+        type=gear_type,
+    )
+
+
+GEAR = [
+    _gear(slot, GearType.LIGHT_ARMOR)
+    for slot in GearSlot
+    if GearSlot.is_armor(slot)
+] + [
+    _gear(GearSlot.MAIN_HAND, WeaponType.FIRE_STAFF),
+    _gear(GearSlot.MAIN_HAND_BACKUP, WeaponType.LIGHTNING_STAFF),
+]
+
+
+def combatant_infos() -> List[Tuple[CharClass, List[Aura]]]:
+    """Passives of every race and class combination."""
+    infos = []
+    general = [passive.value for passive in Passives]
+    for class_, passives in CLASS_PASSIVES:
+        class_passives = [passive.value for passive in passives]
+        for race in RacialPassives:
+            infos.append((class_, [
+                Aura(name=buff.name, guid=buff.id, ability=buff.id)
+                for buff in (race.value, *class_passives, *general)
+            ]))
+    return infos
+
+
+def measure(
+    builder: Type[ChecklistBuilder],
+    infos: List[Tuple[CharClass, List[Aura]]],
+    rounds: int,
+) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for class_, passives in infos:
+            builder(
+                spec='Magicka',
+                class_=class_,
+                gear=GEAR,
+                passives=passives,
+            ).build()
+    return (time.perf_counter() - started) / (rounds * len(infos))
+
+
+def main(rounds: int = 50):
+    infos = combatant_infos()
+    print('{0} combatant infos'.format(len(infos)))
+    for builder in (LegacyChecklistBuilder, ChecklistBuilder):
+        print('{0:<24} {1:8.1f} us per checklist'.format(
+            builder.__name__, measure(builder, infos, rounds) * 1e6,
+        ))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,278 @@
+"""Event stream uptimes against tables & graphs.
+
+Run with `python -m benchmarks.events [--rounds N]`. Synthetic fights of
+growing length are analyzed both ways, then every fixture recorded with
+events (see `benchmarks.record`) is replayed both ways, comparing the number
+of queries, payload size, time and resulting uptimes
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from benchmarks.replay import FIXTURES_DIR, Fixture, ReplayApi, load_fixture
+from benchmarks.synthetic import (
+    MINUTE,
+    START_TIME,
+    SyntheticLog,
+    catalog_buffs,
+    catalog_debuffs,
+    effects_table,
+    graph,
+)
+from esoraider_server.analysis.data_request import DataRequest
+from esoraider_server.analysis.event_uptimes import EventUptimes
+from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.data.core import Stack
+from esoraider_server.data.stacks import STACKS
+from esoraider_server.esologs.consts import DataType
+from esoraider_server.esologs.responses.report_data.effects import (
+    EffectsTableData,
+)
+from esoraider_server.esologs.responses.report_data.graph import GraphData
+
+FIGHT_LENGTHS = (5, 15, 30, 60)
+# Max number of events in a page of the API
+PAGE_SIZE = 10000
+
+
+class CountingReplayApi(ReplayApi):
+    """Replay API counting queries & size of their answers."""
+
+    def __init__(self, fixture: Fixture) -> None:  # noqa: WPS612
+        super().__init__(fixture)
+        self.queries = 0
+        self.size = 0
+
+    async def execute(self, document, **kwargs):
+        answer = await super().execute(document, **kwargs)
+        self.queries += 1
+        self.size += len(json.dumps(answer))
+        return answer
+
+
+def _event_stacks() -> List[Stack]:
+    return [
+        stack.value
+        for stack in STACKS
+        if not stack.value.buffs
+        and not stack.value.debuffs
+        and not stack.value.modifier
+        and stack.value.type_ in {DataType.BUFFS, DataType.DEBUFFS}
+    ]
+
+
+def synthetic_events(table: Dict, graphs: Dict[int, Dict]) -> List[Dict]:
+    """Events of auras of a table & stacks of graphs, ordered by time."""
+    events = []
+    for aura in table['auras']:
+        for band in aura['bands']:
+            events.append({
+                'timestamp': band['startTime'],
+                'type': 'applybuff',
+                'abilityGameID': aura['guid'],
+                'targetID': 1,
+            })
+            events.append({
+                'timestamp': band['endTime'],
+                'type': 'removebuff',
+                'abilityGameID': aura['guid'],
+                'targetID': 1,
+            })
+    for ability_id, stack_graph in graphs.items():
+        stacks = 0
+        for timestamp, new_stacks in stack_graph['series'][0]['data'][:-1]:
+            if new_stacks == stacks:
+                continue
+            if not stacks:
+                event_type = 'applybuff'
+            elif not new_stacks:
+                event_type = 'removebuff'
+            else:
+                event_type = 'applybuffstack'
+            events.append({
+                'timestamp': timestamp,
+                'type': event_type,
+                'abilityGameID': ability_id,
+                'targetID': 1,
+                'stack': new_stacks,
+            })
+            stacks = new_stacks
+    events.sort(key=lambda event: event['timestamp'])
+    return events
+
+
+def _timed(func, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def compare_synthetic(config: SyntheticLog, rounds: int) -> Dict:
+    """Decoding tables & graphs against a pass over the same events."""
+    graphs = {stack.id: graph(config, stack) for stack in _event_stacks()}
+    # Effects with stacks are told by their graphs alone
+    auras = [
+        (guid, name)
+        for guid, name in (*catalog_buffs(), *catalog_debuffs())
+        if guid not in graphs
+    ]
+    table = effects_table(config, auras, seed=1)
+    events = synthetic_events(table, graphs)
+    pages = [
+        events[index:index + PAGE_SIZE]
+        for index in range(0, len(events), PAGE_SIZE)
+    ]
+    ids = [guid for guid, _ in auras] + list(graphs)
+
+    def from_tables():  # noqa: WPS430
+        EffectsTableData.from_dict(table)
+        for stack_graph in graphs.values():
+            GraphData.from_dict(stack_graph)
+
+    def from_events() -> EventUptimes:  # noqa: WPS430
+        uptimes = EventUptimes(ids, START_TIME, config.end_time)
+        for page in pages:
+            uptimes.feed(page)
+        uptimes.finish()
+        return uptimes
+
+    uptimes = from_events()
+    mismatched = sum(
+        uptimes.timeline(aura['guid']).total_uptime != aura['totalUptime']
+        for aura in table['auras']
+    )
+    return {
+        'events': len(events),
+        'tablesMs': _timed(from_tables, rounds) * 1000,
+        'eventsMs': _timed(from_events, rounds) * 1000,
+        'tablesKiB': len(json.dumps([table, graphs])) / 1024,
+        'eventsKiB': len(json.dumps(pages)) / 1024,
+        'mismatched': mismatched,
+    }
+
+
+async def _execute(
+    fixture: Fixture, from_events: bool,
+) -> Tuple[DataRequest, CountingReplayApi, float]:
+    api = CountingReplayApi(fixture)
+    response = await api.query_char_table(
+        log=fixture.log,
+        fight_id=fixture.fight_id,
+        char_id=fixture.char_id,
+        start_time=fixture.start_time,
+        end_time=fixture.end_time,
+    )
+    builder = ReportBuilder(
+        api=api,
+        log=fixture.log,
+        fight_id=fixture.fight_id,
+        char_id=fixture.char_id,
+        summary_table=response.table.data,
+        start_time=fixture.start_time,
+        end_time=fixture.end_time,
+        encounter_info=response.fights[0],
+    )
+    await builder.prepare()
+    request = DataRequest(
+        api=api,
+        log=fixture.log,
+        fight_id=fixture.fight_id,
+        start_time=fixture.start_time,
+        end_time=fixture.end_time,
+        char_id=fixture.char_id,
+        tracked_info=builder._tracked_info,  # noqa: WPS437
+        from_events=from_events,
+    )
+    api.queries = 0
+    api.size = 0
+
+    started = time.perf_counter()
+    await request.execute_effects()
+    return request, api, time.perf_counter() - started
+
+
+def _uptimes(table: Optional[EffectsTableData]) -> Dict[int, int]:
+    if table is None:
+        return {}
+    return {aura.guid: aura.total_uptime for aura in table.auras}
+
+
+async def compare_recorded(fixture: Fixture) -> Optional[Dict]:
+    """Requests of a recorded fight, from tables & graphs or from events."""
+    tables, tables_api, tables_time = await _execute(fixture, False)
+    try:
+        events, events_api, events_time = await _execute(fixture, True)
+    except KeyError:
+        return None
+
+    mismatched = 0
+    for expected, actual in (
+        (_uptimes(tables.buffs_table), _uptimes(events.buffs_table)),
+        (_uptimes(tables.debuffs_table), _uptimes(events.debuffs_table)),
+    ):
+        mismatched += sum(
+            # API rounds bands to a few milliseconds
+            abs(actual.get(guid, 0) - uptime) > 100
+            for guid, uptime in expected.items()
+        )
+    return {
+        'tablesQueries': tables_api.queries,
+        'eventsQueries': events_api.queries,
+        'tablesKiB': tables_api.size / 1024,
+        'eventsKiB': events_api.size / 1024,
+        'tablesMs': tables_time * 1000,
+        'eventsMs': events_time * 1000,
+        'mismatched': mismatched,
+    }
+
+
+async def main(rounds: int):
+    # Benchmarks shouldn't be dominated by logging
+    logger.remove()
+
+    print('{0:>8} {1:>9} {2:>10} {3:>10} {4:>11} {5:>11} {6:>9}'.format(
+        'minutes', 'events', 'tables ms', 'events ms',
+        'tables KiB', 'events KiB', 'mismatch',
+    ))
+    for minutes in FIGHT_LENGTHS:
+        results = compare_synthetic(
+            replace(SyntheticLog(), fight_length=minutes * MINUTE), rounds,
+        )
+        print(
+            '{0:>8} {1:>9} {2:>10.1f} {3:>10.1f} {4:>11.1f} {5:>11.1f} '
+            '{6:>9}'.format(
+                minutes,
+                results['events'],
+                results['tablesMs'],
+                results['eventsMs'],
+                results['tablesKiB'],
+                results['eventsKiB'],
+                results['mismatched'],
+            ),
+        )
+
+    for path in sorted(FIXTURES_DIR.glob('*.json')):
+        fixture = load_fixture(path)
+        results = await compare_recorded(fixture)
+        if results is None:
+            print('{0}: no events recorded, skipped'.format(fixture.name))
+            continue
+        print(fixture.name)
+        for name, value in results.items():
+            print('  {0:<14} {1:10.1f}'.format(name, value))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds))
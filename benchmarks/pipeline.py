@@ -0,0 +1,202 @@
+"""Per-stage benchmark of the char report pipeline on recorded fixtures.
+
+Run with `python -m benchmarks.pipeline [--rounds N] [--save-baseline]`.
+Every fixture from `benchmarks/fixtures` is replayed offline, stage timings
+are compared against `benchmarks/baseline.json` when it exists
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from benchmarks.replay import FIXTURES_DIR, Fixture, ReplayApi, load_fixture
+from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.analysis.serializer import dump_report
+from esoraider_server.analysis.stacks import Stacks
+from esoraider_server.analysis.tracked_info import TrackedInfo
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+
+STAGES = (
+    'decode',
+    'tracked_info',
+    'data_request',
+    'uptimes',
+    'stacks',
+    'checklist',
+    'report',
+)
+
+
+class StageTimer(object):
+    """Collects time & peak memory of named stages over several rounds."""
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.peaks: Dict[str, int] = {}
+        self.trace_memory = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peaks[name] = peak - before
+        else:
+            self.timings[name].append(elapsed)
+
+
+def _percentile(timings: List[float], percent: int) -> float:
+    ordered = sorted(timings)
+    index = max(0, round(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+async def run_pipeline(fixture: Fixture, timer: StageTimer):
+    """Build a char report once, timing every stage separately."""
+    api = ReplayApi(fixture)
+
+    with timer.stage('decode'):
+        response = await api.query_char_table(
+            log=fixture.log,
+            fight_id=fixture.fight_id,
+            char_id=fixture.char_id,
+            start_time=fixture.start_time,
+            end_time=fixture.end_time,
+        )
+
+    builder = ReportBuilder(
+        api=api,
+        log=fixture.log,
+        fight_id=fixture.fight_id,
+        char_id=fixture.char_id,
+        summary_table=response.table.data,
+        start_time=fixture.start_time,
+        end_time=fixture.end_time,
+        encounter_info=response.fights[0],
+    )
+    await builder.prepare()
+
+    with timer.stage('tracked_info'):
+        TrackedInfo(
+            summary_table=response.table.data,
+            char_class=builder._char_class,  # noqa: WPS437
+            encounter_info=response.fights[0],
+        ).extract()
+
+    with timer.stage('data_request'):
+        await builder.requested_data.execute()
+
+    # Uptimes include stacks, which are timed on their own right after
+    with timer.stage('uptimes'):
+        await builder._calculate_uptimes()  # noqa: WPS437
+
+    with timer.stage('stacks'):
+        Stacks(
+            known_stacks=builder._tracked_info.stacks,  # noqa: WPS437
+            char_graphs=builder._char_graphs,  # noqa: WPS437
+            char_buffs=builder._char_buffs,  # noqa: WPS437
+            char_debuffs=builder._char_debuffs,  # noqa: WPS437
+            total_time=builder.requested_data.total_time,
+        ).calculate()
+
+    with timer.stage('checklist'):
+        builder._build_checklist()  # noqa: WPS437
+
+    with timer.stage('report'):
+        builder._build_report()  # noqa: WPS437
+        dump_report(builder.report)
+
+
+async def benchmark(fixture: Fixture, rounds: int) -> Dict[str, Dict]:
+    timer = StageTimer()
+    for _ in range(rounds):
+        await run_pipeline(fixture, timer)
+
+    # Tracing slows everything down, so memory is measured separately
+    timer.trace_memory = True
+    tracemalloc.start()
+    await run_pipeline(fixture, timer)
+    tracemalloc.stop()
+
+    return {
+        stage: {
+            'p50': _percentile(timer.timings[stage], 50),
+            'p95': _percentile(timer.timings[stage], 95),
+            'peak': timer.peaks[stage],
+        }
+        for stage in STAGES
+    }
+
+
+def _change(current: float, baseline: Optional[float]) -> str:
+    if not baseline:
+        return ''
+    return '{0:+6.1f}%'.format((current - baseline) / baseline * 100)
+
+
+def print_results(name: str, results: Dict, baseline: Dict):
+    print(name)
+    for stage, stats in results.items():
+        base = baseline.get(stage, {})
+        print(
+            '  {0:<14} p50 {1:8.2f} ms {2:>7}  p95 {3:8.2f} ms {4:>7}  '
+            'peak {5:8.1f} KiB {6:>7}'.format(
+                stage,
+                stats['p50'] * 1000,
+                _change(stats['p50'], base.get('p50')),
+                stats['p95'] * 1000,
+                _change(stats['p95'], base.get('p95')),
+                stats['peak'] / 1024,
+                _change(stats['peak'], base.get('peak')),
+            ),
+        )
+
+
+async def main(rounds: int, save_baseline: bool):
+    baseline = {}
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+
+    paths = sorted(FIXTURES_DIR.glob('*.json'))
+    if not paths:
+        print('No fixtures in {0}, record some with benchmarks.record'.format(
+            FIXTURES_DIR,
+        ))
+        return
+
+    # Benchmarks shouldn't be dominated by logging
+    logger.remove()
+
+    results = {}
+    for path in paths:
+        fixture = load_fixture(path)
+        results[fixture.name] = await benchmark(fixture, rounds)
+        print_results(
+            fixture.name, results[fixture.name], baseline.get(fixture.name, {}),
+        )
+
+    if save_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2))
+        print('Baseline saved to {0}'.format(BASELINE_PATH))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.save_baseline))
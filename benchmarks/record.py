@@ -0,0 +1,82 @@
+"""Record API responses of a char report into a benchmark fixture.
+
+Requires API credentials, run with
+`python -m benchmarks.record <name> <log> <fight> <char> [start] [end]`
+"""
+
+import asyncio
+import sys
+from typing import Optional
+
+from loguru import logger
+
+from benchmarks.replay import FIXTURES_DIR, Fixture, Recorder, save_fixture
+from esoraider_server.analysis.data_request import DataRequest
+from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.esologs.api import ApiWrapper
+
+
+async def record(
+    name: str,
+    log: str,
+    fight_id: int,
+    char_id: int,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+):
+    api = ApiWrapper()
+    await api.connect()
+    recorder = Recorder(api)
+    try:
+        response = await api.query_char_table(
+            log=log,
+            fight_id=fight_id,
+            char_id=char_id,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        builder = ReportBuilder(
+            api=api,
+            log=log,
+            fight_id=fight_id,
+            char_id=char_id,
+            summary_table=response.table.data,
+            start_time=start_time,
+            end_time=end_time,
+            encounter_info=response.fights[0],
+        )
+        await builder.build()
+        # Events as well, for `benchmarks.events` to compare both ways
+        await DataRequest(
+            api=api,
+            log=log,
+            fight_id=fight_id,
+            start_time=start_time,
+            end_time=end_time,
+            char_id=char_id,
+            tracked_info=builder._tracked_info,  # noqa: WPS437
+            from_events=True,
+        ).execute_effects()
+    finally:
+        await api.close()
+
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    path = FIXTURES_DIR / '{0}.json'.format(name)
+    save_fixture(path, Fixture(
+        name=name,
+        log=log,
+        fight_id=fight_id,
+        char_id=char_id,
+        start_time=start_time,
+        end_time=end_time,
+        schema=api.ds._schema,  # noqa: WPS437
+        responses=recorder.responses,
+    ))
+    logger.info('Recorded {0} responses into {1}'.format(
+        len(recorder.responses), path,
+    ))
+
+
+if __name__ == '__main__':
+    name, log, *numbers = sys.argv[1:]
+    asyncio.run(record(name, log, *map(int, numbers)))
@@ -0,0 +1,100 @@
+"""Recording & offline replay of raw ESO Logs API responses."""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from gql.dsl import DSLSchema  # type: ignore
+from gql.transport.exceptions import TransportQueryError  # type: ignore
+from graphql import (  # type: ignore
+    DocumentNode,
+    GraphQLSchema,
+    build_client_schema,
+    introspection_from_schema,
+    print_ast,
+)
+
+from esoraider_server.esologs.api import ApiWrapper
+from esoraider_server.esologs.cache import ResponseCache
+from esoraider_server.settings import CACHE_SIZE, NEGATIVE_CACHE_TTL
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+@dataclass
+class Fixture:
+    name: str
+    log: str
+    fight_id: int
+    char_id: int
+    start_time: Optional[int]
+    end_time: Optional[int]
+    schema: GraphQLSchema
+    # Printed query document -> raw response
+    responses: Dict[str, Dict]
+
+
+def load_fixture(path: Path) -> Fixture:
+    with open(path) as fixture_file:
+        raw = json.load(fixture_file)
+
+    return Fixture(
+        name=path.stem,
+        log=raw['log'],
+        fight_id=raw['fightId'],
+        char_id=raw['charId'],
+        start_time=raw.get('startTime'),
+        end_time=raw.get('endTime'),
+        schema=build_client_schema(raw['schema']),
+        responses=raw['responses'],
+    )
+
+
+def save_fixture(path: Path, fixture: Fixture):
+    with open(path, 'w') as fixture_file:
+        json.dump(
+            {
+                'log': fixture.log,
+                'fightId': fixture.fight_id,
+                'charId': fixture.char_id,
+                'startTime': fixture.start_time,
+                'endTime': fixture.end_time,
+                'schema': introspection_from_schema(fixture.schema),
+                'responses': fixture.responses,
+            },
+            fixture_file,
+        )
+
+
+class Recorder(object):
+    """Keeps every successful answer of a connected API wrapper."""
+
+    def __init__(self, api: ApiWrapper) -> None:
+        self._execute = api.execute
+        self.responses: Dict[str, Dict] = {}
+        api.execute = self.execute  # type: ignore
+
+    async def execute(self, document: DocumentNode, **kwargs):
+        answer = await self._execute(document, **kwargs)
+        if not isinstance(answer, TransportQueryError):
+            self.responses[print_ast(document)] = answer
+        return answer
+
+
+class ReplayApi(ApiWrapper):
+    """API wrapper answering from a fixture, without any connection.
+
+    Queries are built with the recorded schema exactly like the real ones,
+    so any query that wasn't recorded fails loudly with a KeyError
+    """
+
+    def __init__(self, fixture: Fixture) -> None:  # noqa: WPS612
+        self._responses = fixture.responses
+        self._missing = ResponseCache(
+            max_size=CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL,
+        )
+        self.ds = DSLSchema(fixture.schema)
+
+    async def execute(self, document: DocumentNode, **kwargs):
+        return self._responses[print_ast(document)]
@@ -0,0 +1,134 @@
+"""Scaling of uptimes & stacks calculation on synthetic logs.
+
+Run with `python -m benchmarks.scaling [--players N]`. Every combination
+of fight length, band density and stack churn is generated and analyzed
+for each player, looking for sizes where calculation time jumps
+"""
+
+import argparse
+import asyncio
+import time
+from dataclasses import replace
+from itertools import product
+from typing import Dict
+
+from loguru import logger
+
+from benchmarks.synthetic import (
+    MINUTE,
+    START_TIME,
+    SyntheticLog,
+    casts_table,
+    catalog_buffs,
+    catalog_debuffs,
+    catalog_skills,
+    effects_table,
+    encounter_info,
+    graph,
+    summary_table,
+)
+from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.analysis.stacks import Stacks
+from esoraider_server.data.stacks import STACKS
+from esoraider_server.esologs.responses.report_data.casts import CastsTableData
+from esoraider_server.esologs.responses.report_data.effects import (
+    EffectsTableData,
+)
+from esoraider_server.esologs.responses.report_data.fight import Fight
+from esoraider_server.esologs.responses.report_data.graph import GraphData
+from esoraider_server.esologs.responses.report_data.summary import (
+    SummaryTableData,
+)
+
+FIGHT_LENGTHS = (5, 15, 30, 60)
+BAND_DENSITIES = (2, 6, 20)
+STACK_CHURNS = (10, 30, 120)
+
+
+async def analyze(config: SyntheticLog) -> Dict[str, float]:
+    """Calculate uptimes of every player, returning total timings."""
+    buffs = EffectsTableData.from_dict(
+        effects_table(config, catalog_buffs(), seed=1),
+    )
+    debuffs = EffectsTableData.from_dict(
+        effects_table(config, catalog_debuffs(), seed=2),
+    )
+    damage_done = CastsTableData.from_dict(
+        casts_table(config, catalog_skills(), seed=3),
+    )
+    graphs = {
+        stack.value.id: GraphData.from_dict(graph(config, stack.value))
+        for stack in STACKS
+    }
+
+    timings = {'uptimes': 0.0, 'stacks': 0.0}
+    for player in range(1, config.players + 1):
+        builder = ReportBuilder(
+            api=None,  # type: ignore
+            log='synthetic',
+            fight_id=1,
+            char_id=player,
+            summary_table=SummaryTableData.from_dict(
+                summary_table(config, player),
+            ),
+            start_time=START_TIME,
+            end_time=config.end_time,
+            encounter_info=Fight.from_dict(encounter_info()),
+        )
+        await builder.prepare()
+
+        # Same way shared raid requests fill in the data
+        requested = builder.requested_data
+        requested.buffs_table = buffs
+        requested.debuffs_table = debuffs
+        requested.damage_done_table = damage_done
+        requested.graphs = graphs
+        requested.total_time = config.fight_length
+
+        started = time.perf_counter()
+        await builder.finish()
+        timings['uptimes'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        Stacks(
+            known_stacks=builder._tracked_info.stacks,  # noqa: WPS437
+            char_graphs=builder._char_graphs,  # noqa: WPS437
+            char_buffs=builder._char_buffs,  # noqa: WPS437
+            char_debuffs=builder._char_debuffs,  # noqa: WPS437
+            total_time=config.fight_length,
+        ).calculate()
+        timings['stacks'] += time.perf_counter() - started
+    return timings
+
+
+async def main(players: int):
+    # Benchmarks shouldn't be dominated by logging
+    logger.remove()
+
+    base = SyntheticLog(players=players)
+    print('{0:>8} {1:>8} {2:>8} {3:>12} {4:>12}'.format(
+        'minutes', 'bands', 'churn', 'uptimes ms', 'stacks ms',
+    ))
+    for minutes, density, churn in product(
+        FIGHT_LENGTHS, BAND_DENSITIES, STACK_CHURNS,
+    ):
+        timings = await analyze(replace(
+            base,
+            fight_length=minutes * MINUTE,
+            band_density=density,
+            stack_churn=churn,
+        ))
+        print('{0:>8} {1:>8} {2:>8} {3:>12.1f} {4:>12.1f}'.format(
+            minutes,
+            density,
+            churn,
+            timings['uptimes'] * 1000,
+            timings['stacks'] * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.players))
@@ -0,0 +1,125 @@
+"""Report serialization benchmark: `dump_report` against `asdict`.
+
+Run with `python -m benchmarks.serialization [players] [rounds]`
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, replace
+from enum import Enum
+from typing import Callable, Dict, List, Tuple
+
+from esoraider_server.analysis.serializer import dump_report
+from esoraider_server.data.classes.dragonknight.skills import (
+    DRAGONKNIGHT_SKILLS,
+)
+from esoraider_server.data.classes.necromancer.skills import NECROMANCER_SKILLS
+from esoraider_server.data.classes.nightblade.skills import NIGHTBLADE_SKILLS
+from esoraider_server.data.classes.sorcerer.skills import SORCERER_SKILLS
+from esoraider_server.data.classes.templar.skills import TEMPLAR_SKILLS
+from esoraider_server.data.classes.warden.skills import WARDEN_SKILLS
+from esoraider_server.data.glyphs import GLYPHS
+from esoraider_server.data.sets import GEAR_SETS
+from esoraider_server.data.stacks import STACKS
+
+CLASS_SKILLS = (
+    DRAGONKNIGHT_SKILLS,
+    NECROMANCER_SKILLS,
+    NIGHTBLADE_SKILLS,
+    SORCERER_SKILLS,
+    TEMPLAR_SKILLS,
+    WARDEN_SKILLS,
+)
+
+
+def _skip_functions(x):
+    return {k: v for (k, v) in x if not callable(v)}
+
+
+def _default(value):
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(value)
+
+
+def char_report(index: int) -> Dict:
+    """Report of a char with every known skill, set, glyph and stack."""
+    skills = CLASS_SKILLS[index % len(CLASS_SKILLS)]
+    return {
+        'char': {'id': index, 'name': 'Player {0}'.format(index)},
+        'skills': [
+            replace(skill.value, uptime=55.5) for skill in skills
+        ],
+        'sets': [
+            replace(gear_set.value, uptime=77.7) for gear_set in GEAR_SETS
+        ],
+        'glyphs': [replace(glyph.value, uptime=33.3) for glyph in GLYPHS],
+        'stacks': [
+            replace(
+                stack.value,
+                uptimes={
+                    stack_count: 10.0
+                    for stack_count in range(1, stack.value.max_stacks + 1)
+                },
+            )
+            for stack in STACKS
+        ],
+    }
+
+
+def with_asdict(reports: List[Dict]) -> bytes:
+    # The way reports were serialized before `dump_report`
+    converted = [
+        {
+            key: [
+                asdict(item, dict_factory=_skip_functions)
+                for item in items
+            ] if isinstance(items, list) else items
+            for key, items in report.items()
+        }
+        for report in reports
+    ]
+    return json.dumps(converted, default=_default).encode()
+
+
+def measure(
+    func: Callable[[List[Dict]], bytes], reports: List[Dict], rounds: int,
+) -> Tuple[float, float, int]:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(reports)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    func(reports)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return timings[len(timings) // 2], timings[-1], peak
+
+
+def main(players: int = 12, rounds: int = 20):
+    reports = [char_report(index) for index in range(players)]
+    assert json.loads(dump_report(reports)) == json.loads(
+        with_asdict(reports),
+    )
+
+    print('{0} reports, {1} bytes'.format(
+        players, len(dump_report(reports)),
+    ))
+    for name, func in (('asdict', with_asdict), ('dump_report', dump_report)):
+        median, worst, peak = measure(func, reports, rounds)
+        print(
+            '{0:<12} median {1:8.2f} ms  max {2:8.2f} ms  '
+            'peak {3:8.1f} KiB'.format(
+                name, median * 1000, worst * 1000, peak / 1024,
+            ),
+        )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,348 @@
+"""Synthetic ESO Logs payloads for scale & stress testing.
+
+Payloads are raw API dicts, exactly as `from_dict` of response dataclasses
+expects them, built from the data catalog so the analysis finds something
+to track. Write a set of them with
+`python -m benchmarks.synthetic <out dir> [--fight-length MS] [...]`
+"""
+
+import argparse
+import json
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Type
+
+from esoraider_server.data.buffs import BUFFS
+from esoraider_server.data.classes.dragonknight.skills import (
+    DRAGONKNIGHT_SKILLS,
+)
+from esoraider_server.data.classes.general import GENERAL_SKILLS
+from esoraider_server.data.classes.necromancer.skills import NECROMANCER_SKILLS
+from esoraider_server.data.classes.nightblade.skills import NIGHTBLADE_SKILLS
+from esoraider_server.data.classes.sorcerer.skills import SORCERER_SKILLS
+from esoraider_server.data.classes.templar.skills import TEMPLAR_SKILLS
+from esoraider_server.data.classes.warden.skills import WARDEN_SKILLS
+from esoraider_server.data.core import EsoEnum, Stack
+from esoraider_server.data.debuffs import DEBUFFS
+from esoraider_server.data.encounters import Encounters
+from esoraider_server.data.glyphs import GLYPHS
+from esoraider_server.data.sets import GEAR_SETS
+from esoraider_server.data.stacks import (
+    BUFFS_WITH_STACKS,
+    DEBUFFS_WITH_STACKS,
+    STACKS,
+)
+from esoraider_server.esologs.consts import CharClass, GearSlot
+
+CLASS_SKILLS = (
+    (CharClass.DRAGONKNIGHT, DRAGONKNIGHT_SKILLS),
+    (CharClass.NECROMANCER, NECROMANCER_SKILLS),
+    (CharClass.NIGHTBLADE, NIGHTBLADE_SKILLS),
+    (CharClass.SORCERER, SORCERER_SKILLS),
+    (CharClass.TEMPLAR, TEMPLAR_SKILLS),
+    (CharClass.WARDEN, WARDEN_SKILLS),
+)
+# Any real log starts somewhere in the middle of a long session
+START_TIME = 1000000
+MINUTE = 60000
+
+
+@dataclass(frozen=True)
+class SyntheticLog:
+    # Fight length in milliseconds
+    fight_length: int = 10 * MINUTE
+    players: int = 12
+    # Average number of bands of every aura per minute
+    band_density: float = 6
+    # Average number of stack changes of every graph per minute
+    stack_churn: float = 30
+    skills_per_player: int = 12
+    sets_per_player: int = 3
+    seed: int = 0
+
+    @property
+    def end_time(self) -> int:
+        return START_TIME + self.fight_length
+
+
+def _ability(name: str, guid: int) -> Dict:
+    return {
+        'name': name,
+        'guid': guid,
+        'type': 1,
+        'abilityIcon': 'icon.png',
+        'flags': 0,
+    }
+
+
+def _gear(rng: random.Random, slot: GearSlot, set_id: int) -> Dict:
+    if GearSlot.is_armor(slot):
+        gear_type = rng.choice((1, 2, 3))
+    else:
+        # Staves on both bars
+        gear_type = rng.choice((12, 13, 15))
+    return {
+        'id': rng.randint(1, 200000),
+        'quality': 5,
+        'icon': 'gear.png',
+        'championPoints': 160,
+        'trait': rng.randint(1, 20),
+        'enchantType': rng.choice(list(GLYPHS)).value.id,
+        'enchantQuality': 5,
+        'setID': set_id,
+        'slot': slot.value,
+        'type': gear_type,
+    }
+
+
+def _combatant_info(
+    config: SyntheticLog, rng: random.Random, player: int,
+) -> Dict:
+    _, class_skills = CLASS_SKILLS[player % len(CLASS_SKILLS)]
+    skills = rng.sample(
+        [*class_skills, *GENERAL_SKILLS],
+        k=min(config.skills_per_player, len(class_skills)),
+    )
+    sets = rng.sample(list(GEAR_SETS), k=config.sets_per_player)
+    slots = [
+        slot
+        for slot in GearSlot
+        if GearSlot.is_armor(slot) or slot in {
+            GearSlot.MAIN_HAND, GearSlot.MAIN_HAND_BACKUP,
+        }
+    ]
+    return {
+        'stats': [],
+        'talents': [
+            _ability(skill.value.name, skill.value.id) for skill in skills
+        ],
+        'gear': [
+            _gear(rng, slot, sets[index % len(sets)].value.id)
+            for index, slot in enumerate(slots)
+        ],
+    }
+
+
+def _player(player: int) -> Dict:
+    class_, _ = CLASS_SKILLS[player % len(CLASS_SKILLS)]
+    return {
+        'name': 'Player {0}'.format(player),
+        'id': player,
+        'guid': player,
+        'type': class_.value,
+    }
+
+
+def summary_table(config: SyntheticLog, player: int) -> Dict:
+    """Summary table of a char, with details of every player."""
+    rng = random.Random(config.seed + player)
+    players = range(1, config.players + 1)
+    details = [
+        {
+            **_player(index),
+            'server': 'Synthetic',
+            'displayName': '@player{0}'.format(index),
+            'anonymous': False,
+            'icon': 'class.png',
+            'combatantInfo': _combatant_info(
+                config, random.Random(config.seed + index), index,
+            ),
+        }
+        for index in players
+    ]
+    return {
+        'totalTime': config.fight_length,
+        'itemLevel': 160.0,
+        'logVersion': 1,
+        'gameVersion': 1,
+        'composition': [
+            {**_player(index), 'specs': [{'spec': 'Magicka', 'role': 'dps'}]}
+            for index in players
+        ],
+        'damageDone': [],
+        'healingDone': [],
+        'damageTaken': [],
+        'deathEvents': [],
+        'combatantInfo': _combatant_info(config, rng, player),
+        'playerDetails': {'dps': details},
+    }
+
+
+def encounter_info() -> Dict:
+    encounter = next(
+        encounter for encounter in Encounters if encounter.value.targets
+    )
+    return {'difficulty': 121, 'encounterID': encounter.value.id}
+
+
+def bands(config: SyntheticLog, rng: random.Random) -> List[Dict]:
+    """Alternating on / off periods with random durations."""
+    cycle = MINUTE / config.band_density
+    share = rng.uniform(0.3, 0.95)
+    generated = []
+    start = START_TIME + int(rng.expovariate(1 / cycle) * (1 - share))
+    while start < config.end_time:
+        duration = int(rng.expovariate(1 / (cycle * share))) + 1
+        end = min(start + duration, config.end_time)
+        generated.append({'startTime': start, 'endTime': end})
+        gap = int(rng.expovariate(1 / (cycle * (1 - share)))) + 1
+        start = end + gap
+    return generated
+
+
+def effects_table(
+    config: SyntheticLog,
+    auras: Iterable[Tuple[int, str]],
+    seed: int = 0,
+) -> Dict:
+    """Buffs / debuffs table with an aura per (id, name)."""
+    rng = random.Random(config.seed + seed)
+    generated = []
+    for guid, name in auras:
+        aura_bands = bands(config, rng)
+        generated.append({
+            'name': name,
+            'guid': guid,
+            'type': 2,
+            'abilityIcon': 'aura.png',
+            'totalUptime': sum(
+                band['endTime'] - band['startTime'] for band in aura_bands
+            ),
+            'totalUses': len(aura_bands),
+            'bands': aura_bands,
+        })
+    return {
+        'auras': generated,
+        'useTargets': False,
+        'totalTime': config.fight_length,
+        'startTime': START_TIME,
+        'endTime': config.end_time,
+    }
+
+
+def casts_table(
+    config: SyntheticLog,
+    abilities: Iterable[Tuple[int, str]],
+    seed: int = 0,
+) -> Dict:
+    """Damage done table with an entry per (id, name)."""
+    rng = random.Random(config.seed + seed)
+    minutes = config.fight_length / MINUTE
+    entries = []
+    for guid, name in abilities:
+        hits = int(rng.uniform(1, 30) * minutes)
+        entries.append({
+            **_ability(name, guid),
+            'total': hits * rng.randint(1000, 50000),
+            'hitCount': hits,
+            'tickCount': int(rng.uniform(0, 60) * minutes),
+            'tickMissCount': 0,
+            'missCount': 0,
+            'multistrikeHitCount': 0,
+            'multistrikeTickCount': 0,
+            'multistrikeMissCount': 0,
+            'multistrikeTickMissCount': 0,
+            'critHitCount': hits // 2,
+            'critTickCount': 0,
+            'sources': [],
+            'targets': [],
+        })
+    return {
+        'entries': entries,
+        'totalTime': config.fight_length,
+        'logVersion': 1,
+        'gameVersion': 1,
+    }
+
+
+def graph(config: SyntheticLog, stack: Stack, seed: int = 0) -> Dict:
+    """Step-like graph of stacks (or resource percent for modifiers)."""
+    rng = random.Random(config.seed + seed + stack.id)
+    max_value = 100 if stack.modifier else stack.max_stacks
+    points = [[START_TIME, 0]]
+    timestamp = START_TIME
+    while True:
+        timestamp += int(rng.expovariate(config.stack_churn / MINUTE)) + 1
+        if timestamp >= config.end_time:
+            break
+        points.append([timestamp, rng.randint(0, max_value)])
+    points.append([config.end_time, points[-1][1]])
+    return {
+        'series': [{
+            'name': stack.name,
+            'id': stack.id,
+            'guid': stack.id,
+            'type': 'Buff',
+            'data': points,
+            'events': [],
+        }],
+        'startTime': START_TIME,
+        'endTime': config.end_time,
+    }
+
+
+def _ids(*enums: Type[EsoEnum]) -> List[Tuple[int, str]]:
+    return list({
+        member.value.id: (member.value.id, member.value.name)
+        for enum in enums
+        for member in enum
+    }.values())
+
+
+def catalog_buffs() -> List[Tuple[int, str]]:
+    return _ids(BUFFS, BUFFS_WITH_STACKS)
+
+
+def catalog_debuffs() -> List[Tuple[int, str]]:
+    return _ids(DEBUFFS, DEBUFFS_WITH_STACKS)
+
+
+def catalog_skills() -> List[Tuple[int, str]]:
+    return _ids(GENERAL_SKILLS, *(skills for _, skills in CLASS_SKILLS))
+
+
+def write_payloads(config: SyntheticLog, out_dir: Path):
+    """Write summary tables of every player and tables of a char.
+
+    Tables have an aura for every known buff & debuff and an entry for
+    every known skill, so any char finds its tracked data in them
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    payloads = {
+        'config': asdict(config),
+        'encounter': encounter_info(),
+        'summaries': [
+            summary_table(config, player)
+            for player in range(1, config.players + 1)
+        ],
+        'buffs': effects_table(config, catalog_buffs(), seed=1),
+        'debuffs': effects_table(config, catalog_debuffs(), seed=2),
+        'damageDone': casts_table(config, catalog_skills(), seed=3),
+        'graphs': {
+            stack.value.id: graph(config, stack.value) for stack in STACKS
+        },
+    }
+    for name, payload in payloads.items():
+        (out_dir / '{0}.json'.format(name)).write_text(json.dumps(payload))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('out_dir', type=Path)
+    parser.add_argument('--fight-length', type=int, default=10 * MINUTE)
+    parser.add_argument('--players', type=int, default=12)
+    parser.add_argument('--band-density', type=float, default=6)
+    parser.add_argument('--stack-churn', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_payloads(
+        SyntheticLog(
+            fight_length=args.fight_length,
+            players=args.players,
+            band_density=args.band_density,
+            stack_churn=args.stack_churn,
+            seed=args.seed,
+        ),
+        args.out_dir,
+    )
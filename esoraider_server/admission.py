@@ -0,0 +1,165 @@
+"""Admission control of expensive report builds."""
+
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+from blacksheep import Request
+
+Waiter = Tuple[str, asyncio.Future]
+
+
+class AdmissionRejectedException(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(
+            'Too many reports are being built, retry in {0}s'.format(
+                retry_after,
+            ),
+        )
+        self.retry_after = retry_after
+
+
+def client_id(request: Request, header: str = '') -> str:
+    """Identify a client by its address or a header set by a proxy."""
+    if header:
+        forwarded = request.get_headers(header.encode())
+        if forwarded:
+            # Anything but the address appended by the trusted proxy
+            # is up to the client, so the last one is taken
+            address = forwarded[-1].decode().split(',')[-1].strip()
+            if address:
+                return address
+    return request.client_ip
+
+
+class AdmissionControl(object):
+    """Limits report builds in flight, globally and per client.
+
+    Builds over a limit wait in a bounded queue, up to a deadline, and are
+    rejected once it's full or the deadline passes. A client can't have
+    more than `max_per_client` builds in flight & as many waiting, and
+    waiters of a client at its limit are skipped, so a single client
+    spamming reports doesn't hold everyone else back
+    """
+
+    def __init__(
+        self,
+        max_active: int,
+        max_per_client: int,
+        max_queued: int,
+        timeout: float,
+    ) -> None:
+        self._max_active = max_active
+        self._max_per_client = max_per_client
+        self._max_queued = max_queued
+        self._timeout = timeout
+
+        self._active: Counter = Counter()
+        self._waiting: Counter = Counter()
+        self._queue: Deque[Waiter] = deque()
+        # Smoothed build duration, to tell clients when to retry
+        self._duration = 1.0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+
+    @asynccontextmanager
+    async def admit(self, client: str) -> AsyncIterator[None]:
+        """Hold a build slot of a client, waiting for one if needed.
+
+        Raises `AdmissionRejectedException` if it can't be had in time
+        """
+        # Waiters are woken up on every release, so none of them could run
+        # now, a client under its limits doesn't have to queue behind them
+        if self._can_run(client):
+            self._take(client)
+        else:
+            await self._wait(client)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._duration += (time.monotonic() - started - self._duration) / 8
+            self._release(client)
+
+    def stats(self) -> Dict:
+        return {
+            'active': sum(self._active.values()),
+            'queued': len(self._queue),
+            'clients': len(self._active),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timedOut': self.timed_out,
+            'maxQueueDepth': self.max_queue_depth,
+        }
+
+    def _can_run(self, client: str) -> bool:
+        return (
+            sum(self._active.values()) < self._max_active
+            and self._active[client] < self._max_per_client
+        )
+
+    def _take(self, client: str):
+        self._active[client] += 1
+        self.admitted += 1
+
+    def _release(self, client: str):
+        self._active[client] -= 1
+        if not self._active[client]:
+            del self._active[client]
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        # First come first served, among clients under their own limit
+        for waiter in list(self._queue):
+            client, future = waiter
+            if self._can_run(client):
+                self._dequeue(waiter)
+                self._take(client)
+                future.set_result(None)
+
+    def _dequeue(self, waiter: Waiter):
+        self._queue.remove(waiter)
+        self._waiting[waiter[0]] -= 1
+        if not self._waiting[waiter[0]]:
+            del self._waiting[waiter[0]]
+
+    def _retry_after(self) -> int:
+        # Time for builds in flight & waiting to be done
+        backlog = (len(self._queue) + 1) / self._max_active
+        return max(1, math.ceil(self._duration * backlog))
+
+    async def _wait(self, client: str):
+        if (
+            len(self._queue) >= self._max_queued
+            or self._waiting[client] >= self._max_per_client
+        ):
+            self.rejected += 1
+            raise AdmissionRejectedException(self._retry_after())
+
+        waiter = (client, asyncio.get_event_loop().create_future())
+        self._queue.append(waiter)
+        self._waiting[client] += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+        future = waiter[1]
+        try:
+            await asyncio.wait((future,), timeout=self._timeout)
+        except asyncio.CancelledError:
+            # Client went away, maybe right after getting a slot
+            if future.done():
+                self._release(client)
+            else:
+                self._dequeue(waiter)
+            raise
+
+        if not future.done():
+            self._dequeue(waiter)
+            self.timed_out += 1
+            raise AdmissionRejectedException(self._retry_after())
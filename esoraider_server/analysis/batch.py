@@ -0,0 +1,75 @@
+"""Specs of char reports requested in a batch."""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class BatchSpecException(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__('Invalid batch, {0}'.format(reason))
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    log: str
+    fight: int
+    char: int
+    start_time: Optional[int] = None
+    end_time: Optional[int] = None
+    target: Optional[Tuple[int, ...]] = None
+
+
+def _optional_int(index: int, spec: Dict, name: str) -> Optional[int]:
+    number = spec.get(name)
+    if number is not None and not isinstance(number, int):
+        raise BatchSpecException('report {0} has non integer {1}'.format(
+            index, name,
+        ))
+    return number
+
+
+def _parse_spec(index: int, spec: Any) -> ReportSpec:
+    if not isinstance(spec, dict):
+        raise BatchSpecException('report {0} is not an object'.format(index))
+    if not isinstance(spec.get('log'), str):
+        raise BatchSpecException('report {0} has no log'.format(index))
+    for required in ('fight', 'char'):
+        if not isinstance(spec.get(required), int):
+            raise BatchSpecException('report {0} has no {1}'.format(
+                index, required,
+            ))
+
+    target = spec.get('target')
+    if isinstance(target, int):
+        target = [target]
+    if target is not None and not (
+        isinstance(target, list)
+        and all(isinstance(target_id, int) for target_id in target)
+    ):
+        raise BatchSpecException(
+            'report {0} has non integer target'.format(index),
+        )
+
+    return ReportSpec(
+        log=spec['log'],
+        fight=spec['fight'],
+        char=spec['char'],
+        start_time=_optional_int(index, spec, 'startTime'),
+        end_time=_optional_int(index, spec, 'endTime'),
+        target=tuple(target) if target else None,
+    )
+
+
+def parse_specs(body: Any, max_size: int) -> List[ReportSpec]:
+    """Parse `{"reports": [{"log", "fight", "char", ...}, ...]}`.
+
+    Window & target are optional, same as for a single char report
+    """
+    specs = body.get('reports') if isinstance(body, dict) else None
+    if not isinstance(specs, list):
+        raise BatchSpecException('expected a list of reports')
+    if len(specs) > max_size:
+        raise BatchSpecException('no more than {0} reports are allowed'.format(
+            max_size,
+        ))
+    return [_parse_spec(index, spec) for index, spec in enumerate(specs)]
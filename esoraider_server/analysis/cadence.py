@@ -0,0 +1,159 @@
+"""Cast cadence analysis from casts events."""
+
+from array import array
+from typing import AsyncIterator, Dict, Iterable, List
+
+import numpy as np
+
+from esoraider_server.data.core import Skill
+
+# Skills share a global cooldown, light & heavy attacks are not on it
+GCD = 1000
+# Time without a single action which is counted as idle
+IDLE_GAP = 2000
+LIGHT_ATTACK = 'Light Attack'
+HEAVY_ATTACK = 'Heavy Attack'
+MINUTE = 60000
+
+
+def _percent(part: float, total: float) -> float:
+    if not total:
+        return float(0)
+    return round(float(part) / total * 100, 2)
+
+
+class CastCadence(object):
+    """Actions per minute, idle gaps, weaving & GCD use of a char.
+
+    Cast events are kept as flat arrays of timestamps & ability ids while
+    pages are coming, everything is calculated over whole arrays at once.
+    Light & heavy attacks are told by their names, every other cast is
+    taken as a skill on the global cooldown
+    """
+
+    def __init__(
+        self,
+        skills: List[Skill],
+        abilities: Dict[int, str],
+        start_time: int,
+        end_time: int,
+    ) -> None:
+        self._skills = skills
+        self._light_attacks = [
+            ability_id
+            for ability_id, name in abilities.items()
+            if name == LIGHT_ATTACK
+        ]
+        self._heavy_attacks = [
+            ability_id
+            for ability_id, name in abilities.items()
+            if name == HEAVY_ATTACK
+        ]
+        self._start_time = start_time
+        self._end_time = end_time
+        self._times = array('q')
+        self._ids = array('q')
+
+    @property
+    def casts(self) -> int:
+        return len(self._times)
+
+    def feed(self, events: Iterable[Dict]):
+        """Keep casts of a page of raw events, channels are counted once."""
+        for event in events:
+            if event.get('type') != 'cast' or event.get('fake'):
+                continue
+            self._times.append(event['timestamp'])
+            self._ids.append(event.get('abilityGameID') or 0)
+
+    async def consume(self, pages: AsyncIterator[List[Dict]]):
+        async for page in pages:
+            self.feed(page)
+
+    def calculate(self) -> Dict:
+        times = np.frombuffer(self._times, dtype=np.int64)
+        ids = np.frombuffer(self._ids, dtype=np.int64)
+        # Pages come in order, but casts of the same millisecond may not
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        ids = ids[order]
+
+        light = np.isin(ids, self._light_attacks)
+        heavy = np.isin(ids, self._heavy_attacks)
+        skill_times = times[~(light | heavy)]
+        total_time = self._end_time - self._start_time
+        minutes = total_time / MINUTE
+
+        return {
+            'totalTime': total_time,
+            'casts': int(times.size),
+            'apm': round(times.size / minutes, 2) if minutes else 0.0,
+            'skills': int(skill_times.size),
+            'lightAttacks': int(light.sum()),
+            'heavyAttacks': int(heavy.sum()),
+            'idle': self._idle(times, total_time),
+            'gcdUtilization': _percent(
+                self._gcd_busy(skill_times), total_time,
+            ),
+            'weaving': _percent(
+                self._weaved(skill_times, times[light]), skill_times.size,
+            ),
+            'reapplication': self._reapplication(times, ids),
+        }
+
+    def _idle(self, times: np.ndarray, total_time: int) -> Dict:
+        # Fight start & end are edges of the first & the last gap
+        gaps = np.diff(np.concatenate((
+            [self._start_time], times, [self._end_time],
+        )))
+        idle = gaps[gaps > IDLE_GAP]
+        return {
+            'gaps': int(idle.size),
+            'time': int(idle.sum()),
+            'longest': int(idle.max()) if idle.size else 0,
+            'percent': _percent(idle.sum(), total_time),
+        }
+
+    def _gcd_busy(self, skill_times: np.ndarray) -> int:
+        # Every skill holds the GCD until it's over or the next skill is cast
+        if not skill_times.size:
+            return 0
+        held = np.diff(np.append(skill_times, self._end_time))
+        return int(np.minimum(held, GCD).sum())
+
+    def _weaved(
+        self, skill_times: np.ndarray, light_times: np.ndarray,
+    ) -> int:
+        # Skill is weaved when a light attack is cast since the last skill,
+        # up to the same millisecond as the skill itself
+        previous = np.concatenate((
+            [self._start_time - 1], skill_times[:-1],
+        ))
+        light_attacks = (
+            np.searchsorted(light_times, skill_times, side='right')
+            - np.searchsorted(light_times, previous, side='right')
+        )
+        return int(np.count_nonzero(light_attacks))
+
+    def _reapplication(self, times: np.ndarray, ids: np.ndarray) -> List[Dict]:
+        reapplication = []
+        for skill in self._skills:
+            casts = times[ids == skill.id]
+            if not casts.size:
+                continue
+
+            # Drift is how far recasts stray from the usual recast interval
+            intervals = np.diff(casts)
+            if intervals.size:
+                interval = float(np.median(intervals))
+                drift = float(np.abs(intervals - interval).mean())
+            else:
+                interval, drift = 0.0, 0.0
+            reapplication.append({
+                'id': skill.id,
+                'name': skill.name,
+                'casts': int(casts.size),
+                'interval': round(interval, 2),
+                'drift': round(drift, 2),
+            })
+        return reapplication
@@ -0,0 +1,153 @@
+"""Character performance history across fights of a log."""
+
+import asyncio
+from typing import Dict, List, Optional, Union
+
+from loguru import logger
+
+from esoraider_server.analysis.executor import AnalysisExecutor
+from esoraider_server.analysis.percentiles import PercentileIndex
+from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.analysis.timings import Timings
+from esoraider_server.analysis.tracked_info import (
+    NothingToTrackException,
+    SkillsNotFoundException,
+)
+from esoraider_server.data.core import GearSet, Skill
+from esoraider_server.data.registry import CATALOGS, Catalog
+from esoraider_server.esologs.api import ApiWrapper
+
+
+def _compact_uptimes(items: List[Union[GearSet, Skill]]) -> List[Dict]:
+    return [
+        {'id': item.id, 'name': item.name, 'uptime': item.uptime}
+        for item in items
+    ]
+
+
+class CharHistory(object):
+    """Builds compact reports of a char for every boss fight of a log.
+
+    Fights are analyzed concurrently, but no more than `concurrency`
+    at a time, so a long night of progression doesn't flood the API
+    """
+
+    def __init__(
+        self,
+        api: ApiWrapper,
+        log: str,
+        char_id: int,
+        fights: List[Dict],
+        concurrency: int,
+        executor: Optional[AnalysisExecutor] = None,
+        timings: Optional[Timings] = None,
+        catalog: Optional[Catalog] = None,
+        percentiles: Optional[PercentileIndex] = None,
+    ) -> None:
+        self._api = api
+        self._executor = executor
+        self._percentiles = percentiles
+        # Shared by every fight, so their stages are summed up
+        self.timings = timings or Timings()
+        self._catalog = catalog or CATALOGS.current
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        self.log = log
+        self.char_id = char_id
+        self._fights = fights
+
+        self.history: Dict = {}
+
+    async def build(self) -> Dict:
+        """Build reports of every boss fight the char took part in."""
+        fights = [
+            fight
+            for fight in self._fights
+            if fight.get('encounterID')
+            and self.char_id in (fight.get('friendlyPlayers') or [])
+        ]
+        logger.info('Building history of {0} fights'.format(len(fights)))
+
+        reports = await asyncio.gather(*(
+            self._build_fight(fight) for fight in fights
+        ))
+
+        char = next(
+            (report['char'] for report in reports if report.get('char')),
+            {'id': self.char_id},
+        )
+        self.history = {
+            'char': char,
+            'fights': [report['fight'] for report in reports],
+        }
+        return self.history
+
+    async def _build_fight(self, fight: Dict) -> Dict:
+        async with self._semaphore:
+            report = await self._build_report(fight)
+
+        summary = {
+            'id': fight.get('id'),
+            'name': fight.get('name'),
+            'encounterID': fight.get('encounterID'),
+            'difficulty': fight.get('difficulty'),
+            'kill': fight.get('kill'),
+            'fightPercentage': fight.get('fightPercentage'),
+            'startTime': fight.get('startTime'),
+            'endTime': fight.get('endTime'),
+        }
+        if 'error' in report:
+            return {'fight': {**summary, 'error': report['error']}}
+
+        return {
+            'char': report['char'],
+            'fight': {
+                **summary,
+                'skills': _compact_uptimes(report['skills']),
+                'sets': _compact_uptimes(report['sets']),
+                'stacks': [
+                    {
+                        'id': stack.id,
+                        'name': stack.name,
+                        'uptimes': stack.uptimes,
+                    }
+                    for stack in report['stacks']
+                ],
+            },
+        }
+
+    async def _build_report(self, fight: Dict) -> Dict:
+        logger.info('Building history report of fight {0}'.format(
+            fight.get('id'),
+        ))
+        # Fight boundaries are already known from the log
+        start_time: Optional[int] = fight.get('startTime')
+        end_time: Optional[int] = fight.get('endTime')
+
+        response = await self._api.query_char_table(
+            log=self.log,
+            fight_id=fight.get('id'),
+            char_id=self.char_id,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        report = ReportBuilder(
+            api=self._api,
+            log=self.log,
+            fight_id=fight.get('id'),
+            char_id=self.char_id,
+            summary_table=response.table.data,
+            start_time=start_time,
+            end_time=end_time,
+            encounter_info=response.fights[0],
+            executor=self._executor,
+            timings=self.timings,
+            catalog=self._catalog,
+            # Whole fights only, so they are indexed as well
+            percentiles=self._percentiles,
+        )
+
+        try:
+            return await report.build()
+        except (SkillsNotFoundException, NothingToTrackException) as ex:
+            return {'error': str(ex)}
@@ -1,9 +1,12 @@
 """Checklist building."""
 
-from dataclasses import asdict
-from typing import List, Set
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Set, Tuple, Type
 
-from esoraider_server.data.rules import Rules
+from esoraider_server.data.core import Buff, EsoEnum
+from esoraider_server.data.registry import CATALOGS, Catalog
 from esoraider_server.esologs.consts import (
     CharClass,
     GearSlot,
@@ -14,6 +17,47 @@ from esoraider_server.esologs.consts import (
 from esoraider_server.esologs.responses.common import Gear
 from esoraider_server.esologs.responses.report_data.effects import Aura
 
+RACE_RULES = frozenset((
+    'ARGONIAN',
+    'BRETON',
+    'DARK_ELF',
+    'HIGH_ELF',
+    'IMPERIAL',
+    'KHAJIIT',
+    'NORD',
+    'ORC',
+    'REDGUARD',
+    'WOOD_ELF',
+))
+
+
+# Rules are compiled once per catalog version, so building a checklist
+# is a lookup per passive
+@lru_cache(maxsize=2)
+def rules_by_passive(
+    rules: Type[EsoEnum],
+) -> Mapping[int, Tuple[EsoEnum, ...]]:
+    """Passive id -> every rule requiring it."""
+    by_passive: Dict[int, List[EsoEnum]] = defaultdict(list)
+    for rule in rules:
+        for passive in rule.value.buffs or []:
+            by_passive[passive.id].append(rule)
+    return MappingProxyType({
+        passive_id: tuple(passive_rules)
+        for passive_id, passive_rules in by_passive.items()
+    })
+
+
+@lru_cache(maxsize=2)
+def checklist_templates(
+    rules: Type[EsoEnum],
+) -> Mapping[EsoEnum, Tuple[str, str, Tuple[Buff, ...]]]:
+    """Rule -> its name, icon & required passives."""
+    return MappingProxyType({
+        rule: (rule.value.name, rule.value.icon, tuple(rule.value.buffs or []))
+        for rule in rules
+    })
+
 
 class ChecklistBuilder(object):
     def __init__(
@@ -22,7 +66,9 @@ class ChecklistBuilder(object):
         class_: CharClass,
         gear: List[Gear],
         passives: List[Aura],
+        catalog: Optional[Catalog] = None,
     ) -> None:
+        self._rules = (catalog or CATALOGS.current).rules
         self._spec = spec
         self._class = class_
         self._gear = gear
@@ -32,7 +78,7 @@ class ChecklistBuilder(object):
         self._front_bar: List[Gear] = []
         self._back_bar: List[Gear] = []
 
-        self.rule_set: Set[Rules] = set()
+        self.rule_set: Set[EsoEnum] = set()
         self.checklist = None
 
     def build(self):
@@ -57,37 +103,24 @@ class ChecklistBuilder(object):
 
     def _add_universal_rules(self):
         rules = (
-            Rules.UNDAUNTED,
+            self._rules.UNDAUNTED,
         )
         for rule in rules:
             self.rule_set.add(rule)
 
     def _add_race_rules(self):
-        race_rules = (
-            Rules.ARGONIAN,
-            Rules.BRETON,
-            Rules.DARK_ELF,
-            Rules.HIGH_ELF,
-            Rules.IMPERIAL,
-            Rules.KHAJIIT,
-            Rules.NORD,
-            Rules.ORC,
-            Rules.REDGUARD,
-            Rules.WOOD_ELF,
-        )
-
-        ids = {pas.ability for pas in self._passives}
-        for rule in race_rules:
-            for passive in rule.value.buffs:
-                if passive.id in ids:
+        by_passive = rules_by_passive(self._rules)
+        for pas in self._passives:
+            for rule in by_passive.get(pas.ability, ()):
+                if rule.name in RACE_RULES:
                     self.rule_set.add(rule)
                     return
 
     def _add_armor_rules(self):
         armor_rules = {
-            GearType.LIGHT_ARMOR: Rules.LIGHT_ARMOR,
-            GearType.MEDIUM_ARMOR: Rules.MEDIUM_ARMOR,
-            # GearType.HEAVY_ARMOR: Rules.HEAVY_ARMOR,
+            GearType.LIGHT_ARMOR: self._rules.LIGHT_ARMOR,
+            GearType.MEDIUM_ARMOR: self._rules.MEDIUM_ARMOR,
+            # GearType.HEAVY_ARMOR: self._rules.HEAVY_ARMOR,
         }
         for armor in self._armor:
             rule = armor_rules.get(armor.type, None)
@@ -96,12 +129,12 @@ class ChecklistBuilder(object):
 
     def _add_weapon_rules(self):
         weapon_rules = {
-            WieldType.BOW: Rules.BOW,
-            WieldType.DESTRUCTION_STAFF: Rules.DESTRUCTION_STAFF,
+            WieldType.BOW: self._rules.BOW,
+            WieldType.DESTRUCTION_STAFF: self._rules.DESTRUCTION_STAFF,
             # WieldType.DUAL_WIELD: None,
             # WieldType.ONE_HAND_AND_SHIELD: None,
             # WieldType.RESTORATION_STAFF: None,
-            WieldType.TWO_HANDED: Rules.TWO_HANDED,
+            WieldType.TWO_HANDED: self._rules.TWO_HANDED,
         }
 
         bars = (
@@ -116,12 +149,12 @@ class ChecklistBuilder(object):
 
     def _add_class_rules(self):
         class_rules = {
-            CharClass.DRAGONKNIGHT: Rules.DRAGONKNIGHT,
-            CharClass.NECROMANCER: Rules.NECROMANCER,
-            CharClass.NIGHTBLADE: Rules.NIGHTBLADE,
-            CharClass.SORCERER: Rules.SORCERER,
-            CharClass.TEMPLAR: Rules.TEMPLAR,
-            CharClass.WARDEN: Rules.WARDEN,
+            CharClass.DRAGONKNIGHT: self._rules.DRAGONKNIGHT,
+            CharClass.NECROMANCER: self._rules.NECROMANCER,
+            CharClass.NIGHTBLADE: self._rules.NIGHTBLADE,
+            CharClass.SORCERER: self._rules.SORCERER,
+            CharClass.TEMPLAR: self._rules.TEMPLAR,
+            CharClass.WARDEN: self._rules.WARDEN,
         }
         rule = class_rules.get(self._class, None)
         if rule:
@@ -131,18 +164,20 @@ class ChecklistBuilder(object):
         ids = {pas.ability or pas.guid for pas in self._passives}
         checklist = []
 
+        templates = checklist_templates(self._rules)
         for rules in self.rule_set:
+            name, icon, passives = templates[rules]
             buffs = [
                 {
-                    'passive': asdict(buff),
+                    'passive': buff,
                     'present': buff.id in ids,
                 }
-                for buff in rules.value.buffs
+                for buff in passives
             ]
 
             checklist.append({
-                'name': rules.value.name,
-                'icon': rules.value.icon,
+                'name': name,
+                'icon': icon,
                 'passives': buffs,
                 'status': all(buff['present'] for buff in buffs),
             })
@@ -1,22 +1,55 @@
 """Data request from ESO Logs API."""
 
 import asyncio
-from typing import Dict, List, Optional, Sequence, Tuple
+from copy import copy
+from typing import (
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from gql.dsl import DSLField  # type: ignore
 from loguru import logger
 
+from esoraider_server.analysis.cadence import CastCadence
+from esoraider_server.analysis.event_uptimes import EventUptimes
+from esoraider_server.analysis.timings import Timings
 from esoraider_server.analysis.tracked_info import TrackedInfo
-from esoraider_server.data.core import Stack
-from esoraider_server.data.passives import Passives
+from esoraider_server.analysis.window import (
+    clip_effects_table,
+    clip_graphs,
+)
+from esoraider_server.data.core import Stack, Target
 from esoraider_server.esologs.api import ApiWrapper
-from esoraider_server.esologs.consts import HostilityType
+from esoraider_server.esologs.consts import DataType, HostilityType
 from esoraider_server.esologs.responses.report_data.casts import CastsTableData
 from esoraider_server.esologs.responses.report_data.effects import (
     Aura,
     EffectsTableData,
 )
-from esoraider_server.esologs.responses.report_data.graph import GraphData
+from esoraider_server.esologs.responses.report_data.graph import (
+    Event,
+    GraphData,
+)
+from esoraider_server.settings import UPTIMES_FROM_EVENTS
+
+# Names of passives not included in combatant info from events,
+# looked up in the catalog of a report so reloads are picked up
+# TODO: Add a special flag to buff dataclass?
+WEAPON_PASSIVES = (
+    'TRI_FOCUS',
+    'PENETRATING_MAGIC',
+    'ANCIENT_KNOWLEDGE',
+    'DESTRUCTION_EXPERT',
+    'FORCEFUL',
+    'FOLLOW_UP',
+    'HAWK_EYE',
+)
 
 
 class DataRequest(object):
@@ -32,15 +65,33 @@ class DataRequest(object):
         tracked_info: TrackedInfo,
         char_id: Optional[int] = None,
         target: Optional[Tuple[int]] = None,
+        window: Optional[Tuple[int, int]] = None,
+        targets: Optional[List[Target]] = None,
+        timings: Optional[Timings] = None,
+        from_events: Optional[bool] = None,
     ) -> None:
         self._api = api
+        self.timings = timings or Timings()
+        # Buffs, debuffs & their stacks are taken from events
+        # instead of tables & graphs
+        self._from_events = (
+            UPTIMES_FROM_EVENTS if from_events is None else from_events
+        )
 
         self._log = log
         self._fight_id = fight_id
-        self._start_time = start_time
-        self._end_time = end_time
+        # Fight boundaries are used instead when sliced locally
+        self._start_time = None if window else start_time
+        self._end_time = None if window else end_time
         self._char_id = char_id
         self._target = target
+        # With a window set, data is requested for the whole fight and then
+        # sliced locally, so any other window of the same fight is served
+        # from cached responses
+        self._window = window
+        # Debuffs & damage done of every target are requested at once,
+        # so switching between targets doesn't require new requests
+        self._targets = targets or []
 
         self._tracked_info = tracked_info
 
@@ -50,21 +101,244 @@ class DataRequest(object):
         self.damage_done_table: Optional[CastsTableData] = None
         self.graphs: Dict[int, GraphData] = {}
         self.passives: List[Aura] = []
+        self.target_debuffs_tables: Dict[Tuple[int], EffectsTableData] = {}
+        self.target_damage_done_tables: Dict[Tuple[int], CastsTableData] = {}
+        self.cadence: Optional[CastCadence] = None
+
+    def __getstate__(self) -> Dict:
+        # API wrapper holds a connection and never leaves the main process
+        state = self.__dict__.copy()
+        state['_api'] = None
+        return state
 
     async def execute(self):
         """Query generation and execution."""
-        buffs = asyncio.create_task(self._request_buffs())
-        debuffs = asyncio.create_task(self._request_debuffs())
-        damage_done = asyncio.create_task(self._request_damage_done())
-        graphs = asyncio.create_task(self._request_graphs())
-        passives = asyncio.create_task(self._request_passives())
-        await asyncio.gather(buffs, debuffs, damage_done, graphs, passives)
+        await self.prepare()
+        await asyncio.gather(self.execute_effects(), self.execute_passives())
+
+    async def prepare(self):
+        """Resolve fight boundaries when fight data is sliced locally."""
+        if not self._window or self._start_time is not None:
+            return
+        self._start_time, self._end_time = await self._api.get_fight_times(
+            self._log, self._fight_id,
+        )
+
+    async def execute_effects(self):
+        """Request data required for uptimes calculation."""
+        await asyncio.gather(self.execute_tables(), self.execute_graphs())
+
+    async def execute_tables(self):
+        """Request effects & casts tables, everything but graphs of stacks.
+
+        Graphs of stacks taken from events come along with their tables
+        """
+        if self._from_events:
+            effects = (
+                self._timed('request_buffs', self._stream_effects(
+                    DataType.BUFFS,
+                )),
+                self._timed('request_debuffs', self._stream_effects(
+                    DataType.DEBUFFS,
+                )),
+            )
+        else:
+            effects = (
+                self._timed('request_buffs', self._request_buffs()),
+                self._timed('request_debuffs', self._request_debuffs()),
+            )
+        await asyncio.gather(
+            *effects,
+            self._timed('request_damage_done', self._request_damage_done()),
+            self._timed('request_targets', self._request_targets()),
+        )
+
+        if self._window:
+            self._clip()
+
         self.total_time = (
             self.buffs_table.total_time
             or self.debuffs_table.total_time
             or self.damage_done_table.total_time
         )
 
+    async def execute_graphs(self):
+        """Request graphs of stacks which are not taken from events."""
+        await self._timed('request_graphs', self._request_graphs())
+
+    async def execute_passives(self):
+        """Request data required for checklist building."""
+        await self._timed('request_passives', self._request_passives())
+
+    async def execute_casts(self):
+        """Request casts events required for cadence analysis."""
+        await self._timed('request_casts', self._stream_casts())
+
+    def _timed(self, stage: str, request: Awaitable[None]) -> asyncio.Task:
+        return asyncio.create_task(
+            self.timings.measure_async(stage, request),
+        )
+
+    def _clip_window(self) -> Tuple[int, int]:
+        return (
+            max(self._window[0], self._start_time),
+            min(self._window[1], self._end_time),
+        )
+
+    def _clip(self):
+        start_time, end_time = self._clip_window()
+        logger.info('Slicing fight data to {0} - {1}'.format(
+            start_time, end_time,
+        ))
+
+        self.buffs_table = clip_effects_table(
+            self.buffs_table, start_time, end_time,
+        )
+        self.debuffs_table = clip_effects_table(
+            self.debuffs_table, start_time, end_time,
+        )
+        self.target_debuffs_tables = {
+            target: clip_effects_table(table, start_time, end_time)
+            for target, table in self.target_debuffs_tables.items()
+        }
+
+    def for_target(self, target: Tuple[int]) -> Optional['DataRequest']:
+        """Get a copy of requested data limited to a single target.
+
+        Nothing is returned for a target without tables of its own
+        """
+        if (
+            target not in self.target_debuffs_tables
+            and target not in self.target_damage_done_tables
+        ):
+            return None
+
+        target_data = copy(self)
+        target_data.debuffs_table = self.target_debuffs_tables.get(target)
+        target_data.damage_done_table = self.target_damage_done_tables.get(
+            target,
+        )
+        return target_data
+
+    async def partial_tables(self, key: str) -> Dict[str, DSLField]:
+        """Build aliased table requests to be executed as a part of a bigger
+        request, i.e. one request for a whole raid.
+
+        Every table alias is prefixed with its data type and contains the key
+        """
+        tables: Dict[str, DSLField] = {}
+        if self._tracked_info.buffs:
+            tables.update(await self._api.partial_query_table(
+                key=key,
+                data_type='Buffs',
+                start_time=self._start_time,
+                end_time=self._end_time,
+                source_id=self._char_id,
+                filter_exp=self._generate_filter(
+                    {bf.id for bf in self._tracked_info.buffs},
+                ),
+            ))
+        if self._tracked_info.debuffs:
+            tables.update(await self._api.partial_query_table(
+                key=key,
+                data_type='Debuffs',
+                start_time=self._start_time,
+                end_time=self._end_time,
+                hostility_type='Enemies',
+                target_id=self._char_id,
+                filter_exp=self._generate_filter(
+                    {db.id for db in self._tracked_info.debuffs},
+                    self._target,
+                ),
+            ))
+        if self._tracked_info.skills:
+            tables.update(await self._api.partial_query_table(
+                key=key,
+                data_type='DamageDone',
+                start_time=self._start_time,
+                end_time=self._end_time,
+                source_id=self._char_id,
+                filter_exp=self._generate_filter(
+                    self._skill_ids(), self._target,
+                ),
+            ))
+            tables.update(await self._api.partial_query_table(
+                key='passives{0}'.format(key),
+                data_type='Buffs',
+                start_time=self._start_time,
+                end_time=self._end_time,
+                source_id=self._char_id,
+                filter_exp=self._generate_filter(self._weapon_passive_ids()),
+            ))
+        return tables
+
+    async def partial_graphs(self, key: str) -> Dict[str, DSLField]:
+        """Build aliased graph requests, aliases are suffixed with the key."""
+        simple_stacks = self._simple_stacks()
+        if not simple_stacks:
+            return {}
+
+        return {
+            '{0}_{1}'.format(alias, key): graph
+            for alias, graph in (
+                await self._partial_graphs(simple_stacks)
+            ).items()
+        }
+
+    def fill(
+        self,
+        key: str,
+        tables: Dict[str, Union[CastsTableData, EffectsTableData]],
+        graphs: Dict[int, GraphData],
+        events: List[Event],
+    ):
+        """Use data requested elsewhere, so it won't be requested again."""
+        self.buffs_table = tables.get('Buffs_{0}'.format(key))
+        self.debuffs_table = tables.get('Debuffs_{0}'.format(key))
+        self.damage_done_table = tables.get('DamageDone_{0}'.format(key))
+        self.graphs = graphs
+
+        passives = tables.get('Buffs_passives{0}'.format(key))
+        self.passives = [
+            aura
+            for event in events
+            if event.source_id == self._char_id
+            for aura in event.auras
+        ]
+        if passives:
+            self.passives.extend(passives.auras)
+
+    def _skill_ids(self) -> Set[int]:
+        ids = set()
+        for skill in self._tracked_info.skills:
+            ids.add(skill.id)
+            if skill.children:
+                for child in skill.children:
+                    ids.add(child.id)
+        return ids
+
+    def _weapon_passive_ids(self) -> List[int]:
+        passives = self._tracked_info.catalog.passives
+        return [passives[name].value.id for name in WEAPON_PASSIVES]
+
+    def _simple_stacks(self) -> List[Stack]:
+        return [
+            # Excluding 'complex' stacks which rely on buffs / debuffs
+            stack
+            for stack in self._tracked_info.stacks
+            if not stack.buffs and not stack.debuffs
+        ]
+
+    def _event_stacks(self, data_type: DataType) -> List[Stack]:
+        if not self._from_events:
+            return []
+        return [
+            # Events tell stacks as they are, not values to be modified
+            stack
+            for stack in self._simple_stacks()
+            if stack.type_ == data_type and not stack.modifier
+        ]
+
     def _generate_filter(
         self, ability_ids: Sequence[int], targets: Optional[Tuple[int]] = None,
     ):
@@ -125,20 +399,20 @@ class DataRequest(object):
             logger.info('Skipping Damage Done table request')
             return
 
-        ids = set()
-        for skill in self._tracked_info.skills:
-            ids.add(skill.id)
-            if skill.children:
-                for child in skill.children:
-                    ids.add(child.id)
+        ids = self._skill_ids()
+
+        # Casts are aggregated by the API and can't be sliced locally
+        start_time, end_time = self._window or (
+            self._start_time, self._end_time,
+        )
 
         logger.info('Requesting DamageDone table from API')
         self.damage_done_table = await self._api.query_table(
             log=self._log,
             fight_id=self._fight_id,
             data_type='DamageDone',
-            start_time=self._start_time,
-            end_time=self._end_time,
+            start_time=start_time,
+            end_time=end_time,
             source_id=self._char_id,
             filter_exp=self._generate_filter(ids, self._target),
         )
@@ -149,30 +423,99 @@ class DataRequest(object):
         for cast in self.damage_done_table.entries:
             logger.debug('{0} - {1}'.format(cast.name, cast.guid))
 
+    async def _request_targets(self):
+        if not self._targets or self.target_debuffs_tables:
+            logger.info('Skipping per target tables request')
+            return
+
+        debuff_ids = {db.id for db in self._tracked_info.debuffs}
+        skill_ids = self._skill_ids()
+
+        start_time, end_time = self._start_time, self._end_time
+        if (start_time is None) and (end_time is None):
+            start_time, end_time = await self._api.get_fight_times(
+                self._log, self._fight_id,
+            )
+        # Casts are aggregated by the API and can't be sliced locally
+        damage_start_time, damage_end_time = self._window or (
+            start_time, end_time,
+        )
+
+        tables = {}
+        for index, target in enumerate(self._targets):
+            if debuff_ids:
+                tables.update(await self._api.partial_query_table(
+                    key=str(index),
+                    data_type='Debuffs',
+                    start_time=start_time,
+                    end_time=end_time,
+                    hostility_type='Enemies',
+                    target_id=self._char_id,
+                    filter_exp=self._generate_filter(debuff_ids, target.id),
+                ))
+            if skill_ids:
+                tables.update(await self._api.partial_query_table(
+                    key=str(index),
+                    data_type='DamageDone',
+                    start_time=damage_start_time,
+                    end_time=damage_end_time,
+                    source_id=self._char_id,
+                    filter_exp=self._generate_filter(skill_ids, target.id),
+                ))
+        if not tables:
+            return
+
+        logger.info('Requesting tables of {0} targets from API'.format(
+            len(self._targets),
+        ))
+        response = await self._api.query_tables(log=self._log, tables=tables)
+
+        for alias, table in response.items():
+            data_type, index = alias.split('_')
+            target = self._targets[int(index)]
+            if data_type == 'Debuffs':
+                self.target_debuffs_tables[target.id] = table
+            else:
+                self.target_damage_done_tables[target.id] = table
+
+        logger.info('Got tables for {0} targets'.format(len(self._targets)))
+
     async def _request_graphs(self):
         if not self._tracked_info.stacks or self.graphs:
             logger.info('Skipping Graphs request')
             return
 
+        from_events = {
+            stack.id
+            for data_type in (DataType.BUFFS, DataType.DEBUFFS)
+            for stack in self._event_stacks(data_type)
+        }
         simple_stacks = [
-            # Excluding 'complex' stacks which rely on buffs / debuffs
             stack
-            for stack in self._tracked_info.stacks
-            if not stack.buffs and not stack.debuffs
+            for stack in self._simple_stacks()
+            if stack.id not in from_events
         ]
         if not simple_stacks:
             return
 
-        self.graphs = await self._api.query_graph(
+        # Graphs of stacks taken from events are added along the way
+        self._add_graphs(await self._api.query_graph(
             log=self._log,
             char_id=self._char_id,
             start_time=self._start_time,
             end_time=self._end_time,
             graphs=await self._partial_graphs(simple_stacks),
-        )
+        ))
 
         logger.info('Got {0} graphs'.format(len(self.graphs)))
 
+    def _add_graphs(self, graphs: Dict[int, GraphData]):
+        # Tables & graphs come separately, so graphs are sliced on arrival
+        if self._window:
+            start_time, end_time = self._clip_window()
+            graphs = clip_graphs(graphs, start_time, end_time)
+        self.graphs.update(graphs)
+
     async def _partial_graphs(
         self, stacks: List[Stack],
     ) -> Dict[str, DSLField]:
@@ -191,6 +534,89 @@ class DataRequest(object):
             )
         return stacks_dict
 
+    async def _stream_effects(self, data_type: DataType):
+        if data_type == DataType.BUFFS:
+            effects = self._tracked_info.buffs
+            params = {'source_id': self._char_id}
+            targets = None
+        else:
+            effects = self._tracked_info.debuffs
+            params = {
+                'hostility_type': HostilityType.ENEMIES,
+                'target_id': self._char_id,
+            }
+            targets = self._target
+        stacks = self._event_stacks(data_type)
+
+        names = {effect.id: effect.name for effect in effects}
+        names.update({stack.id: stack.name for stack in stacks})
+        if not names:
+            logger.info('Skipping {0} events request'.format(data_type.value))
+            return
+
+        start_time, end_time = self._start_time, self._end_time
+        if (start_time is None) and (end_time is None):
+            start_time, end_time = await self._api.get_fight_times(
+                self._log, self._fight_id,
+            )
+
+        # Same arguments as for the tables, so are the events
+        logger.info('Requesting {0} events from API'.format(data_type.value))
+        uptimes = EventUptimes(names, start_time, end_time)
+        await uptimes.consume(self._api.stream_events(
+            log=self._log,
+            data_type=data_type,
+            start_time=start_time,
+            end_time=end_time,
+            filter_exp=self._generate_filter(names, targets),
+            **params,
+        ))
+        logger.info('Got {0} {1} events'.format(
+            uptimes.events, data_type.value,
+        ))
+
+        table = uptimes.effects_table(names)
+        if data_type == DataType.BUFFS:
+            self.buffs_table = table
+        else:
+            self.debuffs_table = table
+        self._add_graphs({
+            stack.id: uptimes.graph(
+                stack.id, stack.name, data_type.value[:-1],
+            )
+            for stack in stacks
+        })
+
+    async def _stream_casts(self):
+        if not self._char_id or self.cadence:
+            logger.info('Skipping Casts events request')
+            return
+
+        start_time, end_time = self._start_time, self._end_time
+        if (start_time is None) and (end_time is None):
+            start_time, end_time = await self._api.get_fight_times(
+                self._log, self._fight_id,
+            )
+        # Events are streamed for the window only, nothing to slice
+        start_time, end_time = self._window or (start_time, end_time)
+
+        logger.info('Requesting Casts events from API')
+        cadence = CastCadence(
+            skills=self._tracked_info.skills,
+            abilities=await self._api.query_abilities(self._log),
+            start_time=start_time,
+            end_time=end_time,
+        )
+        await cadence.consume(self._api.stream_events(
+            log=self._log,
+            data_type=DataType.CASTS,
+            start_time=start_time,
+            end_time=end_time,
+            source_id=self._char_id,
+        ))
+        logger.info('Got {0} casts'.format(cadence.casts))
+        self.cadence = cadence
+
     async def _request_passives(self):
         if not self._tracked_info.skills or self.passives:
             logger.info('Skipping passives request')
@@ -205,19 +631,6 @@ class DataRequest(object):
         )
 
         logger.info('Requesting Buffs table with passives from API')
-        weapon_passive_ids = [
-            passive.id for passive in (
-                # Next passives are not included in combatant info from events
-                # TODO: Add a special flag to buff dataclass?
-                Passives.TRI_FOCUS.value,
-                Passives.PENETRATING_MAGIC.value,
-                Passives.ANCIENT_KNOWLEDGE.value,
-                Passives.DESTRUCTION_EXPERT.value,
-                Passives.FORCEFUL.value,
-                Passives.FOLLOW_UP.value,
-                Passives.HAWK_EYE.value,
-            )
-        ]
         buffs = await self._api.query_table(
             log=self._log,
             fight_id=self._fight_id,
@@ -225,7 +638,7 @@ class DataRequest(object):
             start_time=self._start_time,
             end_time=self._end_time,
             source_id=self._char_id,
-            filter_exp=self._generate_filter(weapon_passive_ids),
+            filter_exp=self._generate_filter(self._weapon_passive_ids()),
         )
 
         self.passives.extend(
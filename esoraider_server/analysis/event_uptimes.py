@@ -0,0 +1,208 @@
+"""Uptimes calculation from buffs & debuffs events."""
+
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from esoraider_server.esologs.responses.report_data.effects import (
+    Aura,
+    Band,
+    EffectsTableData,
+)
+from esoraider_server.esologs.responses.report_data.graph import (
+    GraphData,
+    Series,
+)
+
+APPLY = frozenset(('applybuff', 'applydebuff'))
+REMOVE = frozenset(('removebuff', 'removedebuff'))
+STACKS_CHANGE = frozenset((
+    'applybuffstack',
+    'applydebuffstack',
+    'removebuffstack',
+    'removedebuffstack',
+))
+
+# Target ID & target instance, debuffs are applied to every enemy on its own
+EffectTarget = Tuple[Optional[int], int]
+
+
+class EffectTimeline(object):
+    """State machine of a single effect, on any number of targets.
+
+    Effect is active while any target has it, its stacks are the highest
+    stacks among targets. Timeline is kept the same way as API returns it:
+    bands of activity and [time, stacks] points of a graph
+    """
+
+    def __init__(self, ability_id: int, start_time: int) -> None:
+        self.ability_id = ability_id
+        self._start_time = start_time
+        # Target -> stacks of the effect on it
+        self._targets: Dict[EffectTarget, int] = {}
+        self._stacks = 0
+        self._since: Optional[int] = None
+
+        self.bands: List[Tuple[int, int]] = []
+        self.points: List[List[int]] = [[start_time, 0]]
+        self.uses = 0
+
+    @property
+    def total_uptime(self) -> int:
+        return sum(end - start for start, end in self.bands)
+
+    def apply(self, timestamp: int, target: EffectTarget, stacks: int):
+        self.uses += 1
+        self._targets[target] = stacks
+        self._update(timestamp)
+
+    def change_stacks(
+        self, timestamp: int, target: EffectTarget, stacks: int,
+    ):
+        if target not in self._targets:
+            # Applied before the stream started, previous stacks are lost
+            self._backdate(target, stacks)
+        self._targets[target] = stacks
+        self._update(timestamp)
+
+    def remove(self, timestamp: int, target: EffectTarget):
+        if target not in self._targets:
+            self._backdate(target, 1)
+        self._targets.pop(target, None)
+        self._update(timestamp)
+
+    def close(self, end_time: int):
+        """Finish the timeline, effects still active end with the stream."""
+        if self._since is not None:
+            self.bands.append((self._since, end_time))
+            self._since = None
+        self.points.append([end_time, self._stacks])
+
+    def _backdate(self, target: EffectTarget, stacks: int):
+        # Only an effect never seen before can be told to be active since
+        # the very start, otherwise the removal of an unknown target is
+        # just skipped
+        if self.bands or self._targets or self._since is not None:
+            return
+        self.uses += 1
+        self._targets[target] = stacks
+        self._stacks = stacks
+        self._since = self._start_time
+        self.points[0][1] = stacks
+
+    def _update(self, timestamp: int):
+        stacks = max(self._targets.values(), default=0)
+        if stacks == self._stacks:
+            return
+
+        if not self._stacks:
+            self._since = timestamp
+        elif not stacks:
+            self.bands.append((self._since, timestamp))
+            self._since = None
+
+        if self.points[-1][0] == timestamp:
+            self.points[-1][1] = stacks
+        else:
+            self.points.append([timestamp, stacks])
+        self._stacks = stacks
+
+
+class EventUptimes(object):
+    """Uptimes, stacks & timelines of tracked effects from their events.
+
+    Event pages are consumed as they come, in a single pass, keeping
+    nothing but a state machine per effect. Results have the same shape
+    as effects tables & graphs of the API, so the rest of the analysis
+    doesn't tell them apart
+    """
+
+    def __init__(
+        self,
+        ability_ids: Iterable[int],
+        start_time: int,
+        end_time: int,
+    ) -> None:
+        self._start_time = start_time
+        self._end_time = end_time
+        self._timelines: Dict[int, EffectTimeline] = {
+            ability_id: EffectTimeline(ability_id, start_time)
+            for ability_id in ability_ids
+        }
+        self._finished = False
+        self.events = 0
+
+    def feed(self, events: Iterable[Dict]):
+        """Process a page of raw events."""
+        timelines = self._timelines
+        for event in events:
+            timeline = timelines.get(event.get('abilityGameID'))
+            if timeline is None:
+                continue
+
+            self.events += 1
+            event_type = event['type']
+            target = (event.get('targetID'), event.get('targetInstance', 0))
+            if event_type in APPLY:
+                timeline.apply(
+                    event['timestamp'], target, event.get('stack') or 1,
+                )
+            elif event_type in STACKS_CHANGE:
+                timeline.change_stacks(
+                    event['timestamp'], target, event.get('stack') or 0,
+                )
+            elif event_type in REMOVE:
+                timeline.remove(event['timestamp'], target)
+
+    async def consume(self, pages: AsyncIterator[List[Dict]]):
+        """Process pages of an event stream, until it's exhausted."""
+        async for page in pages:
+            self.feed(page)
+        self.finish()
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        for timeline in self._timelines.values():
+            timeline.close(self._end_time)
+
+    def timeline(self, ability_id: int) -> EffectTimeline:
+        return self._timelines[ability_id]
+
+    def effects_table(self, names: Dict[int, str]) -> EffectsTableData:
+        """Effects seen in the stream, as if from Buffs / Debuffs table."""
+        auras = [
+            Aura(
+                name=names.get(ability_id, str(ability_id)),
+                guid=ability_id,
+                total_uptime=timeline.total_uptime,
+                total_uses=timeline.uses,
+                bands=[
+                    Band(start_time=start, end_time=end)
+                    for start, end in timeline.bands
+                ],
+            )
+            for ability_id, timeline in self._timelines.items()
+            if timeline.bands
+        ]
+        return EffectsTableData(
+            auras=auras,
+            use_targets=False,
+            total_time=self._end_time - self._start_time,
+            start_time=self._start_time,
+            end_time=self._end_time,
+        )
+
+    def graph(self, ability_id: int, name: str, type_: str) -> GraphData:
+        """Stacks of an effect, as if from a graph of the effect."""
+        return GraphData(
+            series=[Series(
+                name=name,
+                id=ability_id,
+                guid=ability_id,
+                type=type_,
+                data=self._timelines[ability_id].points,
+                events=[],
+            )],
+            start_time=self._start_time,
+            end_time=self._end_time,
+        )
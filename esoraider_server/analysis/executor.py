@@ -0,0 +1,136 @@
+"""Offloading of CPU heavy analysis steps to worker processes."""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from esoraider_server.analysis.uptimes import Uptimes
+from esoraider_server.data.core import Stack
+
+
+@dataclass(frozen=True)
+class TaskTiming:
+    name: str
+    # Time spent waiting for a free slot
+    queued: float
+    # Time spent inside a worker process
+    executed: float
+    # Full time including data transfer between processes
+    total: float
+
+
+def _timed(func: Callable, *args) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    task_result = func(*args)
+    return task_result, time.perf_counter() - started
+
+
+def calculate_uptimes(
+    uptimes_args: Dict[str, Any], stacks: Optional[List[Stack]] = None,
+) -> Uptimes:
+    """Calculate uptimes & stacks, meant to be run in a worker process.
+
+    Uptimes are built inside of the worker, only the data they are built
+    from is sent there and only the results are sent back
+    """
+    uptimes = Uptimes(**uptimes_args)
+    uptimes.calculate(stacks)
+    return uptimes
+
+
+class AnalysisExecutor(object):
+    """Runs pure data analysis steps in a pool of worker processes.
+
+    Uptimes & stacks calculation doesn't need any IO, but takes a while on
+    long fights, blocking every other request of the same event loop.
+    Number of tasks in flight is bounded, the rest are waiting their turn.
+    With no workers configured, tasks are executed inline
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        history_size: int = 100,
+    ) -> None:
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.timings: Deque[TaskTiming] = deque(maxlen=history_size)
+        self.loop_lags: Deque[float] = deque(maxlen=history_size)
+
+    def start(self):
+        if self._max_workers:
+            logger.info('Starting {0} analysis workers'.format(
+                self._max_workers,
+            ))
+            self._pool = ProcessPoolExecutor(max_workers=self._max_workers)
+        self._semaphore = asyncio.Semaphore(self._max_pending)
+
+    def close(self):
+        if self._pool:
+            logger.info('Stopping analysis workers')
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def restart(self):
+        """Replace workers, i.e. to let them import a reloaded catalog.
+
+        Tasks already running finish in the old workers
+        """
+        if self._pool:
+            logger.info('Restarting analysis workers')
+            self._pool.shutdown(wait=False)
+            self._pool = ProcessPoolExecutor(max_workers=self._max_workers)
+
+    async def run(self, name: str, func: Callable, *args) -> Any:
+        """Run a function with picklable arguments and result."""
+        if self._semaphore is None:
+            self.start()
+
+        queued_at = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            if self._pool:
+                loop = asyncio.get_running_loop()
+                task_result, executed = await loop.run_in_executor(
+                    self._pool, _timed, func, *args,
+                )
+            else:
+                task_result, executed = _timed(func, *args)
+            finished = time.perf_counter()
+
+        timing = TaskTiming(
+            name=name,
+            queued=started - queued_at,
+            executed=executed,
+            total=finished - queued_at,
+        )
+        self.timings.append(timing)
+        logger.debug(timing)
+        return task_result
+
+    async def watch_loop_lag(self, interval: float = 1.0):
+        """Measure how late the event loop wakes up, until cancelled."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lags.append(time.perf_counter() - started - interval)
+
+    def stats(self) -> Dict:
+        timings = list(self.timings)
+        return {
+            'workers': self._max_workers,
+            'tasks': len(timings),
+            'maxQueued': max((_.queued for _ in timings), default=0),
+            'maxExecuted': max((_.executed for _ in timings), default=0),
+            'maxTotal': max((_.total for _ in timings), default=0),
+            'maxLoopLag': max(self.loop_lags, default=0),
+        }
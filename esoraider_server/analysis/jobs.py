@@ -0,0 +1,420 @@
+"""Background jobs for analysis longer than a request."""
+
+import asyncio
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+from loguru import logger
+
+from esoraider_server.analysis.log_analysis import Progress
+
+
+class JobStatus(Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+FINISHED = frozenset((JobStatus.DONE, JobStatus.FAILED))
+# Columns of a job, others are kept for the store only
+JOB_COLUMNS = (
+    'id, log, status, done, total, error, error_type, created_at, '
+    'finished_at, result'
+)
+
+
+@dataclass
+class Job:
+    id: str
+    log: str
+    status: JobStatus = JobStatus.QUEUED
+    done: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    # Class name of the exception a job failed with
+    error_type: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    # Serialized report, once the job is done
+    result: Optional[bytes] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def state(self) -> Dict:
+        return {
+            'id': self.id,
+            'log': self.log,
+            'status': self.status.value,
+            'done': self.done,
+            'total': self.total,
+            'error': self.error,
+            'createdAt': self.created_at,
+            'finishedAt': self.finished_at,
+        }
+
+
+Run = Callable[[Job, Progress], Awaitable[bytes]]
+
+
+class JobStore(object):
+    """SQLite table of jobs, shared by every process of a server.
+
+    Jobs survive a restart. Running jobs are touched every once in a
+    while, so jobs of a process gone away are told by their `updated_at`
+    """
+
+    def __init__(self, path: str) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, log TEXT, status TEXT, done INTEGER, '
+            'total INTEGER, error TEXT, created_at REAL, finished_at REAL, '
+            'result BLOB, updated_at REAL, error_type TEXT)',
+        )
+        columns = {
+            row[1]
+            for row in self._connection.execute('PRAGMA table_info(jobs)')
+        }
+        if 'error_type' not in columns:
+            # Stores of older versions
+            self._connection.execute(
+                'ALTER TABLE jobs ADD COLUMN error_type TEXT',
+            )
+        self._connection.commit()
+
+    def submit(self, job: Job) -> Job:
+        """Save a new job, or get an unfinished one of the same log."""
+        with self._connection:
+            # Write lock is taken right away, so the check and the insert
+            # are atomic across processes
+            self._connection.execute('BEGIN IMMEDIATE')
+            row = self._connection.execute(
+                'SELECT {0} FROM jobs WHERE log = ? AND status IN (?, ?) '
+                'ORDER BY created_at'.format(JOB_COLUMNS),
+                (job.log, JobStatus.QUEUED.value, JobStatus.RUNNING.value),
+            ).fetchone()
+            if row:
+                return self._job(row)
+            self._insert(job)
+        return job
+
+    def save(self, job: Job):
+        with self._connection:
+            self._insert(job)
+
+    def claim(self, job_id: str) -> bool:
+        """Mark a queued job as running, unless someone else did."""
+        with self._connection:
+            return self._connection.execute(
+                'UPDATE jobs SET status = ?, done = 0, updated_at = ? '
+                'WHERE id = ? AND status = ?',
+                (
+                    JobStatus.RUNNING.value,
+                    time.time(),
+                    job_id,
+                    JobStatus.QUEUED.value,
+                ),
+            ).rowcount == 1
+
+    def progress(self, job_id: str, done: int, total: int):
+        with self._connection:
+            self._connection.execute(
+                'UPDATE jobs SET done = ?, total = ?, updated_at = ? '
+                'WHERE id = ?',
+                (done, total, time.time(), job_id),
+            )
+
+    def touch(self, job_ids: List[str]):
+        with self._connection:
+            self._connection.executemany(
+                'UPDATE jobs SET updated_at = ? WHERE id = ?',
+                [(time.time(), job_id) for job_id in job_ids],
+            )
+
+    def requeue_stale(self, stale_after: float) -> int:
+        """Queue again running jobs which weren't touched for a while."""
+        with self._connection:
+            return self._connection.execute(
+                'UPDATE jobs SET status = ?, done = 0 '
+                'WHERE status = ? AND updated_at < ?',
+                (
+                    JobStatus.QUEUED.value,
+                    JobStatus.RUNNING.value,
+                    time.time() - stale_after,
+                ),
+            ).rowcount
+
+    def load(self, job_id: str) -> Optional[Job]:
+        row = self._connection.execute(
+            'SELECT {0} FROM jobs WHERE id = ?'.format(JOB_COLUMNS),
+            (job_id,),
+        ).fetchone()
+        return self._job(row) if row else None
+
+    def queued(self) -> List[Job]:
+        rows = self._connection.execute(
+            'SELECT {0} FROM jobs WHERE status = ? '
+            'ORDER BY created_at'.format(JOB_COLUMNS),
+            (JobStatus.QUEUED.value,),
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def close(self):
+        self._connection.close()
+
+    def _insert(self, job: Job):
+        self._connection.execute(
+            'INSERT OR REPLACE INTO jobs ({0}, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'.format(JOB_COLUMNS),
+            (
+                job.id,
+                job.log,
+                job.status.value,
+                job.done,
+                job.total,
+                job.error,
+                job.error_type,
+                job.created_at,
+                job.finished_at,
+                job.result,
+                time.time(),
+            ),
+        )
+
+    def _job(self, row) -> Job:
+        (
+            id_, log, status, done, total, error, error_type,
+            created, finished, result,
+        ) = row
+        return Job(
+            id=id_,
+            log=log,
+            status=JobStatus(status),
+            done=done,
+            total=total,
+            error=error,
+            error_type=error_type,
+            created_at=created,
+            finished_at=finished,
+            result=result,
+        )
+
+
+class JobQueue(object):
+    """Queue of jobs, run by a few workers of the event loop.
+
+    Without a store, jobs are kept in memory of a single process. With a
+    store, jobs are shared by every process of a server: a job is run by
+    the process which claims it first and others answer from the store,
+    where progress is written to. Running jobs are touched a few times
+    per `stale_after` seconds, jobs not touched for longer are of a
+    process gone away and are queued again. A log has one unfinished
+    job at most
+    """
+
+    def __init__(
+        self,
+        run: Run,
+        concurrency: int,
+        store: Optional[JobStore] = None,
+        max_finished: int = 64,
+        stale_after: float = 300,
+        poll_interval: float = 1,
+    ) -> None:
+        self._run = run
+        self._concurrency = concurrency
+        self._store = store
+        self._max_finished = max_finished
+        self._stale_after = stale_after
+        self._poll_interval = poll_interval
+        # Single thread, SQLite connection is used by one thread at a time
+        self._io = ThreadPoolExecutor(max_workers=1)
+
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional['asyncio.Queue[str]'] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._changed = asyncio.Condition()
+        self._workers = [
+            asyncio.create_task(self._work())
+            for _ in range(self._concurrency)
+        ]
+        if self._store:
+            self._workers.append(asyncio.create_task(self._beat()))
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._store:
+            await self._in_io(self._store.close)
+        self._io.shutdown(wait=False)
+
+    async def submit(self, log: str) -> Job:
+        """Queue a job, or get an unfinished one of the same log."""
+        job = Job(id=uuid.uuid4().hex, log=log)
+        if self._store:
+            submitted = await self._in_io(self._store.submit, job)
+            if submitted is not job:
+                return submitted
+        else:
+            for existing in self._jobs.values():
+                if existing.log == log and not existing.finished:
+                    return existing
+
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        logger.info('Queued job {0} of log {1}'.format(job.id, log))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if self._store and not self._is_own(job):
+            job = await self._in_io(self._store.load, job_id)
+        return job
+
+    async def watch(self, job_id: str) -> AsyncIterator[Job]:
+        """Yield a job every time it changes, until it's finished."""
+        job = await self.get(job_id)
+        if job is None:
+            return
+
+        state = job.state()
+        yield job
+        while not job.finished:
+            job = await self._next_change(job)
+            if job.state() != state:
+                state = job.state()
+                yield job
+
+    def stats(self) -> Dict:
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            status.value: statuses.count(status) for status in JobStatus
+        }
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is not None and await self._claim(job):
+                await self._execute(job)
+            self._queue.task_done()
+
+    async def _claim(self, job: Job) -> bool:
+        if self._store and not await self._in_io(self._store.claim, job.id):
+            # Taken by another process, which answers for it from now on
+            logger.info('Job {0} is claimed elsewhere'.format(job.id))
+            self._jobs.pop(job.id, None)
+            return False
+        return True
+
+    async def _execute(self, job: Job):
+        logger.info('Running job {0} of log {1}'.format(job.id, job.log))
+        job.status = JobStatus.RUNNING
+        job.done = 0
+        # Job is marked running in the store by its claim
+        self._notify()
+
+        def progress(done: int, total: int):  # noqa: WPS430
+            job.done = done
+            job.total = total
+            self._notify()
+            if self._store:
+                self._in_io(self._store.progress, job.id, done, total)
+
+        try:
+            job.result = await self._run(job, progress)
+        except asyncio.CancelledError:
+            # Stays running in the store, so it's resumed after a restart
+            raise
+        except Exception as ex:
+            logger.exception('Job {0} failed: {1}'.format(job.id, ex))
+            job.status = JobStatus.FAILED
+            job.error = str(ex)
+            job.error_type = type(ex).__name__
+        else:
+            job.status = JobStatus.DONE
+        job.finished_at = time.time()
+        await self._save(job)
+        self._forget_finished()
+
+    async def _beat(self):
+        # Running jobs are touched, while jobs of processes gone away and
+        # jobs nobody took yet are picked up from the store
+        while True:
+            running = [
+                job.id
+                for job in self._jobs.values()
+                if job.status == JobStatus.RUNNING
+            ]
+            if running:
+                await self._in_io(self._store.touch, running)
+            stale = await self._in_io(
+                self._store.requeue_stale, self._stale_after,
+            )
+            if stale:
+                logger.info('Queued {0} stale jobs again'.format(stale))
+            for job in await self._in_io(self._store.queued):
+                if job.id not in self._jobs:
+                    self._jobs[job.id] = job
+                    self._queue.put_nowait(job.id)
+            await asyncio.sleep(self._stale_after / 3)
+
+    def _is_own(self, job: Optional[Job]) -> bool:
+        # Jobs which are run or were finished by this process,
+        # queued ones may be claimed by another process at any time
+        return job is not None and job.status != JobStatus.QUEUED
+
+    async def _next_change(self, job: Job) -> Job:
+        if not self._store or (
+            self._jobs.get(job.id) is job and self._is_own(job)
+        ):
+            async with self._changed:
+                await self._changed.wait()
+            return job
+
+        # Job of another process, its changes are seen in the store only
+        await asyncio.sleep(self._poll_interval)
+        return await self._in_io(self._store.load, job.id) or job
+
+    async def _save(self, job: Job):
+        self._notify()
+        if self._store:
+            await self._in_io(self._store.save, job)
+
+    def _notify(self):
+        async def notify_all():  # noqa: WPS430
+            async with self._changed:
+                self._changed.notify_all()
+
+        asyncio.get_event_loop().create_task(notify_all())
+
+    def _forget_finished(self):
+        # Finished jobs are still loaded from the store when asked for
+        finished = [job for job in self._jobs.values() if job.finished]
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:max(0, len(finished) - self._max_finished)]:
+            del self._jobs[job.id]
+
+    def _in_io(self, func: Callable, *args) -> Awaitable:
+        return asyncio.get_event_loop().run_in_executor(self._io, func, *args)
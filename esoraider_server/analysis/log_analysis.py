@@ -0,0 +1,108 @@
+"""Performance analysis of every player in every boss fight of a log."""
+
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from esoraider_server.analysis.executor import AnalysisExecutor
+from esoraider_server.analysis.raid_report_builder import RaidReportBuilder
+from esoraider_server.esologs.api import ApiWrapper
+
+Progress = Callable[[int, int], None]
+# Fight id & its raid report, as built for the whole fight
+FightReport = Callable[[int, Dict], None]
+
+
+class LogAnalysis(object):
+    """Builds raid reports of every boss fight of a log.
+
+    Takes far longer than a single request may, so it's meant to be run
+    as a job. Fights are analyzed no more than `concurrency` at a time,
+    progress & the report are passed on after every fight
+    """
+
+    def __init__(
+        self,
+        api: ApiWrapper,
+        log: str,
+        fights: List[Dict],
+        concurrency: int,
+        executor: Optional[AnalysisExecutor] = None,
+        on_progress: Optional[Progress] = None,
+        on_fight_report: Optional[FightReport] = None,
+    ) -> None:
+        self._api = api
+        self._executor = executor
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._on_progress = on_progress
+        self._on_fight_report = on_fight_report
+
+        self.log = log
+        self._fights = [fight for fight in fights if fight.get('encounterID')]
+        self.done = 0
+
+        self.report: Dict = {}
+
+    @property
+    def total(self) -> int:
+        return len(self._fights)
+
+    async def build(self) -> Dict:
+        logger.info('Analyzing {0} fights of log {1}'.format(
+            self.total, self.log,
+        ))
+        self._report_progress()
+        reports = await asyncio.gather(*(
+            self._build_fight(fight) for fight in self._fights
+        ))
+        self.report = {'log': self.log, 'fights': list(reports)}
+        return self.report
+
+    def _report_progress(self):
+        if self._on_progress:
+            self._on_progress(self.done, self.total)
+
+    async def _build_fight(self, fight: Dict) -> Dict:
+        async with self._semaphore:
+            report = await self._build_report(fight)
+        if self._on_fight_report:
+            self._on_fight_report(fight.get('id'), report)
+
+        self.done += 1
+        self._report_progress()
+        return {
+            'id': fight.get('id'),
+            'name': fight.get('name'),
+            'encounterID': fight.get('encounterID'),
+            'difficulty': fight.get('difficulty'),
+            'kill': fight.get('kill'),
+            'startTime': fight.get('startTime'),
+            'endTime': fight.get('endTime'),
+            **report,
+        }
+
+    async def _build_report(self, fight: Dict) -> Dict:
+        logger.info('Building raid report of fight {0}'.format(
+            fight.get('id'),
+        ))
+        # Fight boundaries are already known from the log
+        start_time: Optional[int] = fight.get('startTime')
+        end_time: Optional[int] = fight.get('endTime')
+
+        response = await self._api.query_char_table(
+            log=self.log,
+            fight_id=fight.get('id'),
+            start_time=start_time,
+            end_time=end_time,
+        )
+        return await RaidReportBuilder(
+            api=self._api,
+            log=self.log,
+            fight_id=fight.get('id'),
+            summary_table=response.table.data,
+            start_time=start_time,
+            end_time=end_time,
+            encounter_info=response.fights[0],
+            executor=self._executor,
+        ).build()
@@ -0,0 +1,278 @@
+"""Percentiles of uptimes among analyzed reports of an encounter & spec."""
+
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+
+from esoraider_server.analysis.uptimes import Uptimes
+from esoraider_server.data.core import GearSet, Glyph, Skill
+
+# Number of centroids a digest is kept around, more is more accurate
+COMPRESSION = 100
+# Metrics with fewer reports than that have no percentile yet
+MIN_REPORTS = 10
+
+
+class TDigest(object):
+    """Merging t-digest, a sketch of a distribution for its quantiles.
+
+    Values are buffered and merged into centroids once in a while.
+    Centroids near the median hold many values, centroids near the
+    tails only a few, so ranks of extreme values stay precise
+    """
+
+    def __init__(
+        self,
+        compression: int = COMPRESSION,
+        centroids: Optional[List[Tuple[float, float]]] = None,
+        min_value: float = float('inf'),
+        max_value: float = float('-inf'),
+    ) -> None:
+        self._compression = compression
+        self._centroids: List[Tuple[float, float]] = centroids or []
+        self._buffer: List[float] = []
+        self.count = sum(weight for _, weight in self._centroids)
+        self.min = min_value
+        self.max = max_value
+
+    def add(self, value: float):
+        self._buffer.append(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self._compression:
+            self._merge()
+
+    def cdf(self, value: float) -> float:
+        """Share of values below the value, interpolated between centroids.
+
+        Every centroid is taken as half of its values below its mean and
+        half above it
+        """
+        self._merge()
+        if not self.count:
+            return float('nan')
+        if value < self.min:
+            return float(0)
+        if value > self.max:
+            return float(1)
+        # Every value is the same, the value is right among them
+        if self.min == self.max:
+            return 0.5
+        if value == self.max:
+            return float(1)
+
+        below = float(0)
+        prev_mean, prev_rank = self.min, float(0)
+        for mean, weight in self._centroids:
+            rank = below + weight / 2
+            if value < mean:
+                return self._interpolate(
+                    value, prev_mean, prev_rank, mean, rank,
+                ) / self.count
+            prev_mean, prev_rank = mean, rank
+            below += weight
+        return self._interpolate(
+            value, prev_mean, prev_rank, self.max, self.count,
+        ) / self.count
+
+    def to_json(self) -> str:
+        self._merge()
+        return json.dumps({
+            'compression': self._compression,
+            'centroids': self._centroids,
+            'min': self.min,
+            'max': self.max,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> 'TDigest':
+        state = json.loads(raw)
+        return cls(
+            compression=state['compression'],
+            centroids=[tuple(centroid) for centroid in state['centroids']],
+            min_value=state['min'],
+            max_value=state['max'],
+        )
+
+    def _interpolate(
+        self,
+        value: float,
+        lower: float,
+        lower_rank: float,
+        upper: float,
+        upper_rank: float,
+    ) -> float:
+        if upper <= lower:
+            return upper_rank
+        return lower_rank + (value - lower) / (upper - lower) * (
+            upper_rank - lower_rank
+        )
+
+    def _merge(self):
+        if not self._buffer:
+            return
+
+        points = sorted([
+            *self._centroids,
+            *((value, float(1)) for value in self._buffer),
+        ])
+        self._buffer = []
+
+        merged: List[Tuple[float, float]] = []
+        below = float(0)
+        mean, weight = points[0]
+        for point_mean, point_weight in points[1:]:
+            # Size limit of a centroid shrinks towards the tails
+            quantile = (below + weight + point_weight / 2) / self.count
+            limit = 4 * self.count * quantile * (1 - quantile)
+            if weight + point_weight <= max(1, limit / self._compression):
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append((mean, weight))
+                below += weight
+                mean, weight = point_mean, point_weight
+        merged.append((mean, weight))
+        self._centroids = merged
+
+
+@dataclass(frozen=True)
+class PercentileGroup:
+    """Reports compared to each other."""
+
+    encounter_id: int
+    difficulty: int
+    char_class: str
+    spec: str
+
+    def params(self) -> Tuple[int, int, str, str]:
+        return self.encounter_id, self.difficulty, self.char_class, self.spec
+
+
+def _items_metrics(
+    kind: str,
+    items: Iterable[Union[Skill, GearSet, Glyph]],
+    metrics: Dict[str, float],
+):
+    for item in items:
+        if item.uptime is not None:
+            metrics['{0}:{1}'.format(kind, item.id)] = item.uptime
+        for buff in item.buffs or []:
+            if buff.uptime is not None:
+                metrics['buff:{0}'.format(buff.id)] = buff.uptime
+        for debuff in item.debuffs or []:
+            if debuff.uptime is not None:
+                metrics['debuff:{0}'.format(debuff.id)] = debuff.uptime
+        if isinstance(item, Skill) and item.children:
+            _items_metrics(kind, item.children, metrics)
+
+
+def report_metrics(uptimes: Uptimes) -> Dict[str, float]:
+    """Every uptime of a report by its metric, i.e. `buff:61665`."""
+    metrics: Dict[str, float] = {}
+    _items_metrics('skill', uptimes.skills, metrics)
+    _items_metrics('set', uptimes.sets, metrics)
+    _items_metrics('glyph', uptimes.glyphs, metrics)
+    for stack in uptimes.stacks:
+        for level, uptime in (stack.uptimes or {}).items():
+            # Level 0 is an effect missing altogether
+            if level:
+                metrics['stack:{0}:{1}'.format(stack.id, level)] = uptime
+    return metrics
+
+
+class PercentileIndex(object):
+    """SQLite store of a t-digest for every metric of every group.
+
+    A report is ranked against reports indexed before it, then added to
+    the digests of its group. Sketches are read, updated & written back
+    in one transaction, so every process of a server shares them
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._connection = sqlite3.connect(
+            path or ':memory:', check_same_thread=False,
+        )
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS reports ('
+            'key TEXT PRIMARY KEY);'
+            'CREATE TABLE IF NOT EXISTS digests ('
+            'encounter INTEGER, difficulty INTEGER, class TEXT, spec TEXT, '
+            'metric TEXT, digest TEXT, '
+            'PRIMARY KEY (encounter, difficulty, class, spec, metric));',
+        )
+        self._connection.commit()
+        # Single thread, SQLite connection is used by one thread at a time
+        self._io = ThreadPoolExecutor(max_workers=1)
+
+    async def rank(
+        self,
+        key: str,
+        group: PercentileGroup,
+        metrics: Dict[str, float],
+    ) -> Dict[str, Optional[float]]:
+        """Percentiles of report metrics, indexing the report once."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._io, self._rank, key, group, metrics,
+        )
+
+    def close(self):
+        self._io.shutdown(wait=True)
+        self._connection.close()
+
+    def _rank(
+        self,
+        key: str,
+        group: PercentileGroup,
+        metrics: Dict[str, float],
+    ) -> Dict[str, Optional[float]]:
+        with self._connection:
+            indexed = self._connection.execute(
+                'INSERT OR IGNORE INTO reports VALUES (?)', (key,),
+            ).rowcount == 0
+            digests = self._digests(group)
+
+            percentiles: Dict[str, Optional[float]] = {}
+            for metric, uptime in metrics.items():
+                digest = digests.get(metric)
+                if digest is None or digest.count < MIN_REPORTS:
+                    percentiles[metric] = None
+                else:
+                    percentiles[metric] = round(digest.cdf(uptime) * 100, 1)
+
+            if not indexed:
+                self._index(group, digests, metrics)
+        return percentiles
+
+    def _digests(self, group: PercentileGroup) -> Dict[str, TDigest]:
+        rows = self._connection.execute(
+            'SELECT metric, digest FROM digests WHERE encounter = ? '
+            'AND difficulty = ? AND class = ? AND spec = ?',
+            group.params(),
+        ).fetchall()
+        return {metric: TDigest.from_json(raw) for metric, raw in rows}
+
+    def _index(
+        self,
+        group: PercentileGroup,
+        digests: Dict[str, TDigest],
+        metrics: Dict[str, float],
+    ):
+        logger.info('Indexing {0} metrics of {1}'.format(
+            len(metrics), group,
+        ))
+        rows = []
+        for metric, uptime in metrics.items():
+            digest = digests.setdefault(metric, TDigest())
+            digest.add(uptime)
+            rows.append((*group.params(), metric, digest.to_json()))
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)', rows,
+        )
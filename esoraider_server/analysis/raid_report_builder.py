@@ -0,0 +1,229 @@
+"""Performance analysis reports of a whole raid."""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, List, Optional, Union
+
+from gql.dsl import DSLField  # type: ignore
+from loguru import logger
+
+from esoraider_server.analysis.executor import AnalysisExecutor
+from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.analysis.timings import Timings
+from esoraider_server.analysis.tracked_info import (
+    NothingToTrackException,
+    SkillsNotFoundException,
+)
+from esoraider_server.data.registry import CATALOGS, Catalog
+from esoraider_server.esologs.api import ApiWrapper
+from esoraider_server.esologs.responses.report_data.casts import CastsTableData
+from esoraider_server.esologs.responses.report_data.effects import (
+    EffectsTableData,
+)
+from esoraider_server.esologs.responses.report_data.fight import Fight
+from esoraider_server.esologs.responses.report_data.graph import (
+    Event,
+    GraphData,
+)
+from esoraider_server.esologs.responses.report_data.summary import (
+    CombatantInfo,
+    SummaryTableData,
+)
+
+Tables = Dict[str, Union[CastsTableData, EffectsTableData]]
+
+
+class RaidReportBuilder(object):
+    """Performance analysis report builder for every player of a fight.
+
+    Tables, graphs & events are requested once per type for the whole raid,
+    so the number of requests doesn't depend on the number of players
+    """
+
+    def __init__(
+        self,
+        api: ApiWrapper,
+        log: str,
+        fight_id: int,
+        summary_table: SummaryTableData,
+        encounter_info: Fight,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        executor: Optional[AnalysisExecutor] = None,
+        timings: Optional[Timings] = None,
+        catalog: Optional[Catalog] = None,
+    ) -> None:
+        self._api = api
+        self._executor = executor
+        # Shared by every player, so their stages are summed up
+        self.timings = timings or Timings()
+        self._catalog = catalog or CATALOGS.current
+
+        self.log = log
+        self.fight_id = fight_id
+        self.start_time = start_time
+        self.end_time = end_time
+
+        self._summary_table = summary_table
+        self._encounter_info = encounter_info
+
+        self._builders: Dict[int, ReportBuilder] = {}
+        self._names: Dict[int, str] = {}
+        self._errors: List[Dict] = []
+
+        self.report: Dict = {}
+
+    async def build(self) -> Dict:
+        """Execute report building steps for every player."""
+        if (self.start_time is None) and (self.end_time is None):
+            self.start_time, self.end_time = await self._api.get_fight_times(
+                self.log, self.fight_id,
+            )
+
+        await self._prepare_builders()
+
+        tables, graphs, events = await asyncio.gather(
+            self.timings.measure_async(
+                'request_raid_tables', self._request_tables(),
+            ),
+            self.timings.measure_async(
+                'request_raid_graphs', self._request_graphs(),
+            ),
+            self.timings.measure_async(
+                'request_raid_events', self._request_events(),
+            ),
+        )
+
+        reports = await asyncio.gather(*(
+            self._finish(char_id, builder, tables, graphs, events)
+            for char_id, builder in self._builders.items()
+        ))
+
+        self.report = {
+            # Players failed to finish are among errors instead
+            'reports': [report for report in reports if report is not None],
+            'errors': self._errors,
+        }
+        return self.report
+
+    def _combatant_infos(self) -> Dict[int, CombatantInfo]:
+        details = self._summary_table.player_details
+        if not details:
+            return {}
+
+        return {
+            player.id: player.combatant_info
+            for players in (details.dps, details.tanks, details.healers)
+            if players
+            for player in players
+        }
+
+    async def _prepare_builders(self):
+        logger.info('Preparing reports of every player')
+        combatant_infos = self._combatant_infos()
+        for char in self._summary_table.composition:
+            combatant_info = combatant_infos.get(char.id)
+            if not combatant_info:
+                self._add_error(char.id, char.name, SkillsNotFoundException())
+                continue
+
+            builder = ReportBuilder(
+                api=self._api,
+                log=self.log,
+                fight_id=self.fight_id,
+                char_id=char.id,
+                summary_table=replace(
+                    self._summary_table, combatant_info=combatant_info,
+                ),
+                start_time=self.start_time,
+                end_time=self.end_time,
+                encounter_info=self._encounter_info,
+                executor=self._executor,
+                timings=self.timings,
+                catalog=self._catalog,
+            )
+            try:
+                await builder.prepare()
+            except (SkillsNotFoundException, NothingToTrackException) as ex:
+                self._add_error(char.id, char.name, ex)
+                continue
+            self._builders[char.id] = builder
+            self._names[char.id] = char.name
+
+        logger.info('{0} players to analyze'.format(len(self._builders)))
+
+    def _add_error(self, char_id: int, name: str, ex: Exception):
+        logger.info('Skipping {0}: {1}'.format(name, ex))
+        self._errors.append({'id': char_id, 'name': name, 'error': str(ex)})
+
+    async def _request_tables(self) -> Tables:
+        # One request per data type with a table per player in each one
+        by_data_type: Dict[str, Dict[str, DSLField]] = defaultdict(dict)
+        for char_id, builder in self._builders.items():
+            partial = await builder.requested_data.partial_tables(str(char_id))
+            for alias, table in partial.items():
+                by_data_type[alias.split('_')[0]][alias] = table
+
+        responses = await asyncio.gather(*(
+            self._api.query_tables(log=self.log, tables=tables)
+            for tables in by_data_type.values()
+        ))
+
+        tables: Tables = {}
+        for response in responses:
+            tables.update(response)
+        logger.info('Got {0} tables'.format(len(tables)))
+        return tables
+
+    async def _request_graphs(self) -> Dict[str, Dict[int, GraphData]]:
+        graphs: Dict[str, DSLField] = {}
+        for char_id, builder in self._builders.items():
+            graphs.update(
+                await builder.requested_data.partial_graphs(str(char_id)),
+            )
+        if not graphs:
+            return {}
+
+        response = await self._api.query_graphs(log=self.log, graphs=graphs)
+
+        # Aliases look like id_<ability id>_<char id>
+        by_char: Dict[str, Dict[int, GraphData]] = defaultdict(dict)
+        for alias, graph in response.items():
+            _, ability_id, char_id = alias.split('_')
+            by_char[char_id][int(ability_id)] = graph
+        logger.info('Got {0} graphs'.format(len(response)))
+        return by_char
+
+    async def _request_events(self) -> List[Event]:
+        # Combatant info events of every player come in a single list
+        return await self._api.query_events(
+            log=self.log,
+            char_id=None,
+            start_time=self.start_time,
+            end_time=self.end_time,
+        )
+
+    async def _finish(
+        self,
+        char_id: int,
+        builder: ReportBuilder,
+        tables: Tables,
+        graphs: Dict[str, Dict[int, GraphData]],
+        events: List[Event],
+    ) -> Optional[Dict]:
+        key = str(char_id)
+        builder.requested_data.fill(
+            key=key,
+            tables=tables,
+            graphs=graphs.get(key, {}),
+            events=events,
+        )
+        # Anything missing from the shared requests is requested separately
+        await builder.requested_data.execute()
+        try:
+            return await builder.finish()
+        except (SkillsNotFoundException, NothingToTrackException) as ex:
+            # Rest of the raid is reported without this player
+            self._add_error(char_id, self._names[char_id], ex)
+            return None
@@ -1,17 +1,39 @@
 """Performance analysis report building."""
 
-from dataclasses import asdict
-from typing import Dict, List, Optional, Tuple
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from loguru import logger
 
 from esoraider_server.analysis.checklist_builder import ChecklistBuilder
 from esoraider_server.analysis.data_request import DataRequest
+from esoraider_server.analysis.executor import (
+    AnalysisExecutor,
+    calculate_uptimes,
+)
+from esoraider_server.analysis.percentiles import (
+    PercentileGroup,
+    PercentileIndex,
+    report_metrics,
+)
+from esoraider_server.analysis.stacks import Stacks
+from esoraider_server.analysis.timeline import (
+    Timeline,
+    TimelineFormat,
+    spans_from_bands,
+    spans_from_interval,
+)
+from esoraider_server.analysis.timings import Timings
 from esoraider_server.analysis.tracked_info import TrackedInfo
 from esoraider_server.analysis.uptimes import Uptimes
+from esoraider_server.data.core import Stack
+from esoraider_server.data.registry import CATALOGS, Catalog
 from esoraider_server.esologs.api import ApiWrapper
 from esoraider_server.esologs.consts import CharClass
-from esoraider_server.esologs.responses.report_data.effects import Aura
+from esoraider_server.esologs.responses.report_data.effects import (
+    Aura,
+    EffectsTableData,
+)
 from esoraider_server.esologs.responses.report_data.fight import Fight
 from esoraider_server.esologs.responses.report_data.graph import Series
 from esoraider_server.esologs.responses.report_data.summary import (
@@ -19,6 +41,31 @@ from esoraider_server.esologs.responses.report_data.summary import (
 )
 
 
+# Sections of uptimes streamed as soon as tables are there
+TABLES_SECTIONS = frozenset(('skills', 'sets', 'effects'))
+# Sections updated by stacks, streamed once graphs are there too
+GRAPHS_SECTIONS = frozenset(('skills', 'sets', 'stacks'))
+
+
+def _from_graph(stack: Stack) -> bool:
+    # Other stacks are calculated from buffs & debuffs they consist of
+    return not stack.buffs and not stack.debuffs
+
+
+def _auras(table: Optional[EffectsTableData]) -> List[Aura]:
+    return table.auras if table else []
+
+
+# Reports keep the calculated dataclasses as they are,
+# they are written to JSON by `dump_report` without copying
+def _uptimes_report(uptimes: Uptimes) -> Dict:
+    return {
+        'skills': list(uptimes.skills),
+        'sets': list(uptimes.sets),
+        'glyphs': list(uptimes.glyphs),
+    }
+
+
 class ReportBuilder(object):
     """Performance analysis report builder."""
 
@@ -33,8 +80,20 @@ class ReportBuilder(object):
         end_time: Optional[int] = None,
         encounter_info: Optional[Fight] = None,
         target: Optional[Tuple[int]] = None,
+        local_window: bool = False,
+        all_targets: bool = False,
+        executor: Optional[AnalysisExecutor] = None,
+        timings: Optional[Timings] = None,
+        catalog: Optional[Catalog] = None,
+        percentiles: Optional[PercentileIndex] = None,
     ) -> None:
         self._api = api
+        self._executor = executor
+        # Set only for reports of a whole fight, they are the ones to index
+        self._percentiles = percentiles
+        self.timings = timings or Timings()
+        # Same catalog version for the whole report, even if reloaded
+        self._catalog = catalog or CATALOGS.current
 
         self.log = log
         self.fight_id = fight_id
@@ -44,10 +103,13 @@ class ReportBuilder(object):
         self._summary_table = summary_table
         self._encounter_info = encounter_info
         self._target = target
+        self._local_window = local_window
+        self._all_targets = all_targets
 
         self._tracked_info: Optional[TrackedInfo] = None
         self._requested_data: Optional[DataRequest] = None
         self._uptimes: Optional[Uptimes] = None
+        self._target_uptimes: Dict[Tuple[int], Uptimes] = {}
         self._checklist: Optional[ChecklistBuilder] = None
 
         self.char_id = char_id
@@ -62,15 +124,61 @@ class ReportBuilder(object):
 
     async def build(self) -> Dict:
         """Execute report building steps."""
+        await self.prepare()
+        await self._requested_data.execute()
+        return await self.finish()
+
+    async def finish(self) -> Dict:
+        """Calculate uptimes & checklist based on already requested data."""
+        await self._calculate_uptimes()
+        with self.timings.measure('checklist'):
+            self._build_checklist()
+        with self.timings.measure('report'):
+            self._build_report()
+        if self._percentiles:
+            with self.timings.measure('percentiles'):
+                await self._rank()
+
+        return self.report
+
+    async def build_timeline(
+        self, width: int, format_: TimelineFormat,
+    ) -> Dict:
+        """Request effects only and draw when each of them was active."""
+        await self.prepare()
+        await self._requested_data.execute_effects()
+        self._get_char_effects()
+        with self.timings.measure('timeline'):
+            return self._timeline_report(width, format_)
+
+    async def build_cadence(self) -> Dict:
+        """Request casts events only and analyze their cadence."""
+        await self.prepare()
+        await self._requested_data.execute_casts()
+        with self.timings.measure('cadence'):
+            cadence = self._requested_data.cadence.calculate()
+        report = self._char_report()
+        report['cadence'] = cadence
+        return report
+
+    @property
+    def requested_data(self) -> Optional[DataRequest]:
+        return self._requested_data
+
+    async def prepare(self):
+        """Extract char & tracked info, raising if there is nothing to do."""
         if self.char_id:
-            self._get_char_info()
+            with self.timings.measure('char_info'):
+                self._get_char_info()
 
         self._tracked_info = TrackedInfo(
             summary_table=self._summary_table,
             char_class=self._char_class,
             encounter_info=self._encounter_info,
+            catalog=self._catalog,
         )
-        self._tracked_info.extract()
+        with self.timings.measure('tracked_info'):
+            self._tracked_info.extract()
 
         self._requested_data = DataRequest(
             api=self._api,
@@ -81,38 +189,70 @@ class ReportBuilder(object):
             char_id=self.char_id,
             tracked_info=self._tracked_info,
             target=self._target,
+            window=self._window(),
+            targets=(
+                self._tracked_info.targets
+                if self.char_id and self._all_targets
+                else None
+            ),
+            timings=self.timings,
         )
-        await self._requested_data.execute()
+        await self._requested_data.prepare()
 
-        if self.char_id:
-            self._get_char_buffs()
-            self._get_char_debuffs()
-            self._get_char_graphs()
+    async def build_stream(self) -> AsyncIterator[Dict]:
+        """Yield report sections as soon as their data is ready.
 
-        self._uptimes = Uptimes(
-            tracked_info=self._tracked_info,
-            requested_info=self._requested_data,
-            char_buffs=self._char_buffs,
-            char_debuffs=self._char_debuffs,
-            char_graphs=self._char_graphs,
-        )
-        self._uptimes.calculate()
+        Requires `prepare` to be awaited first. Every section is a part
+        of the full report, so they can be merged together on arrival.
+        Skills, sets & effects come with tables, stacks come with graphs
+        along with skills & sets updated by them
+        """
+        yield {'section': 'char', 'data': self._char_report()}
 
-        if (
-            self._requested_data.passives
-            and self._summary_table.combatant_info.gear
-        ):
-            self._checklist = ChecklistBuilder(
-                spec=self._char_spec,
-                class_=self._char_class,
-                gear=self._summary_table.combatant_info.gear,
-                passives=self._requested_data.passives,
-            )
-            self._checklist.build()
+        tables = asyncio.create_task(self._requested_data.execute_tables())
+        graphs = asyncio.create_task(self._requested_data.execute_graphs())
+        passives = asyncio.create_task(self._requested_data.execute_passives())
+        pending = {tables, graphs, passives}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED,
+                )
+                if passives in done:
+                    passives.result()
+                    self._build_checklist()
+                    yield {
+                        'section': 'checklist',
+                        'data': self._checklist_report(),
+                    }
+                if tables in done:
+                    tables.result()
+                    await self._calculate_tables_uptimes()
+                    for section, report in self._uptimes_sections():
+                        if section in TABLES_SECTIONS:
+                            yield {'section': section, 'data': report}
+                # Stacks from graphs are added to uptimes of tables
+                if tables.done() and graphs.done() and (
+                    tables in done or graphs in done
+                ):
+                    graphs.result()
+                    await self._calculate_graphs_uptimes()
+                    for section, report in self._uptimes_sections():
+                        if section in GRAPHS_SECTIONS:
+                            yield {'section': section, 'data': report}
+        finally:
+            # Client might go away before everything is done
+            for task in pending:
+                task.cancel()
 
-        self._build_report()
+        yield {'section': 'done', 'data': {}}
 
-        return self.report
+    def _window(self) -> Optional[Tuple[int, int]]:
+        if not self._local_window:
+            return None
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.start_time, self.end_time
 
     def _get_char_info(self):
         logger.info('Getting char class and spec')
@@ -139,16 +279,25 @@ class ReportBuilder(object):
                 self._char_buffs.append(buff)
 
     def _get_char_debuffs(self):
-        if not self._requested_data.debuffs_table:
+        self._char_debuffs = self._extract_char_debuffs(
+            self._requested_data.debuffs_table,
+        )
+
+    def _extract_char_debuffs(
+        self, debuffs_table: Optional[EffectsTableData],
+    ) -> List[Aura]:
+        if not debuffs_table:
             logger.debug('No debuffs were found. The log is probably broken')
-            return
+            return []
 
         logger.info('Extracting tracked debuffs from debuffs table')
+        char_debuffs = []
         debuff_ids = {debuff.id for debuff in self._tracked_info.debuffs}
-        for debuff in self._requested_data.debuffs_table.auras:
+        for debuff in debuffs_table.auras:
             if debuff.guid in debuff_ids:
                 logger.debug(debuff.name)
-                self._char_debuffs.append(debuff)
+                char_debuffs.append(debuff)
+        return char_debuffs
 
     def _get_char_graphs(self):
         if not self._requested_data.graphs:
@@ -163,42 +312,164 @@ class ReportBuilder(object):
                 if series:
                     self._char_graphs[id_].append(series)
 
+    def _get_char_effects(self):
+        if self.char_id:
+            self._get_char_buffs()
+            self._get_char_debuffs()
+            self._get_char_graphs()
+
+    async def _calculate_uptimes(self):
+        self._get_char_effects()
+
+        self._uptimes = await self._calculate('uptimes', self._uptimes_args())
+
+        if self.char_id and self._all_targets:
+            await self._calculate_target_uptimes()
+
+    async def _calculate_tables_uptimes(self):
+        if self.char_id:
+            self._get_char_buffs()
+            self._get_char_debuffs()
+
+        self._uptimes = await self._calculate(
+            'uptimes',
+            self._uptimes_args(),
+            [
+                stack
+                for stack in self._tracked_info.stacks
+                if not _from_graph(stack)
+            ],
+        )
+
+        if self.char_id and self._all_targets:
+            await self._calculate_target_uptimes()
+
+    async def _calculate_graphs_uptimes(self):
+        if not self.char_id:
+            return
+        self._get_char_graphs()
+
+        self._uptimes = await self._calculate(
+            'graphs_uptimes',
+            self._uptimes_args(calculated_stacks=self._uptimes.stacks),
+            [
+                stack
+                for stack in self._tracked_info.stacks
+                if _from_graph(stack)
+            ],
+        )
+
+    def _uptimes_args(
+        self, requested_data: Optional[DataRequest] = None, **kwargs,
+    ) -> Dict:
+        # Uptimes are built from slices of requested data they need,
+        # the rest of it never leaves the main process
+        requested_data = requested_data or self._requested_data
+        uptimes_args = {
+            'tracked_info': self._tracked_info,
+            'total_time': requested_data.total_time,
+            'casts': (
+                requested_data.damage_done_table.entries
+                if requested_data.damage_done_table
+                else []
+            ),
+            'char_buffs': self._char_buffs,
+            'char_debuffs': self._char_debuffs,
+            'char_graphs': self._char_graphs,
+        }
+        if not self.char_id:
+            uptimes_args['buffs'] = _auras(requested_data.buffs_table)
+            uptimes_args['debuffs'] = _auras(requested_data.debuffs_table)
+        uptimes_args.update(kwargs)
+        return uptimes_args
+
+    async def _calculate(
+        self,
+        stage: str,
+        uptimes_args: Dict,
+        stacks: Optional[List[Stack]] = None,
+    ) -> Uptimes:
+        with self.timings.measure(stage):
+            if self._executor:
+                uptimes = await self._executor.run(
+                    'uptimes', calculate_uptimes, uptimes_args, stacks,
+                )
+            else:
+                uptimes = calculate_uptimes(uptimes_args, stacks)
+        # Stacks are measured inside, possibly in another process
+        self.timings.merge(uptimes.timings)
+        return uptimes
+
+    def _build_checklist(self):
+        if not self.char_id:
+            return
+
+        if (
+            self._requested_data.passives
+            and self._summary_table.combatant_info.gear
+        ):
+            self._checklist = ChecklistBuilder(
+                spec=self._char_spec,
+                class_=self._char_class,
+                gear=self._summary_table.combatant_info.gear,
+                passives=self._requested_data.passives,
+                catalog=self._catalog,
+            )
+            self._checklist.build()
+
+    async def _calculate_target_uptimes(self):
+        for target in self._tracked_info.targets:
+            logger.info('Calculating uptimes on {0}'.format(target.name))
+            requested_data = self._requested_data.for_target(target.id)
+            if requested_data is None:
+                logger.info('No tables of {0}'.format(target.name))
+                continue
+            # Graphs are of every target, so stacks are left out
+            self._target_uptimes[target.id] = await self._calculate(
+                'target_uptimes',
+                self._uptimes_args(
+                    requested_data,
+                    char_debuffs=self._extract_char_debuffs(
+                        requested_data.debuffs_table,
+                    ),
+                    char_graphs={},
+                ),
+                [],
+            )
+
+    async def _rank(self):
+        if not self.char_id or not self._encounter_info:
+            return
+        if not self._encounter_info.encounter_id or not self._char_spec:
+            return
+
+        group = PercentileGroup(
+            encounter_id=self._encounter_info.encounter_id,
+            difficulty=self._encounter_info.difficulty,
+            char_class=self._char_class.value,
+            spec=self._char_spec,
+        )
+        self.report['percentiles'] = await self._percentiles.rank(
+            key='{0}/{1}/{2}'.format(self.log, self.fight_id, self.char_id),
+            group=group,
+            metrics=report_metrics(self._uptimes),
+        )
+
     def _build_report(self):
-        # TODO: Separate dataclass
-        def skip_functions(x):
-            return {k: v for (k, v) in x if not callable(v)}
+        self.report = self._char_report()
+        for _, report in self._uptimes_sections():
+            self.report.update(report)
+        self.report.update(self._checklist_report())
 
-        self.report = {
+    def _char_report(self) -> Dict:
+        return {
             'char': {
                 'id': self.char_id,
                 'name': self._char_name,
                 'class': self._char_class,
                 'spec': self._char_spec,
             } if self.char_id else {},
-            'skills':
-                [asdict(skill) for skill in self._uptimes.skills]
-                if self._uptimes.skills
-                else [],
-            'sets': [
-                asdict(gear_set, dict_factory=skip_functions)
-                for gear_set in self._uptimes.sets
-            ] if self._uptimes.sets else [],
-            'glyphs':
-                [asdict(glyph) for glyph in self._uptimes.glyphs]
-                if self._uptimes.glyphs
-                else [],
-            'buffs':
-                [asdict(buff) for buff in self._uptimes.buffs]
-                if not self.char_id and self._uptimes.buffs
-                else [],
-            'debuffs':
-                [asdict(debuff) for debuff in self._uptimes.debuffs]
-                if not self.char_id and self._uptimes.debuffs
-                else [],
-            'targets':
-                [asdict(target) for target in self._tracked_info.targets]
-                if self._tracked_info.targets
-                else [],
+            'targets': list(self._tracked_info.targets or []),
             'currentTarget': next(
                 (
                     target
@@ -206,8 +477,91 @@ class ReportBuilder(object):
                     if target.id == self._target
                 ), None,
             ),
+        }
+
+    def _uptimes_sections(self) -> Iterator[Tuple[str, Dict]]:
+        uptimes = _uptimes_report(self._uptimes)
+        # Target ids joined with ',' are used as keys
+        by_target = {
+            ','.join(map(str, target)): _uptimes_report(target_uptimes)
+            for target, target_uptimes in self._target_uptimes.items()
+        }
+        yield 'skills', {'skills': uptimes['skills']}
+        yield 'sets', {'sets': uptimes['sets'], 'glyphs': uptimes['glyphs']}
+        yield 'stacks', {
+            'stacks': list(self._uptimes.stacks),
+        }
+        yield 'effects', {
+            'buffs':
+                list(self._uptimes.buffs)
+                if not self.char_id
+                else [],
+            'debuffs':
+                list(self._uptimes.debuffs)
+                if not self.char_id
+                else [],
+            'byTarget': by_target,
+        }
+
+    def _checklist_report(self) -> Dict:
+        return {
             'checklist':
                 self._checklist.checklist
                 if self._checklist
                 else None,
         }
+
+    def _timeline_report(self, width: int, format_: TimelineFormat) -> Dict:
+        table = (
+            self._requested_data.buffs_table
+            or self._requested_data.debuffs_table
+        )
+        if table is None:
+            start_time, end_time = self.start_time or 0, self.end_time or 0
+        else:
+            start_time, end_time = table.start_time, table.end_time
+        timeline = Timeline(start_time, end_time, width, format_)
+
+        stacks = Stacks(
+            known_stacks=self._tracked_info.stacks,
+            char_graphs=self._char_graphs,
+            char_buffs=self._char_buffs,
+            char_debuffs=self._char_debuffs,
+            total_time=self._requested_data.total_time,
+        )
+        stacks_report = []
+        for stack in self._tracked_info.stacks:
+            if _from_graph(stack) and stack.id not in self._char_graphs:
+                continue
+            intervals = stacks.intervals(stack)
+            stacks_report.append({
+                'id': stack.id,
+                'name': stack.name,
+                # Stack levels are JSON keys, same as in stacks uptimes
+                'levels': {
+                    level: timeline.encode(spans_from_interval(interval))
+                    for level, interval in (intervals or {}).items()
+                },
+            })
+
+        return {
+            'startTime': timeline.start_time,
+            'endTime': timeline.end_time,
+            'width': timeline.width,
+            'format': format_.value,
+            'buffs': self._effects_timeline(timeline, self._char_buffs),
+            'debuffs': self._effects_timeline(timeline, self._char_debuffs),
+            'stacks': stacks_report,
+        }
+
+    def _effects_timeline(
+        self, timeline: Timeline, effects: List[Aura],
+    ) -> List[Dict]:
+        return [
+            {
+                'id': effect.guid,
+                'name': effect.name,
+                'data': timeline.encode(spans_from_bands(effect.bands)),
+            }
+            for effect in effects
+        ]
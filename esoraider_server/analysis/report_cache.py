@@ -0,0 +1,80 @@
+"""Cache of serialized analysis reports."""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from esoraider_server.data.registry import CATALOGS
+from esoraider_server.esologs.cache import ResponseCache
+
+
+def _identity_etag(etag: str) -> str:
+    # `"<hash>-gzip"` -> `"<hash>"`, hashes are hex so they have no dashes
+    etag = etag.strip().replace('W/', '', 1)
+    tag, dash, _ = etag.partition('-')
+    return '{0}"'.format(tag) if dash else etag
+
+
+@dataclass(frozen=True)
+class CachedReport:
+    body: bytes
+    etag: str
+    # Encoding -> compressed body, filled in as clients ask for them
+    encoded: Dict[str, bytes] = field(default_factory=dict, compare=False)
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """ETag of the report body in an encoding."""
+        if encoding is None:
+            return self.etag
+        return '{0}-{1}"'.format(self.etag[:-1], encoding)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Check `If-None-Match` header value against the report ETag."""
+        if not if_none_match:
+            return False
+
+        # Weak comparison, as it's meant to be for `If-None-Match`,
+        # any encoding of the same report matches
+        etags = {
+            _identity_etag(etag) for etag in if_none_match.split(',')
+        }
+        return '*' in etags or self.etag in etags
+
+
+class ReportCache(object):
+    """Reports are cached by a canonical form of their request.
+
+    Catalog version is a part of every key, so reports built with
+    outdated skills & sets data are never served after an update
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self._cache = ResponseCache(max_size=max_size, ttl=ttl)
+
+    def key(self, route: str, **params: Any) -> str:
+        """Build a key that doesn't depend on params order or defaults."""
+        return json.dumps(
+            {
+                'route': route,
+                'catalog': CATALOGS.version,
+                'params': {
+                    name: param
+                    for name, param in params.items()
+                    if param is not None
+                },
+            },
+            sort_keys=True,
+        )
+
+    def get(self, key: str) -> Optional[CachedReport]:
+        return self._cache.get(key)
+
+    def set(self, key: str, body: bytes) -> CachedReport:
+        # Strong ETag, equal reports are equal byte for byte
+        report = CachedReport(
+            body=body,
+            etag='"{0}"'.format(hashlib.sha256(body).hexdigest()[:32]),
+        )
+        self._cache.set(key, report)
+        return report
@@ -0,0 +1,140 @@
+"""JSON serialization of analysis reports."""
+
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class SerializationError(Exception):
+    def __init__(self, value: Any) -> None:
+        super().__init__(
+            "Can't serialize {0} to JSON".format(type(value).__name__),
+        )
+
+
+@lru_cache(maxsize=None)
+def _field_names(cls: type) -> Tuple[str, ...]:
+    return tuple(field.name for field in fields(cls))
+
+
+def _write_float(value: float, chunks: List[str]):
+    # Same output as json.dumps, including non standard NaN & Infinity
+    if value != value:
+        chunks.append('NaN')
+    elif value == float('inf'):
+        chunks.append('Infinity')
+    elif value == float('-inf'):
+        chunks.append('-Infinity')
+    else:
+        chunks.append(float.__repr__(value))
+
+
+def _key(key: Any) -> str:
+    if isinstance(key, Enum):
+        key = key.value
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    if key is None:
+        return '"null"'
+    if isinstance(key, bool):
+        return '"true"' if key else '"false"'
+    if isinstance(key, float):
+        return '"{0}"'.format(float.__repr__(key))
+    if isinstance(key, int):
+        return '"{0}"'.format(int.__repr__(key))
+    raise SerializationError(key)
+
+
+def _write_dict(value: Dict, chunks: List[str]):
+    if not value:
+        chunks.append('{}')
+        return
+
+    separator = '{'
+    for key, item in value.items():
+        chunks.append(separator)
+        chunks.append(_key(key))
+        chunks.append(':')
+        _write(item, chunks)
+        separator = ','
+    chunks.append('}')
+
+
+def _write_list(value: Any, chunks: List[str]):
+    if not value:
+        chunks.append('[]')
+        return
+
+    separator = '['
+    for item in value:
+        chunks.append(separator)
+        _write(item, chunks)
+        separator = ','
+    chunks.append(']')
+
+
+def _write_dataclass(value: Any, chunks: List[str]):
+    separator = '{'
+    for name in _field_names(type(value)):
+        item = getattr(value, name)
+        # Stack modifiers and such are not a part of the report
+        if callable(item):
+            continue
+        chunks.append(separator)
+        chunks.append(encode_basestring_ascii(name))
+        chunks.append(':')
+        _write(item, chunks)
+        separator = ','
+    chunks.append('}' if separator == ',' else '{}')
+
+
+_WRITERS: Dict[type, Callable[[Any, List[str]], None]] = {
+    str: lambda value, chunks: chunks.append(encode_basestring_ascii(value)),
+    int: lambda value, chunks: chunks.append(int.__repr__(value)),
+    float: _write_float,
+    bool: lambda value, chunks: chunks.append('true' if value else 'false'),
+    type(None): lambda value, chunks: chunks.append('null'),
+    dict: _write_dict,
+    list: _write_list,
+    tuple: _write_list,
+    set: _write_list,
+    frozenset: _write_list,
+}
+
+
+def _write(value: Any, chunks: List[str]):
+    writer = _WRITERS.get(type(value))
+    if writer:
+        writer(value, chunks)
+    elif isinstance(value, Enum):
+        _write(value.value, chunks)
+    elif is_dataclass(value) and not isinstance(value, type):
+        _write_dataclass(value, chunks)
+    elif isinstance(value, dict):
+        _write_dict(value, chunks)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        _write_list(value, chunks)
+    elif isinstance(value, bool):
+        _WRITERS[bool](value, chunks)
+    elif isinstance(value, int):
+        _WRITERS[int](value, chunks)
+    elif isinstance(value, float):
+        _write_float(value, chunks)
+    elif isinstance(value, str):
+        _WRITERS[str](value, chunks)
+    else:
+        raise SerializationError(value)
+
+
+def dump_report(report: Any) -> bytes:
+    """Serialize a report with its dataclasses straight into JSON bytes.
+
+    Dataclasses are written field by field as they are, instead of being
+    deep copied into dicts by `asdict` first. Field names are kept intact,
+    enums are written as their values and callable fields are skipped
+    """
+    chunks: List[str] = []
+    _write(report, chunks)
+    return ''.join(chunks).encode()
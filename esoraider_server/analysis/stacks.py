@@ -55,24 +55,25 @@ class Stacks(object):
         """Calculate stacks uptimes."""
         logger.info('Calculating stacks uptimes')
         for stack in self._known_stacks:
-            if not stack.buffs and not stack.debuffs:
-                uptimes = self._calculate_uptime_from_graph(stack)
-            elif stack.buffs or stack.debuffs:
-                uptimes = self._calculate_uptime_from_effects(stack)
+            intervals = self.intervals(stack)
+            if intervals is None:
+                uptimes = {0: 0.0}
             else:
-                uptimes = None
+                uptimes = self._calculate_stacks_uptimes(intervals)
 
             self.calculated.append(replace(stack, uptimes=uptimes))
 
-    def _calculate_uptime_from_graph(self, stack: Stack) -> Dict[int, float]:
-        series_list = self._char_graphs[stack.id]
-
-        intervals = self._calculate_intervals(
-            stack.max_stacks, series_list, stack.modifier,
+    def intervals(self, stack: Stack) -> Optional[Dict[int, Interval]]:
+        """Intervals of every stack level, if the stack is there at all."""
+        if stack.buffs or stack.debuffs:
+            return self._intervals_from_effects(stack)
+        return self._calculate_intervals(
+            stack.max_stacks, self._char_graphs[stack.id], stack.modifier,
         )
-        return self._calculate_stacks_uptimes(intervals)
 
-    def _calculate_uptime_from_effects(self, stack: Stack) -> Dict[int, float]:
+    def _intervals_from_effects(
+        self, stack: Stack,
+    ) -> Optional[Dict[int, Interval]]:
         if stack.buffs:
             char_effects = self._char_buffs
             effects_ids = [buff.id for buff in stack.buffs]
@@ -91,13 +92,13 @@ class Stacks(object):
                 "Effect of '{0}' was not found. It's probably because of an "
                 "incomplete set".format(stack.name),
             )
-            return {0: 0.0}
+            return None
 
         effects = [eff for eff in char_effects if eff.guid in effects_ids]
 
         ordered = sorted(effects, key=lambda ef: ef.total_uptime, reverse=True)
 
-        return self._calculate_complex_stacks_uptimes(
+        return self._calculate_complex_stacks_intervals(
             _convert_to_interval(main_effect.bands),
             [_convert_to_interval(buff.bands) for buff in ordered],
             stack.max_stacks,
@@ -130,12 +131,12 @@ class Stacks(object):
         return uptimes
 
     # Imagine doing all of this just for Z'en...
-    def _calculate_complex_stacks_uptimes(
+    def _calculate_complex_stacks_intervals(
         self,
         effect_with_stacks: Interval,
         effects: List[Interval],
         max_stacks: int,
-    ) -> Dict[int, float]:
+    ) -> Dict[int, Interval]:
         # Whole thing is based on debuff uptime intervals
         # Debuffs come in desc order, from highest uptime to lowest
         # Assuming there are 6 debuffs and 5 max stacks:
@@ -146,11 +147,11 @@ class Stacks(object):
         #      with combined
         # Last step for each stack is to intersect with the main debuff
         # to get final uptime
-        calculated_stacks: Dict[int, float] = {}
+        calculated_stacks: Dict[int, Interval] = {}
         for n_stacks in range(1, max_stacks + 1):
             # Not enough debuffs for stack calculation
             if n_stacks > len(effects):
-                calculated_stacks[n_stacks] = float(0)
+                calculated_stacks[n_stacks] = Interval()
                 continue
 
             to_union = len(effects) - n_stacks + 1
@@ -158,9 +159,8 @@ class Stacks(object):
                 effects, n_stacks, to_union,
             )
 
-            calculated_stacks[n_stacks] = _uptime_from_interval(
-                effects_intervals.intersection(effect_with_stacks),
-                self._total_time,
+            calculated_stacks[n_stacks] = effects_intervals.intersection(
+                effect_with_stacks,
             )
         return calculated_stacks
 
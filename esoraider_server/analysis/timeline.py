@@ -0,0 +1,139 @@
+"""Downsampled activity timelines of buffs, debuffs & stacks."""
+
+import base64
+from enum import Enum
+from typing import Iterable, List, Optional, Tuple, Union
+
+from portion.interval import Interval  # type: ignore
+
+from esoraider_server.esologs.responses.report_data.effects import Band
+
+# Widest timeline to be drawn, keeps payload bounded for any fight length
+MAX_WIDTH = 4096
+# Pixel is active when the effect covers at least that part of it
+PIXEL_THRESHOLD = 0.5
+
+Span = Tuple[int, int]
+
+
+class TimelineFormat(Enum):
+    RLE = 'rle'
+    BITMAP = 'bitmap'
+
+
+def spans_from_bands(bands: Optional[List[Band]]) -> List[Span]:
+    return [(band.start_time, band.end_time) for band in bands or []]
+
+
+def spans_from_interval(interval: Interval) -> List[Span]:
+    return [
+        (int(atomic.lower), int(atomic.upper))
+        for atomic in interval
+        if not atomic.empty
+    ]
+
+
+def merge_spans(
+    spans: Iterable[Span], start_time: int, end_time: int,
+) -> List[Span]:
+    """Clip spans to [start_time, end_time], joining overlapping ones."""
+    merged: List[Span] = []
+    for span_start, span_end in sorted(spans):
+        span_start = max(span_start, start_time)
+        span_end = min(span_end, end_time)
+        if span_start >= span_end:
+            continue
+        if merged and span_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], span_end))
+        else:
+            merged.append((span_start, span_end))
+    return merged
+
+
+def coverage(
+    spans: List[Span], start_time: int, end_time: int, width: int,
+) -> List[float]:
+    """Covered part of every pixel, spans have to be merged first.
+
+    Merged spans never overlap, so every pixel is visited once for each
+    span ending in it and once for a span covering it whole
+    """
+    pixels = [0.0] * width
+    pixel_size = (end_time - start_time) / width
+    for span_start, span_end in spans:
+        lower = (span_start - start_time) / pixel_size
+        upper = (span_end - start_time) / pixel_size
+        first = int(lower)
+        last = min(int(upper), width - 1)
+        for pixel in range(first, last + 1):
+            pixels[pixel] += min(upper, pixel + 1) - max(lower, pixel)
+    return pixels
+
+
+def downsample(
+    spans: List[Span], start_time: int, end_time: int, width: int,
+) -> List[bool]:
+    return [
+        covered >= PIXEL_THRESHOLD
+        for covered in coverage(spans, start_time, end_time, width)
+    ]
+
+
+def encode_rle(
+    pixels: List[bool], start_time: int, end_time: int,
+) -> List[List[int]]:
+    """Runs of active pixels as [start, end] times, snapped to pixels."""
+    pixel_size = (end_time - start_time) / len(pixels)
+    runs = []
+    run_start: Optional[int] = None
+    for pixel, active in enumerate([*pixels, False]):
+        if active and run_start is None:
+            run_start = pixel
+        elif not active and run_start is not None:
+            runs.append([
+                start_time + round(run_start * pixel_size),
+                start_time + round(pixel * pixel_size),
+            ])
+            run_start = None
+    return runs
+
+
+def encode_bitmap(pixels: List[bool]) -> str:
+    """Pixels packed into bits, most significant bit first, base64."""
+    packed = bytearray((len(pixels) + 7) // 8)
+    for pixel, active in enumerate(pixels):
+        if active:
+            packed[pixel // 8] |= 0x80 >> (pixel % 8)
+    return base64.b64encode(bytes(packed)).decode()
+
+
+class Timeline(object):
+    """Activity of effects over a fight, downsampled to a pixel width."""
+
+    def __init__(
+        self,
+        start_time: int,
+        end_time: int,
+        width: int,
+        format_: TimelineFormat,
+    ) -> None:
+        self.start_time = start_time
+        self.end_time = end_time
+        # Never more pixels than milliseconds
+        self.width = max(1, min(width, end_time - start_time))
+        self.format_ = format_
+
+    def encode(self, spans: Iterable[Span]) -> Union[List[List[int]], str]:
+        if self.end_time <= self.start_time:
+            pixels = [False] * self.width
+        else:
+            pixels = downsample(
+                merge_spans(spans, self.start_time, self.end_time),
+                self.start_time,
+                self.end_time,
+                self.width,
+            )
+
+        if self.format_ == TimelineFormat.BITMAP:
+            return encode_bitmap(pixels)
+        return encode_rle(pixels, self.start_time, self.end_time)
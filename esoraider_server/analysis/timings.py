@@ -0,0 +1,46 @@
+"""Timings of report building stages."""
+
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Iterator, TypeVar
+
+Result = TypeVar('Result')
+
+
+class Timings(object):
+    """Durations of named stages in milliseconds.
+
+    Stages measured more than once, i.e. for every player of a raid,
+    are summed up, so they might exceed the wall time of the whole build
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, (time.perf_counter() - started) * 1000)
+
+    async def measure_async(
+        self, stage: str, awaitable: Awaitable[Result],
+    ) -> Result:
+        with self.measure(stage):
+            return await awaitable
+
+    def add(self, stage: str, duration: float):
+        self.stages[stage] = self.stages.get(stage, 0) + duration
+
+    def merge(self, other: 'Timings'):
+        for stage, duration in other.stages.items():
+            self.add(stage, duration)
+
+    def server_timing(self) -> str:
+        """Format stages as a `Server-Timing` header value."""
+        return ', '.join(
+            '{0};dur={1:.1f}'.format(stage, duration)
+            for stage, duration in self.stages.items()
+        )
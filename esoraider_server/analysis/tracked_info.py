@@ -4,16 +4,6 @@ from typing import Dict, List, Optional, Set, Type
 
 from loguru import logger
 
-from esoraider_server.data.buffs import BUFFS
-from esoraider_server.data.classes.dragonknight.skills import (
-    DRAGONKNIGHT_SKILLS,
-)
-from esoraider_server.data.classes.general import GENERAL_SKILLS
-from esoraider_server.data.classes.necromancer.skills import NECROMANCER_SKILLS
-from esoraider_server.data.classes.nightblade.skills import NIGHTBLADE_SKILLS
-from esoraider_server.data.classes.sorcerer.skills import SORCERER_SKILLS
-from esoraider_server.data.classes.templar.skills import TEMPLAR_SKILLS
-from esoraider_server.data.classes.warden.skills import WARDEN_SKILLS
 from esoraider_server.data.core import (
     Buff,
     Debuff,
@@ -24,10 +14,7 @@ from esoraider_server.data.core import (
     Stack,
     Target,
 )
-from esoraider_server.data.debuffs import DEBUFFS
-from esoraider_server.data.encounters import Encounters
-from esoraider_server.data.glyphs import GLYPHS
-from esoraider_server.data.sets import GEAR_SETS
+from esoraider_server.data.registry import CATALOGS, Catalog
 from esoraider_server.esologs.consts import CharClass
 from esoraider_server.esologs.responses.common import Talent
 from esoraider_server.esologs.responses.report_data.fight import Fight
@@ -35,50 +22,42 @@ from esoraider_server.esologs.responses.report_data.summary import (
     SummaryTableData,
 )
 
+# Names of buffs & debuffs tracked during a whole fight
 FIGHT_BUFFS = (
-    BUFFS.MAJOR_COURAGE.value,  # Spell Power Cure, Olorime
-    BUFFS.MAJOR_FORCE.value,  # Saxhleel, Aggressive Horn
-    # BUFFS.MAJOR_PROPHECY.value,  # Potions
-    BUFFS.MAJOR_RESOLVE.value,  # Frost Cloak
-    # BUFFS.MAJOR_SAVAGERY.value,  # Potions
-    BUFFS.MAJOR_SLAYER.value,  # Master Architect, War Machine, Roaring
-    BUFFS.MAJOR_SORCERY.value,  # Potions, Igneous Weapons
-
-    BUFFS.MINOR_BERSERK.value,  # Combat Prayer
-    BUFFS.MINOR_PROPHECY.value,  # Sorc passive
-    BUFFS.MINOR_SAVAGERY.value,  # NB passive
-    BUFFS.MINOR_SORCERY.value,  # Templar passive
-
-    BUFFS.AGGRESSIVE_HORN.value,
+    'MAJOR_COURAGE',  # Spell Power Cure, Olorime
+    'MAJOR_FORCE',  # Saxhleel, Aggressive Horn
+    # 'MAJOR_PROPHECY',  # Potions
+    'MAJOR_RESOLVE',  # Frost Cloak
+    # 'MAJOR_SAVAGERY',  # Potions
+    'MAJOR_SLAYER',  # Master Architect, War Machine, Roaring
+    'MAJOR_SORCERY',  # Potions, Igneous Weapons
+
+    'MINOR_BERSERK',  # Combat Prayer
+    'MINOR_PROPHECY',  # Sorc passive
+    'MINOR_SAVAGERY',  # NB passive
+    'MINOR_SORCERY',  # Templar passive
+
+    'AGGRESSIVE_HORN',
 )
 FIGHT_DEBUFFS = (
-    DEBUFFS.MAJOR_BREACH.value,
-    DEBUFFS.MAJOR_VULNERABILITY.value,
+    'MAJOR_BREACH',
+    'MAJOR_VULNERABILITY',
 
-    DEBUFFS.MINOR_BREACH.value,
-    DEBUFFS.MINOR_BRITTLE.value,
-    DEBUFFS.MINOR_LIFESTEAL.value,
-    DEBUFFS.MINOR_MAGICKASTEAL.value,
-    DEBUFFS.MINOR_MAIM.value,
-    DEBUFFS.MINOR_VULNERABILITY.value,
+    'MINOR_BREACH',
+    'MINOR_BRITTLE',
+    'MINOR_LIFESTEAL',
+    'MINOR_MAGICKASTEAL',
+    'MINOR_MAIM',
+    'MINOR_VULNERABILITY',
 
-    DEBUFFS.CRUSHER.value,
+    'CRUSHER',
 )
 
 
 # Move to general skills?
-def _get_class_skills(char_class: str) -> Type[EsoEnum]:
-    classes = {
-        'Nightblade': NIGHTBLADE_SKILLS,
-        'DragonKnight': DRAGONKNIGHT_SKILLS,
-        'Warden': WARDEN_SKILLS,
-        'Templar': TEMPLAR_SKILLS,
-        'Necromancer': NECROMANCER_SKILLS,
-        'Sorcerer': SORCERER_SKILLS,
-    }
-
+def _get_class_skills(catalog: Catalog, char_class: str) -> Type[EsoEnum]:
     try:
-        return classes[char_class]
+        return catalog.class_skills[char_class]
     except KeyError:
         raise KeyError(
             'Class {0} is not known. Are you from the future?'.format(
@@ -115,7 +94,9 @@ class TrackedInfo(object):
         summary_table: Optional[SummaryTableData] = None,
         char_class: Optional[CharClass] = None,
         encounter_info: Optional[Fight] = None,
+        catalog: Optional[Catalog] = None,
     ) -> None:
+        self._catalog = catalog or CATALOGS.current
         self._summary_table = summary_table
         self._encounter_info = encounter_info
         self._char_class = char_class
@@ -129,11 +110,28 @@ class TrackedInfo(object):
         self.debuffs: List[Debuff] = []
         self.stacks: List[Stack] = []
 
+    def __getstate__(self) -> Dict:
+        # Summary & encounter are needed for extraction only, analysis
+        # workers get what is tracked
+        state = self.__dict__.copy()
+        state['_summary_table'] = None
+        state['_encounter_info'] = None
+        state['_char_skills'] = []
+        return state
+
+    @property
+    def catalog(self) -> Catalog:
+        return self._catalog
+
     def extract(self):
         """Extract known skills, sets, glyphs, buffs & debuffs with stacks."""
         if not self._summary_table and not self._char_class:
-            self.buffs = list(FIGHT_BUFFS)
-            self.debuffs = list(FIGHT_DEBUFFS)
+            self.buffs = [
+                self._catalog.buffs[name].value for name in FIGHT_BUFFS
+            ]
+            self.debuffs = [
+                self._catalog.debuffs[name].value for name in FIGHT_DEBUFFS
+            ]
             return
 
         self._get_encounter_targets()
@@ -162,7 +160,7 @@ class TrackedInfo(object):
         id_ = self._encounter_info.encounter_id
 
         try:
-            encounter = Encounters(id_)
+            encounter = self._catalog.encounters(id_)
         except StopIteration:
             logger.info(
                 'Targets for encounter = {0} were not found'.format(id_),
@@ -185,8 +183,10 @@ class TrackedInfo(object):
     def _get_known_skills(self):
         logger.info('Checking extracted skills in enum of skills to track')
 
-        general_skills = GENERAL_SKILLS
-        class_skills = _get_class_skills(self._char_class.value)
+        general_skills = self._catalog.general_skills
+        class_skills = _get_class_skills(
+            self._catalog, self._char_class.value,
+        )
 
         for skill in self._char_skills:
             for skills_enum in (general_skills, class_skills):
@@ -208,7 +208,7 @@ class TrackedInfo(object):
         }
         for gear_set in char_sets:
             try:
-                known_set = GEAR_SETS(gear_set).value
+                known_set = self._catalog.gear_sets(gear_set).value
             except StopIteration:
                 continue
             self.sets.append(known_set)
@@ -225,7 +225,7 @@ class TrackedInfo(object):
         }
         for enchant in char_enchants:
             try:
-                known_glyph = GLYPHS(enchant).value
+                known_glyph = self._catalog.glyphs(enchant).value
             except StopIteration:
                 continue
             self.glyphs.append(known_glyph)
@@ -5,8 +5,8 @@ from typing import Dict, List, Optional, Union, overload
 
 from loguru import logger
 
-from esoraider_server.analysis.data_request import DataRequest
 from esoraider_server.analysis.stacks import Stacks
+from esoraider_server.analysis.timings import Timings
 from esoraider_server.analysis.tracked_info import TrackedInfo
 from esoraider_server.data.core import (
     Buff,
@@ -25,59 +25,108 @@ class Uptimes(object):
     """Uptimes calculation based on provided info.
 
     Uptimes are calculated for skills, sets, glyphs, buffs & debuffs and their
-    stacks
+    stacks. Stacks can be calculated in parts, i.e. ones from effects before
+    graphs are there, or left out on a single target when graphs are of every
+    target
     """
 
     def __init__(
         self,
         tracked_info: TrackedInfo,
-        requested_info: DataRequest,
+        total_time: int,
+        casts: List[Cast],
         char_buffs: List[Aura],
         char_debuffs: List[Aura],
         char_graphs: Dict[int, List[Series]],
+        buffs: Optional[List[Aura]] = None,
+        debuffs: Optional[List[Aura]] = None,
+        calculated_stacks: Optional[List[Stack]] = None,
     ) -> None:
         self.skills: List[Skill] = []
         self.sets: List[GearSet] = []
         self.glyphs: List[Glyph] = []
         self.buffs: List[Buff] = []
         self.debuffs: List[Debuff] = []
-        self._stacks: List[Stack] = []
+        self.stacks: List[Stack] = list(calculated_stacks or [])
+        self.timings = Timings()
 
-        self._requested = requested_info
         self._tracked = tracked_info
+        self._total_time = total_time
+        self._casts = casts
 
         self._char_buffs = char_buffs
         self._char_debuffs = char_debuffs
         self._char_graphs = char_graphs
-
-    def calculate(self):
-        """Calculate uptimes based on provided data."""
+        # Effects of everyone, calculated when there is no char
+        self._buffs = buffs or []
+        self._debuffs = debuffs or []
+
+    def __getstate__(self) -> Dict:
+        # Only results are sent back from analysis workers
+        state = self.__dict__.copy()
+        for attr in (
+            '_tracked',
+            '_casts',
+            '_char_buffs',
+            '_char_debuffs',
+            '_char_graphs',
+            '_buffs',
+            '_debuffs',
+        ):
+            state[attr] = None
+        return state
+
+    def calculate(self, stacks: Optional[List[Stack]] = None):
+        """Calculate uptimes based on provided data.
+
+        Only the given stacks are calculated when set, on top of the ones
+        calculated before. Items are calculated with every stack known
+        """
         logger.info('Calculating uptimes')
 
         if not self._char_buffs and not self._char_debuffs:
             self.buffs = self._calculate_effects_uptimes(
-                self._tracked.buffs, self._requested.buffs_table.auras,
+                self._tracked.buffs, self._buffs,
             )
             self.debuffs = self._calculate_effects_uptimes(
-                self._tracked.debuffs, self._requested.debuffs_table.auras,
+                self._tracked.debuffs, self._debuffs,
             )
             return
 
+        self._calculate_stacks(
+            self._tracked.stacks if stacks is None else stacks,
+        )
+
+        self.skills = self._uptimes_of(self._tracked.skills)
+        self.sets = self._uptimes_of(self._tracked.sets)
+        self.glyphs = self._uptimes_of(self._tracked.glyphs)
+
+    def _calculate_stacks(self, known_stacks: List[Stack]):
+        if not known_stacks:
+            return
+
         stacks = Stacks(
-            known_stacks=self._tracked.stacks,
+            known_stacks=known_stacks,
             char_graphs=self._char_graphs,
             char_buffs=self._char_buffs,
             char_debuffs=self._char_debuffs,
-            total_time=self._requested.total_time,
+            total_time=self._total_time,
         )
-        stacks.calculate()
-        self._stacks = stacks.calculated
-        for _ in self._stacks:
+        with self.timings.measure('stacks'):
+            stacks.calculate()
+        for _ in stacks.calculated:
             logger.debug('{0} - {1}'.format(_.name, _.uptimes))
 
-        self.skills = self._uptimes_of(self._tracked.skills)
-        self.sets = self._uptimes_of(self._tracked.sets)
-        self.glyphs = self._uptimes_of(self._tracked.glyphs)
+        calculated = {
+            stack.id: stack
+            for stack in (*self.stacks, *stacks.calculated)
+        }
+        # Stacks are kept in the order they are tracked in
+        self.stacks = [
+            calculated[stack.id]
+            for stack in self._tracked.stacks
+            if stack.id in calculated
+        ]
 
     def _uptimes_of(self, eso_items):
         new_items = []
@@ -149,7 +198,7 @@ class Uptimes(object):
             else:
                 child_uptime = self._calculate_skill_or_effect_uptime(
                     child,
-                    self._requested.damage_done_table.entries,
+                    self._casts,
                 )
             if child_uptime:
                 new_children.append(replace(child, uptime=child_uptime))
@@ -169,7 +218,7 @@ class Uptimes(object):
                 buffs, debuffs, children,
             ) or self._calculate_skill_or_effect_uptime(
                 parent_item,
-                self._requested.damage_done_table.entries,
+                self._casts,
             )
         elif isinstance(parent_item, (GearSet, Glyph)):
             uptime = parent_item.bumped_uptime(buffs, debuffs)
@@ -201,10 +250,13 @@ class Uptimes(object):
         for effect in effects:
             stack = None
             if effect.stack:
+                # Stack might be not calculated yet, or at all
                 stack = next(
-                    stack
-                    for stack in self._stacks
-                    if stack.id == effect.stack.id
+                    (
+                        stack
+                        for stack in self.stacks
+                        if stack.id == effect.stack.id
+                    ), None,
                 )
 
             uptime = self._calculate_skill_or_effect_uptime(
@@ -252,12 +304,12 @@ class Uptimes(object):
             return skill_or_effect.calculate_uptime(
                 extracted.hit_count,
                 extracted.tick_count,
-                self._requested.total_time,
+                self._total_time,
             )
         elif is_effect and is_aura:
             return skill_or_effect.calculate_uptime(
                 extracted.total_uptime,
-                self._requested.total_time,
+                self._total_time,
                 stack,
             )
 
@@ -0,0 +1,120 @@
+"""Local time window slicing of full fight data."""
+
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+from esoraider_server.esologs.responses.report_data.effects import (
+    Aura,
+    Band,
+    EffectsTableData,
+)
+from esoraider_server.esologs.responses.report_data.graph import (
+    GraphData,
+    Series,
+)
+
+
+def clip_bands(
+    bands: List[Band], start_time: int, end_time: int,
+) -> List[Band]:
+    """Cut bands to fit into [start_time, end_time]."""
+    clipped = []
+    for band in bands:
+        band_start = max(band.start_time, start_time)
+        band_end = min(band.end_time, end_time)
+        if band_start < band_end:
+            clipped.append(Band(start_time=band_start, end_time=band_end))
+    return clipped
+
+
+def clip_aura(aura: Aura, start_time: int, end_time: int) -> Aura:
+    """Cut aura bands and recalculate its total uptime & uses.
+
+    Uses are bands starting within the window, a band carried over from
+    before the window was applied outside of it
+    """
+    if aura.bands is None:
+        return aura
+
+    bands = clip_bands(aura.bands, start_time, end_time)
+    return replace(
+        aura,
+        bands=bands,
+        total_uptime=sum(band.end_time - band.start_time for band in bands),
+        total_uses=sum(
+            1
+            for band in aura.bands
+            if start_time <= band.start_time < end_time
+        ),
+    )
+
+
+def clip_effects_table(
+    table: Optional[EffectsTableData], start_time: int, end_time: int,
+) -> Optional[EffectsTableData]:
+    """Cut buffs / debuffs table to a time window."""
+    if table is None:
+        return None
+
+    return replace(
+        table,
+        auras=[
+            clip_aura(aura, start_time, end_time)
+            for aura in table.auras
+        ],
+        start_time=start_time,
+        end_time=end_time,
+        total_time=end_time - start_time,
+    )
+
+
+def clip_series(series: Series, start_time: int, end_time: int) -> Series:
+    """Cut a step-like series of [time, stack] points to a time window.
+
+    Value active at the window start is carried over to its very beginning,
+    and the last value is closed at the window end if series goes beyond it
+    """
+    points: List[List[int]] = []
+    before: Optional[List[int]] = None
+    after: Optional[List[int]] = None
+    for point in series.data:
+        if point[0] <= start_time:
+            before = point
+        elif point[0] >= end_time:
+            after = point
+            break
+        else:
+            points.append(point)
+
+    if before is not None:
+        points.insert(0, [start_time, before[1]])
+    if after is not None and points:
+        points.append([end_time, points[-1][1]])
+
+    return replace(
+        series,
+        data=points,
+        events=[
+            event
+            for event in series.events
+            if start_time <= event.timestamp <= end_time
+        ],
+    )
+
+
+def clip_graphs(
+    graphs: Dict[int, GraphData], start_time: int, end_time: int,
+) -> Dict[int, GraphData]:
+    """Cut every graph series to a time window."""
+    return {
+        id_: replace(
+            graph,
+            series=[
+                clip_series(series, start_time, end_time)
+                for series in graph.series
+            ],
+            start_time=start_time,
+            end_time=end_time,
+        )
+        for id_, graph in graphs.items()
+    }
@@ -1,17 +1,93 @@
 import asyncio
-from typing import Optional, Tuple
+import signal
+from functools import partial
+from types import MappingProxyType
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from blacksheep import Content, Request, Response, StreamedContent
 from blacksheep.server import Application
 from blacksheep.server.responses import bad_request, json, not_found
 from gql.transport.exceptions import TransportQueryError  # type: ignore
+from loguru import logger
 
+from esoraider_server.admission import (
+    AdmissionControl,
+    AdmissionRejectedException,
+    client_id,
+)
+from esoraider_server.analysis.batch import (
+    BatchSpecException,
+    ReportSpec,
+    parse_specs,
+)
+from esoraider_server.analysis.char_history import CharHistory
+from esoraider_server.analysis.executor import AnalysisExecutor
+from esoraider_server.analysis.jobs import Job, JobQueue, JobStatus, JobStore
+from esoraider_server.analysis.log_analysis import LogAnalysis, Progress
+from esoraider_server.analysis.percentiles import PercentileIndex
+from esoraider_server.analysis.raid_report_builder import RaidReportBuilder
 from esoraider_server.analysis.report_builder import ReportBuilder
+from esoraider_server.analysis.report_cache import CachedReport, ReportCache
+from esoraider_server.analysis.serializer import dump_report
+from esoraider_server.analysis.timeline import MAX_WIDTH, TimelineFormat
+from esoraider_server.analysis.timings import Timings
 from esoraider_server.analysis.tracked_info import (
     NothingToTrackException,
     SkillsNotFoundException,
 )
-from esoraider_server.esologs.api import ApiWrapper
-from esoraider_server.settings import DEBUG, SHOW_ERROR_DETAILS
+from esoraider_server.compression import (
+    compress,
+    compression_middleware,
+    request_encoding,
+)
+from esoraider_server.data.catalog import warm_indexes
+from esoraider_server.data.core import Target
+from esoraider_server.data.registry import CATALOGS
+from esoraider_server.esologs.api import (
+    ApiWrapper,
+    ApiNotReadyException,
+    FightNotFoundException,
+    LogNotFoundException,
+)
+from esoraider_server.esologs.prefetch import Prefetcher
+from esoraider_server.settings import (
+    ADMISSION_CLIENT_HEADER,
+    ADMISSION_MAX_ACTIVE,
+    ADMISSION_MAX_PER_CLIENT,
+    ADMISSION_MAX_QUEUED,
+    ADMISSION_TIMEOUT,
+    ANALYSIS_MAX_PENDING,
+    ANALYSIS_WORKERS,
+    API_READY_TIMEOUT,
+    BATCH_CONCURRENCY,
+    BATCH_MAX_SIZE,
+    CATALOG_WATCH_INTERVAL,
+    COMPRESSION_MIN_SIZE,
+    DEBUG,
+    HISTORY_CONCURRENCY,
+    JOBS_CONCURRENCY,
+    JOBS_DB,
+    JOBS_FIGHT_CONCURRENCY,
+    JOBS_STALE_AFTER,
+    PERCENTILES_DB,
+    PREFETCH,
+    PREFETCH_BUDGET,
+    PREFETCH_CONCURRENCY,
+    PREFETCH_MAX_QUEUED,
+    REPORT_CACHE_SIZE,
+    REPORT_CACHE_TTL,
+    SHOW_ERROR_DETAILS,
+)
 
 app = Application(show_error_details=SHOW_ERROR_DETAILS, debug=DEBUG)
 
@@ -19,16 +95,27 @@ app.use_cors(
     allow_methods='*',
     allow_origins='*',
 )
+app.middlewares.append(compression_middleware(COMPRESSION_MIN_SIZE))
+
+PROBE_PATHS = frozenset(('/live', '/ready', '/metrics'))
 
 
 @app.route('/<str:log>')
-async def get_log(log: str, api: ApiWrapper):
+async def get_log(log: str, api: ApiWrapper, prefetcher: Prefetcher):
     response = await api.query_log(log)
 
     if isinstance(response, TransportQueryError):
         return not_found("This log is either private or doesn't exist")
 
-    return response.get('reportData').get('report')
+    report = response.get('reportData').get('report')
+    # A boss fight is most likely to be opened next
+    for fight in report.get('fights') or []:
+        if fight.get('encounterID'):
+            prefetcher.schedule(
+                (log, fight.get('id')),
+                partial(api.query_table, log=log, fight_id=fight.get('id')),
+            )
+    return report
 
 
 @app.route('/<str:log>/<int:fight>')
@@ -49,41 +136,722 @@ async def get_fight(
     return response.to_json()
 
 
+async def _cached_body(
+    cache: ReportCache,
+    key: str,
+    build: Callable[[Timings], Awaitable[Any]],
+    timings: Timings,
+    admission: AdmissionControl,
+    client: str,
+) -> CachedReport:
+    with timings.measure('cache'):
+        cached = cache.get(key)
+    if cached is None:
+        # Only builds count against admission limits, cache hits are cheap
+        async with admission.admit(client):
+            with timings.measure('build'):
+                report = await build(timings)
+        if DEBUG:
+            report['_timings'] = dict(timings.stages)
+        with timings.measure('serialize'):
+            body = dump_report(report)
+        cached = cache.set(key, body)
+    return cached
+
+
+async def _cached_report(
+    request: Request,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    key: str,
+    build: Callable[[Timings], Awaitable[Any]],
+) -> Response:
+    timings = Timings()
+    cached = await _cached_body(
+        cache,
+        key,
+        build,
+        timings,
+        admission,
+        client_id(request, ADMISSION_CLIENT_HEADER),
+    )
+
+    encoding = request_encoding(
+        request, len(cached.body), COMPRESSION_MIN_SIZE,
+    )
+    etag = (b'ETag', cached.etag_for(encoding).encode())
+    vary = (b'Vary', b'Accept-Encoding')
+    if_none_match = request.get_first_header(b'If-None-Match')
+    if cached.matches(if_none_match.decode() if if_none_match else None):
+        # Nothing is sent back, so there is nothing to compress either
+        return Response(304, [
+            etag,
+            vary,
+            (b'Server-Timing', timings.server_timing().encode()),
+        ])
+
+    # Compressed bodies are kept along with the report, so cache hits
+    # are served without compressing them again
+    body = cached.body
+    if encoding is not None:
+        body = cached.encoded.get(encoding)
+        if body is None:
+            with timings.measure('compress'):
+                body = await compress(cached.body, encoding)
+            cached.encoded[encoding] = body
+
+    headers = [
+        etag,
+        vary,
+        (b'Server-Timing', timings.server_timing().encode()),
+    ]
+    if encoding is not None:
+        headers.append((b'Content-Encoding', encoding.encode()))
+    return Response(200, headers, Content(b'application/json', body))
+
+
+async def _char_report_builder(
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    log: str,
+    fight: int,
+    char: int,
+    start_time: Optional[int],
+    end_time: Optional[int],
+    target: Optional[Tuple[int]],
+    local_window: bool,
+    all_targets: bool,
+    timings: Optional[Timings] = None,
+    percentiles: Optional[PercentileIndex] = None,
+) -> ReportBuilder:
+    # In local window mode everything is requested for the whole fight
+    # and sliced afterwards, so moving the window doesn't hit the API
+    response = await api.query_char_table(
+        log=log,
+        fight_id=fight,
+        char_id=char,
+        start_time=None if local_window else start_time,
+        end_time=None if local_window else end_time,
+    )
+
+    return ReportBuilder(
+        api=api,
+        log=log,
+        fight_id=fight,
+        char_id=char,
+        summary_table=response.table.data,
+        start_time=start_time,
+        end_time=end_time,
+        encounter_info=response.fights[0],
+        target=target,
+        local_window=local_window,
+        all_targets=all_targets,
+        executor=executor,
+        timings=timings,
+        # Only reports of a whole fight are compared to each other
+        percentiles=(
+            percentiles
+            if start_time is None and end_time is None and target is None
+            else None
+        ),
+    )
+
+
+async def _warm_target_report(
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    log: str,
+    fight: int,
+    char: int,
+    start_time: Optional[int],
+    end_time: Optional[int],
+    local_window: bool,
+    target: Tuple[int],
+):
+    """Request data of a char report on a target, without building it."""
+    report = await _char_report_builder(
+        api=api,
+        executor=executor,
+        log=log,
+        fight=fight,
+        char=char,
+        start_time=start_time,
+        end_time=end_time,
+        target=target,
+        local_window=local_window,
+        all_targets=False,
+    )
+    await report.prepare()
+    await report.requested_data.execute()
+
+
+def _prefetch_targets(
+    prefetcher: Prefetcher, targets: List[Target], **params: Any,
+):
+    """Warm char reports on every encounter target, as one is picked next."""
+    for target in targets:
+        target_id = tuple(target.id)
+        prefetcher.schedule(
+            (
+                params['log'],
+                params['fight'],
+                params['char'],
+                params['start_time'],
+                params['end_time'],
+                params['local_window'],
+                target_id,
+            ),
+            partial(_warm_target_report, target=target_id, **params),
+        )
+
+
+def _char_key(
+    cache: ReportCache,
+    log: str,
+    fight: int,
+    char: int,
+    start_time: Optional[int],
+    end_time: Optional[int],
+    target: Optional[Tuple[int]],
+    local_window: bool = False,
+    all_targets: bool = False,
+) -> str:
+    # Shared by single & batch char reports, so they share cached reports
+    return cache.key(
+        'char',
+        log=log,
+        fight=fight,
+        char=char,
+        start_time=start_time,
+        end_time=end_time,
+        target=target,
+        local_window=local_window,
+        all_targets=all_targets,
+    )
+
+
 @app.route('/<str:log>/<int:fight>/<int:char>')
 async def get_char(
+    request: Request,
     log: str,
     fight: int,
     char: int,
     api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    prefetcher: Prefetcher,
+    percentiles: PercentileIndex,
     start_time: Optional[int] = None,
     end_time: Optional[int] = None,
     target: Optional[Tuple[int]] = None,
+    local_window: bool = False,
+    all_targets: bool = False,
 ):
-    response = await api.query_char_table(
+    async def build(timings: Timings):
+        report = await _char_report_builder(
+            api=api,
+            executor=executor,
+            log=log,
+            fight=fight,
+            char=char,
+            start_time=start_time,
+            end_time=end_time,
+            target=target,
+            local_window=local_window,
+            all_targets=all_targets,
+            timings=timings,
+            percentiles=percentiles,
+        )
+        built = await report.build()
+        if not target and not all_targets:
+            _prefetch_targets(
+                prefetcher=prefetcher,
+                api=api,
+                executor=executor,
+                log=log,
+                fight=fight,
+                char=char,
+                start_time=start_time,
+                end_time=end_time,
+                local_window=local_window,
+                targets=built.get('targets') or [],
+            )
+        return built
+
+    key = _char_key(
+        cache,
         log=log,
-        fight_id=fight,
-        char_id=char,
+        fight=fight,
+        char=char,
+        start_time=start_time,
+        end_time=end_time,
+        target=target,
+        local_window=local_window,
+        all_targets=all_targets,
+    )
+    try:
+        return await _cached_report(request, cache, admission, key, build)
+    except (SkillsNotFoundException, NothingToTrackException) as ex:
+        return bad_request(str(ex))
+
+
+@app.route('/<str:log>/<int:fight>/<int:char>/timeline')
+async def get_char_timeline(
+    request: Request,
+    log: str,
+    fight: int,
+    char: int,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    width: int = 1000,
+    format: str = 'rle',  # noqa: WPS125
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    target: Optional[Tuple[int]] = None,
+    local_window: bool = False,
+):
+    if not 0 < width <= MAX_WIDTH:
+        return bad_request('Width should be from 1 to {0}'.format(MAX_WIDTH))
+    try:
+        format_ = TimelineFormat(format)
+    except ValueError:
+        return bad_request('Format should be one of: {0}'.format(
+            ', '.join(timeline.value for timeline in TimelineFormat),
+        ))
+
+    async def build(timings: Timings):
+        report = await _char_report_builder(
+            api=api,
+            executor=executor,
+            log=log,
+            fight=fight,
+            char=char,
+            start_time=start_time,
+            end_time=end_time,
+            target=target,
+            local_window=local_window,
+            all_targets=False,
+            timings=timings,
+        )
+        return await report.build_timeline(width, format_)
+
+    key = cache.key(
+        'timeline',
+        log=log,
+        fight=fight,
+        char=char,
+        start_time=start_time,
+        end_time=end_time,
+        target=target,
+        local_window=local_window,
+        width=width,
+        format=format_.value,
+    )
+    try:
+        return await _cached_report(request, cache, admission, key, build)
+    except (SkillsNotFoundException, NothingToTrackException) as ex:
+        return bad_request(str(ex))
+
+
+@app.route('/<str:log>/<int:fight>/<int:char>/cadence')
+async def get_char_cadence(
+    request: Request,
+    log: str,
+    fight: int,
+    char: int,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    local_window: bool = False,
+):
+    async def build(timings: Timings):
+        report = await _char_report_builder(
+            api=api,
+            executor=executor,
+            log=log,
+            fight=fight,
+            char=char,
+            start_time=start_time,
+            end_time=end_time,
+            target=None,
+            local_window=local_window,
+            all_targets=False,
+            timings=timings,
+        )
+        return await report.build_cadence()
+
+    key = cache.key(
+        'cadence',
+        log=log,
+        fight=fight,
+        char=char,
         start_time=start_time,
         end_time=end_time,
+        local_window=local_window,
     )
+    try:
+        return await _cached_report(request, cache, admission, key, build)
+    except (SkillsNotFoundException, NothingToTrackException) as ex:
+        return bad_request(str(ex))
+
 
-    report = ReportBuilder(
+@app.route('/<str:log>/<int:fight>/<int:char>/stream')
+async def get_char_stream(
+    request: Request,
+    log: str,
+    fight: int,
+    char: int,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    admission: AdmissionControl,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    target: Optional[Tuple[int]] = None,
+    local_window: bool = False,
+    all_targets: bool = False,
+    sse: bool = False,
+):
+    report = await _char_report_builder(
         api=api,
+        executor=executor,
         log=log,
-        fight_id=fight,
-        char_id=char,
-        summary_table=response.table.data,
+        fight=fight,
+        char=char,
         start_time=start_time,
         end_time=end_time,
-        encounter_info=response.fights[0],
         target=target,
+        local_window=local_window,
+        all_targets=all_targets,
     )
 
+    # Preparing only resolves fight boundaries, so broken reports are
+    # told apart before the response starts
     try:
-        return json(await report.build())
+        await report.prepare()
     except (SkillsNotFoundException, NothingToTrackException) as ex:
         return bad_request(str(ex))
 
+    # Sections are sent either as newline delimited JSON
+    # or as Server-Sent Events named after sections
+    def encode(section: Dict) -> bytes:  # noqa: WPS430
+        if sse:
+            return b''.join((
+                'event: {0}\ndata: '.format(section['section']).encode(),
+                dump_report(section['data']),
+                b'\n\n',
+            ))
+        return dump_report(section) + b'\n'
+
+    # Upstream requests & calculation are made while streaming, the slot
+    # is held until the stream is finished or the client goes away.
+    # The response is already started then, so rejection is a section
+    client = client_id(request, ADMISSION_CLIENT_HEADER)
+
+    async def sections() -> AsyncIterator[bytes]:  # noqa: WPS430
+        try:
+            async with admission.admit(client):
+                async for section in report.build_stream():
+                    yield encode(section)
+        except AdmissionRejectedException as ex:
+            yield encode({
+                'section': 'error',
+                'data': {
+                    'error': str(ex),
+                    'retryAfter': ex.retry_after,
+                },
+            })
+
+    content_type = b'text/event-stream' if sse else b'application/x-ndjson'
+    return Response(200, content=StreamedContent(content_type, sections))
+
+
+@app.route('/<str:log>/<int:fight>/raid')
+async def get_raid(
+    request: Request,
+    log: str,
+    fight: int,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+):
+    async def build(timings: Timings):
+        response = await api.query_char_table(
+            log=log,
+            fight_id=fight,
+            start_time=start_time,
+            end_time=end_time,
+        )
+
+        report = RaidReportBuilder(
+            api=api,
+            log=log,
+            fight_id=fight,
+            summary_table=response.table.data,
+            start_time=start_time,
+            end_time=end_time,
+            encounter_info=response.fights[0],
+            executor=executor,
+            timings=timings,
+        )
+        return await report.build()
+
+    key = cache.key(
+        'raid',
+        log=log,
+        fight=fight,
+        start_time=start_time,
+        end_time=end_time,
+    )
+    return await _cached_report(request, cache, admission, key, build)
+
+
+@app.route('/<str:log>/history/<int:char>')
+async def get_char_history(
+    request: Request,
+    log: str,
+    char: int,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    percentiles: PercentileIndex,
+):
+    response = await api.query_log(log)
+
+    if isinstance(response, TransportQueryError):
+        return not_found("This log is either private or doesn't exist")
+
+    async def build(timings: Timings):
+        history = CharHistory(
+            api=api,
+            log=log,
+            char_id=char,
+            fights=response.get('reportData').get('report').get('fights'),
+            concurrency=HISTORY_CONCURRENCY,
+            executor=executor,
+            timings=timings,
+            percentiles=percentiles,
+        )
+        return await history.build()
+
+    key = cache.key('history', log=log, char=char)
+    return await _cached_report(request, cache, admission, key, build)
+
+
+# Failed jobs answered as the same errors of the report routes
+JOB_ERROR_STATUSES = MappingProxyType({
+    LogNotFoundException.__name__: 404,
+    FightNotFoundException.__name__: 404,
+    SkillsNotFoundException.__name__: 400,
+    NothingToTrackException.__name__: 400,
+})
+
+
+async def _analyze_log(job: Job, progress: Progress) -> bytes:
+    response = await api_wrapper.query_log(job.log)
+    if isinstance(response, TransportQueryError):
+        raise LogNotFoundException()
+
+    def cache_fight(fight_id: int, report: Dict):  # noqa: WPS430
+        # Same report as the raid route builds for a whole fight
+        report_cache.set(
+            report_cache.key('raid', log=job.log, fight=fight_id),
+            dump_report(report),
+        )
+
+    analysis = LogAnalysis(
+        api=api_wrapper,
+        log=job.log,
+        fights=response.get('reportData').get('report').get('fights'),
+        concurrency=JOBS_FIGHT_CONCURRENCY,
+        executor=analysis_executor,
+        on_progress=progress,
+        on_fight_report=cache_fight,
+    )
+    return dump_report(await analysis.build())
+
+
+@app.route('/jobs/<str:log>', methods=['POST'])
+async def post_log_job(log: str, api: ApiWrapper, jobs: JobQueue):
+    response = await api.query_log(log)
+
+    if isinstance(response, TransportQueryError):
+        return not_found("This log is either private or doesn't exist")
+
+    job = await jobs.submit(log)
+    return json(job.state(), status=202)
+
+
+@app.route('/jobs/<str:job_id>')
+async def get_job(job_id: str, jobs: JobQueue):
+    job = await jobs.get(job_id)
+    if job is None:
+        return not_found('Job {0} is not known'.format(job_id))
+    return json(job.state())
+
+
+@app.route('/jobs/<str:job_id>/result')
+async def get_job_result(job_id: str, jobs: JobQueue):
+    job = await jobs.get(job_id)
+    if job is None:
+        return not_found('Job {0} is not known'.format(job_id))
+    if not job.finished:
+        return json(job.state(), status=202)
+    if job.status == JobStatus.FAILED:
+        # Bad input is answered as by the report routes, anything else
+        # is an error of the server
+        return json(
+            job.state(),
+            status=JOB_ERROR_STATUSES.get(job.error_type, 500),
+        )
+    return Response(200, content=Content(b'application/json', job.result))
+
+
+@app.route('/jobs/<str:job_id>/stream')
+async def get_job_stream(job_id: str, jobs: JobQueue, sse: bool = False):
+    if await jobs.get(job_id) is None:
+        return not_found('Job {0} is not known'.format(job_id))
+
+    # Same formats as report sections stream
+    async def states() -> AsyncIterator[bytes]:
+        async for job in jobs.watch(job_id):
+            if sse:
+                yield b''.join((
+                    'event: {0}\ndata: '.format(job.status.value).encode(),
+                    dump_report(job.state()),
+                    b'\n\n',
+                ))
+            else:
+                yield dump_report(job.state()) + b'\n'
+
+    content_type = b'text/event-stream' if sse else b'application/x-ndjson'
+    return Response(200, content=StreamedContent(content_type, states))
+
+
+async def _batch_report(
+    spec: ReportSpec,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    client: str,
+    percentiles: Optional[PercentileIndex] = None,
+) -> bytes:
+    async def build(timings: Timings):  # noqa: WPS430
+        report = await _char_report_builder(
+            api=api,
+            executor=executor,
+            log=spec.log,
+            fight=spec.fight,
+            char=spec.char,
+            start_time=spec.start_time,
+            end_time=spec.end_time,
+            target=spec.target,
+            local_window=False,
+            all_targets=False,
+            timings=timings,
+            percentiles=percentiles,
+        )
+        return await report.build()
+
+    key = _char_key(
+        cache,
+        log=spec.log,
+        fight=spec.fight,
+        char=spec.char,
+        start_time=spec.start_time,
+        end_time=spec.end_time,
+        target=spec.target,
+    )
+    try:
+        cached = await _cached_body(
+            cache, key, build, Timings(), admission, client,
+        )
+    except (
+        SkillsNotFoundException,
+        NothingToTrackException,
+        LogNotFoundException,
+        FightNotFoundException,
+        AdmissionRejectedException,
+    ) as ex:
+        # A broken report doesn't fail the whole batch
+        return dump_report({'error': str(ex)})
+    return cached.body
+
+
+@app.route('/batch', methods=['POST'])
+async def post_batch(
+    request: Request,
+    api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    percentiles: PercentileIndex,
+    stream: bool = False,
+):
+    try:
+        specs = parse_specs(await request.json(), BATCH_MAX_SIZE)
+    except BatchSpecException as ex:
+        return bad_request(str(ex))
+
+    # Identical specs are built once. Upstream requests shared by
+    # different reports (fight times, tables) are made once by the API
+    # wrapper as long as they are in flight at the same time
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    client = client_id(request, ADMISSION_CLIENT_HEADER)
+    builds: Dict[ReportSpec, asyncio.Task] = {}
+
+    async def limited(spec: ReportSpec) -> bytes:  # noqa: WPS430
+        async with semaphore:
+            return await _batch_report(
+                spec, api, executor, cache, admission, client, percentiles,
+            )
+
+    for spec in specs:
+        if spec not in builds:
+            builds[spec] = asyncio.create_task(limited(spec))
+    tasks = [builds[spec] for spec in specs]
+
+    if not stream:
+        reports = await asyncio.gather(*tasks)
+        return Response(200, content=Content(
+            b'application/json',
+            b''.join((b'{"reports": [', b', '.join(reports), b']}')),
+        ))
+
+    async def indexed(index: int, task: asyncio.Task):  # noqa: WPS430
+        return index, await asyncio.shield(task)
+
+    # Reports are sent as newline delimited JSON once they are ready
+    async def reports() -> AsyncIterator[bytes]:  # noqa: WPS430
+        try:
+            for ready in asyncio.as_completed([
+                indexed(index, task) for index, task in enumerate(tasks)
+            ]):
+                index, report = await ready
+                yield b''.join((
+                    '{{"index": {0}, "report": '.format(index).encode(),
+                    report,
+                    b'}\n',
+                ))
+        finally:
+            # Client might go away before everything is done
+            for task in tasks:
+                task.cancel()
+
+    return Response(200, content=StreamedContent(
+        b'application/x-ndjson', reports,
+    ))
+
 
 # TODO: Rewrite & probably move to enums
 # WIP, check `encounters.py`
@@ -98,38 +866,243 @@ async def get_encounter(encounter, api: ApiWrapper):
 
 @app.route('/fight/<str:log>/<int:fight>')
 async def get_fight_effects(
+    request: Request,
     log: str,
     fight: int,
     start_time: int,
     end_time: int,
     api: ApiWrapper,
+    executor: AnalysisExecutor,
+    cache: ReportCache,
+    admission: AdmissionControl,
+    local_window: bool = False,
 ):
-    report = ReportBuilder(
-        api=api,
+    async def build(timings: Timings):
+        report = ReportBuilder(
+            api=api,
+            log=log,
+            fight_id=fight,
+            start_time=start_time,
+            end_time=end_time,
+            local_window=local_window,
+            executor=executor,
+            timings=timings,
+        )
+        return await report.build()
+
+    key = cache.key(
+        'effects',
         log=log,
-        fight_id=fight,
+        fight=fight,
         start_time=start_time,
         end_time=end_time,
+        local_window=local_window,
+    )
+    return await _cached_report(request, cache, admission, key, build)
+
+
+@app.route('/live')
+async def get_live():
+    # Event loop is responsive, nothing else is checked
+    return json({'status': 'alive'})
+
+
+@app.route('/ready')
+async def get_ready(api: ApiWrapper):
+    # Catalog is warmed before the server accepts requests at all,
+    # the API connection & schema may take a while longer
+    checks = {'api': api.connected, 'catalog': CATALOGS.version}
+    if not api.connected:
+        return json({'status': 'starting', **checks}, status=503)
+    return json({'status': 'ready', **checks})
+
+
+@app.route('/metrics')
+async def get_metrics(
+    executor: AnalysisExecutor,
+    prefetcher: Prefetcher,
+    jobs: JobQueue,
+    admission: AdmissionControl,
+):
+    return json({
+        'admission': admission.stats(),
+        'executor': executor.stats(),
+        'prefetch': prefetcher.stats(),
+        'jobs': jobs.stats(),
+        'catalog': CATALOGS.version,
+    })
+
+
+async def not_found_handler(
+    app: Application,
+    request: Request,
+    ex: Union[LogNotFoundException, FightNotFoundException],
+):
+    return not_found(str(ex))
+
+
+app.exceptions_handlers[LogNotFoundException] = not_found_handler
+app.exceptions_handlers[FightNotFoundException] = not_found_handler
+
+
+async def too_many_requests_handler(
+    app: Application,
+    request: Request,
+    ex: AdmissionRejectedException,
+):
+    return Response(
+        429,
+        [(b'Retry-After', str(ex.retry_after).encode())],
+        Content(b'text/plain; charset=utf-8', str(ex).encode()),
+    )
+
+
+app.exceptions_handlers[AdmissionRejectedException] = (
+    too_many_requests_handler
+)
+
+
+async def not_ready_handler(
+    app: Application,
+    request: Request,
+    ex: ApiNotReadyException,
+):
+    return Response(
+        503,
+        [(b'Retry-After', b'5')],
+        Content(b'text/plain; charset=utf-8', str(ex).encode()),
     )
 
-    return json(await report.build())
+
+app.exceptions_handlers[ApiNotReadyException] = not_ready_handler
+
+
+async def readiness_middleware(request: Request, handler):
+    # Requests coming in right after a start wait for the API connection
+    # instead of failing, probes are answered right away
+    if request.path not in PROBE_PATHS:
+        try:
+            await api_wrapper.wait_connected(API_READY_TIMEOUT)
+        except ApiNotReadyException as ex:
+            return await not_ready_handler(app, request, ex)
+    return await handler(request)
 
 
 async def connect_api(app: Application) -> None:
     api = app.service_provider.get(ApiWrapper)
-    await api.connect()
+    try:
+        await api.connect()
+    except ApiNotReadyException:
+        # Connection is retried in the background, requests wait for it
+        logger.warning('API is not connected yet, still trying')
 
 
 async def configure_background_tasks(app):
     asyncio.get_event_loop().create_task(connect_api(app))
 
 
+async def warm_catalog(app: Application):
+    warm_indexes()
+
+
+def reload_catalog(app: Application):
+    # Reports are cached by catalog version, outdated ones just expire
+    if CATALOGS.reload():
+        warm_indexes()
+        app.service_provider[AnalysisExecutor].restart()
+
+
+async def watch_catalog_files(app: Application):
+    while True:
+        await asyncio.sleep(CATALOG_WATCH_INTERVAL)
+        if CATALOGS.changed():
+            logger.info('Data files changed, reloading catalog')
+            reload_catalog(app)
+
+
+async def watch_catalog(app: Application):
+    loop = asyncio.get_event_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_catalog, app)
+    except (AttributeError, NotImplementedError):
+        logger.warning('Catalog reload on SIGHUP is not supported here')
+    if CATALOG_WATCH_INTERVAL:
+        loop.create_task(watch_catalog_files(app))
+
+
+async def start_executor(app: Application):
+    executor = app.service_provider[AnalysisExecutor]
+    executor.start()
+    asyncio.get_event_loop().create_task(executor.watch_loop_lag())
+
+
+async def start_jobs(app: Application):
+    await app.service_provider[JobQueue].start()
+
+
+async def close_jobs(app: Application):
+    await app.service_provider[JobQueue].close()
+
+
+async def close_prefetcher(app: Application):
+    app.service_provider[Prefetcher].close()
+
+
 async def close_api(app: Application):
     service = app.service_provider[ApiWrapper]
     await service.close()
 
 
+async def close_percentiles(app: Application):
+    app.service_provider[PercentileIndex].close()
+
+
+async def close_executor(app: Application):
+    executor = app.service_provider[AnalysisExecutor]
+    executor.close()
+
+
+app.middlewares.append(readiness_middleware)
 app.on_start += configure_background_tasks
+app.on_start += warm_catalog
+app.on_start += watch_catalog
+app.on_start += start_executor
+app.on_start += start_jobs
+app.on_stop += close_jobs
+app.on_stop += close_prefetcher
 app.on_stop += close_api
+app.on_stop += close_executor
+app.on_stop += close_percentiles
 
-app.services.add_instance(ApiWrapper())
+api_wrapper = ApiWrapper()
+app.services.add_instance(api_wrapper)
+analysis_executor = AnalysisExecutor(
+    max_workers=ANALYSIS_WORKERS,
+    max_pending=ANALYSIS_MAX_PENDING,
+)
+app.services.add_instance(analysis_executor)
+app.services.add_instance(AdmissionControl(
+    max_active=ADMISSION_MAX_ACTIVE,
+    max_per_client=ADMISSION_MAX_PER_CLIENT,
+    max_queued=ADMISSION_MAX_QUEUED,
+    timeout=ADMISSION_TIMEOUT,
+))
+report_cache = ReportCache(
+    max_size=REPORT_CACHE_SIZE,
+    ttl=REPORT_CACHE_TTL,
+)
+app.services.add_instance(report_cache)
+app.services.add_instance(Prefetcher(
+    api=api_wrapper,
+    enabled=PREFETCH,
+    concurrency=PREFETCH_CONCURRENCY,
+    max_queued=PREFETCH_MAX_QUEUED,
+    budget=PREFETCH_BUDGET,
+))
+app.services.add_instance(JobQueue(
+    run=_analyze_log,
+    concurrency=JOBS_CONCURRENCY,
+    store=JobStore(JOBS_DB) if JOBS_DB else None,
+    stale_after=JOBS_STALE_AFTER,
+))
+app.services.add_instance(PercentileIndex(PERCENTILES_DB))
@@ -0,0 +1,103 @@
+"""Compression of response bodies."""
+
+import asyncio
+import gzip
+from typing import Awaitable, Callable, Dict, Optional
+
+from blacksheep import Content, Request, Response
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Preferred first, brotli is used only if it's installed
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=5)
+ENCODERS['gzip'] = lambda body: gzip.compress(body, compresslevel=6)
+
+COMPRESSIBLE_TYPES = (b'application/json', b'text/', b'application/x-ndjson')
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def _parse_accept_encoding(accept_encoding: str) -> Dict[str, float]:
+    qualities: Dict[str, float] = {}
+    for coding in accept_encoding.split(','):
+        name, _, params = coding.partition(';')
+        quality = 1.0
+        param, _, value = params.partition('=')
+        if param.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0
+        qualities[name.strip().lower()] = quality
+    return qualities
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best encoding a client accepts, if any."""
+    if not accept_encoding:
+        return None
+
+    qualities = _parse_accept_encoding(accept_encoding)
+    default = qualities.get('*', 0)
+    best: Optional[str] = None
+    best_quality = 0.0
+    # Ties are broken by our own preference
+    for encoding in ENCODERS:
+        quality = qualities.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+async def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body in a thread, zlib & brotli don't hold the GIL."""
+    return await asyncio.get_event_loop().run_in_executor(
+        None, ENCODERS[encoding], body,
+    )
+
+
+def request_encoding(
+    request: Request, body_size: int, min_size: int,
+) -> Optional[str]:
+    """Encoding of a response body to a request, if it's worth it."""
+    if body_size < min_size:
+        return None
+    accept_encoding = request.get_first_header(b'Accept-Encoding')
+    return negotiate(accept_encoding.decode() if accept_encoding else None)
+
+
+def compression_middleware(min_size: int):
+    """Compress response bodies no smaller than `min_size` bytes.
+
+    Responses which are streamed or already encoded are left as they are
+    """
+
+    async def middleware(request: Request, handler: Handler) -> Response:
+        response = await handler(request)
+        content = response.content
+        if (
+            content is None
+            or content.body is None
+            or response.get_first_header(b'Content-Encoding')
+            or not content.type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        if not response.get_first_header(b'Vary'):
+            response.add_header(b'Vary', b'Accept-Encoding')
+        encoding = request_encoding(request, len(content.body), min_size)
+        if encoding is None:
+            return response
+
+        response.add_header(b'Content-Encoding', encoding.encode())
+        response.content = Content(
+            content.type, await compress(content.body, encoding),
+        )
+        return response
+
+    return middleware
@@ -0,0 +1,124 @@
+"""Compiled snapshot & id indexes of the data catalog.
+
+The snapshot maps ids of every enum member to its name. It's committed
+along the data modules, so changed, removed or duplicated ids show up
+in the diff. Build it with `python -m esoraider_server.data.catalog build`
+and verify it matches the data modules with `... catalog check`
+"""
+
+import importlib
+import json
+import pkgutil
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Type
+
+from loguru import logger
+
+from esoraider_server.data.core import EsoEnum
+from esoraider_server.data.version import catalog_version
+
+SNAPSHOT_PATH = Path(__file__).parent / 'catalog.json'
+
+
+def _subclasses(cls: type) -> List[type]:
+    found = []
+    for subclass in cls.__subclasses__():
+        found.append(subclass)
+        found.extend(_subclasses(subclass))
+    return found
+
+
+@lru_cache(maxsize=None)
+def catalog_enums() -> List[Type[EsoEnum]]:
+    """Every enum of the catalog with members accessible by id."""
+    package = importlib.import_module(__package__)
+    prefix = '{0}.'.format(package.__name__)
+    for module in pkgutil.walk_packages(package.__path__, prefix):
+        importlib.import_module(module.name)
+    return sorted(
+        (
+            enum
+            for enum in _subclasses(EsoEnum)
+            if all(hasattr(member.value, 'id') for member in enum)
+        ),
+        key=lambda enum: '{0}.{1}'.format(enum.__module__, enum.__name__),
+    )
+
+
+def warm_indexes():
+    """Build id indexes of every enum before they're needed.
+
+    Forked analysis workers share them instead of building their own
+    """
+    for enum in catalog_enums():
+        enum.id_index()
+
+
+def compile_catalog() -> Dict:
+    enums = {}
+    for enum in catalog_enums():
+        ids: Dict[str, List[str]] = {}
+        for name, member in enum.__members__.items():
+            ids.setdefault(str(member.value.id), []).append(name)
+        enums['{0}.{1}'.format(enum.__module__, enum.__name__)] = ids
+    return {'version': catalog_version(), 'enums': enums}
+
+
+@lru_cache(maxsize=None)
+def load_snapshot() -> Dict:
+    return json.loads(SNAPSHOT_PATH.read_text())
+
+
+def build_snapshot():
+    SNAPSHOT_PATH.write_text(
+        '{0}\n'.format(json.dumps(compile_catalog(), indent=1)),
+    )
+
+
+def check_snapshot() -> List[str]:
+    """Differences between the snapshot and the data modules."""
+    if not SNAPSHOT_PATH.exists():
+        return ['Snapshot {0} is missing'.format(SNAPSHOT_PATH)]
+
+    problems = []
+    compiled = compile_catalog()
+    snapshot = load_snapshot()
+    if snapshot['version'] != compiled['version']:
+        problems.append('Snapshot version {0} != catalog version {1}'.format(
+            snapshot['version'], compiled['version'],
+        ))
+    for enum in sorted({*compiled['enums'], *snapshot['enums']}):
+        expected = compiled['enums'].get(enum, {})
+        if snapshot['enums'].get(enum, {}) != expected:
+            problems.append('{0} differs from the snapshot'.format(enum))
+        problems.extend(
+            '{0} has members with the same id {1}: {2}'.format(
+                enum, id_, ', '.join(names),
+            )
+            for id_, names in expected.items()
+            if len(names) > 1
+        )
+    return problems
+
+
+def main(argv: List[str]) -> int:
+    command = argv[0] if argv else 'check'
+    if command == 'build':
+        build_snapshot()
+        logger.info('Snapshot saved to {0}'.format(SNAPSHOT_PATH))
+        return 0
+    if command == 'check':
+        found = check_snapshot()
+        for problem in found:
+            logger.error(problem)
+        if not found:
+            logger.info('Snapshot matches the data modules')
+        return 1 if found else 0
+    logger.error('Usage: python -m esoraider_server.data.catalog build|check')
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
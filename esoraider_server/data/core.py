@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, MutableMapping, Optional, Tuple
+from weakref import WeakKeyDictionary
 
 from esoraider_server.esologs.consts import DataType
 
@@ -161,6 +162,14 @@ class Glyph:
         return uptime
 
 
+# Modifiers are plain functions of this static module instead of lambdas,
+# so stacks of any catalog version can be pickled and sent to analysis
+# worker processes
+def bahseis_mania_stacks(magicka_percent: int) -> int:
+    # 1 stack per each missing 6.67% of magicka
+    return round((100 - magicka_percent) * 0.15)
+
+
 @dataclass(frozen=True)
 class Stack:
     name: str
@@ -205,11 +214,31 @@ class Rule:
     buffs: Optional[List[Buff]] = None
 
 
+# Members of every enum by id, built on the first lookup of an enum.
+# Indexes of enums from reloaded catalogs go away along with them
+_ID_INDEXES: MutableMapping[type, Dict[int, 'EsoEnum']] = (
+    WeakKeyDictionary()
+)
+
+
 class EsoEnum(Enum):
     @classmethod
     def _missing_(cls, value):
         # This will allow access by id of a skill / set / buff / etc
         # i.e. BUFFS(40224) will return Skill(name='Aggressive Horn')
-        return next(filter(
-            lambda x: x.value.id == value, cls.__members__.values(),
-        ))
+        try:
+            return cls.id_index()[value]
+        except (KeyError, TypeError):
+            # Callers expect the error of the linear lookup it replaced
+            raise StopIteration(value)
+
+    @classmethod
+    def id_index(cls) -> Dict[int, 'EsoEnum']:
+        index = _ID_INDEXES.get(cls)
+        if index is None:
+            index = {}
+            for member in cls.__members__.values():
+                # First member wins, same as a linear lookup
+                index.setdefault(member.value.id, member)
+            _ID_INDEXES[cls] = index
+        return index
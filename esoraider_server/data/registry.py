@@ -0,0 +1,130 @@
+"""Versioned registry of the data catalog."""
+
+import importlib
+import sys
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Type
+
+from loguru import logger
+
+from esoraider_server.data.catalog import catalog_enums
+from esoraider_server.data.core import EsoEnum
+from esoraider_server.data.version import (
+    PACKAGE,
+    STATIC_MODULES,
+    catalog_version,
+)
+
+CLASS_SKILLS = {
+    'DragonKnight': ('classes.dragonknight.skills', 'DRAGONKNIGHT_SKILLS'),
+    'Necromancer': ('classes.necromancer.skills', 'NECROMANCER_SKILLS'),
+    'Nightblade': ('classes.nightblade.skills', 'NIGHTBLADE_SKILLS'),
+    'Sorcerer': ('classes.sorcerer.skills', 'SORCERER_SKILLS'),
+    'Templar': ('classes.templar.skills', 'TEMPLAR_SKILLS'),
+    'Warden': ('classes.warden.skills', 'WARDEN_SKILLS'),
+}
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """Enums of a single catalog version, used together for a report."""
+
+    version: str
+    buffs: Type[EsoEnum]
+    debuffs: Type[EsoEnum]
+    encounters: Type[EsoEnum]
+    gear_sets: Type[EsoEnum]
+    glyphs: Type[EsoEnum]
+    passives: Type[EsoEnum]
+    rules: Type[EsoEnum]
+    general_skills: Type[EsoEnum]
+    # Class name -> skills of the class
+    class_skills: Mapping[str, Type[EsoEnum]]
+
+
+def _enum(module: str, name: str) -> Type[EsoEnum]:
+    return getattr(
+        importlib.import_module('{0}.{1}'.format(PACKAGE, module)), name,
+    )
+
+
+def load_catalog() -> Catalog:
+    """Build a catalog from data modules currently imported."""
+    return Catalog(
+        version=catalog_version(),
+        buffs=_enum('buffs', 'BUFFS'),
+        debuffs=_enum('debuffs', 'DEBUFFS'),
+        encounters=_enum('encounters', 'Encounters'),
+        gear_sets=_enum('sets', 'GEAR_SETS'),
+        glyphs=_enum('glyphs', 'GLYPHS'),
+        passives=_enum('passives', 'Passives'),
+        rules=_enum('rules', 'Rules'),
+        general_skills=_enum('classes.general', 'GENERAL_SKILLS'),
+        class_skills={
+            class_: _enum(module, name)
+            for class_, (module, name) in CLASS_SKILLS.items()
+        },
+    )
+
+
+class CatalogRegistry(object):
+    """Holds the current catalog, swapping it for a new one on reload.
+
+    Data modules are imported anew, so modules importing them directly
+    keep the version they were started with. Reports take the catalog
+    once, so a reload never mixes two versions within a report
+    """
+
+    def __init__(self) -> None:
+        self._current: Optional[Catalog] = None
+        # Version which failed to import, not retried until changed again
+        self._failed: Optional[str] = None
+
+    @property
+    def current(self) -> Catalog:
+        if self._current is None:
+            self._current = load_catalog()
+        return self._current
+
+    @property
+    def version(self) -> str:
+        return self.current.version
+
+    def changed(self) -> bool:
+        """Check if data files differ from the current catalog."""
+        catalog_version.cache_clear()
+        return catalog_version() not in {self.version, self._failed}
+
+    def reload(self) -> bool:
+        """Import data modules anew and swap the catalog.
+
+        Current catalog is kept if the new one fails to import
+        """
+        catalog_version.cache_clear()
+        stale: Dict[str, object] = {
+            name: module
+            for name, module in sys.modules.items()
+            if name.startswith('{0}.'.format(PACKAGE))
+            and name not in STATIC_MODULES
+        }
+        for name in stale:
+            del sys.modules[name]
+
+        try:
+            catalog = load_catalog()
+        except Exception as ex:
+            logger.exception('Failed to reload data catalog: {0}'.format(ex))
+            sys.modules.update(stale)  # type: ignore
+            self._failed = catalog_version()
+            return False
+
+        catalog_enums.cache_clear()
+        previous = self._current
+        self._current = catalog
+        logger.info('Data catalog reloaded: {0} -> {1}'.format(
+            previous.version if previous else None, catalog.version,
+        ))
+        return True
+
+
+CATALOGS = CatalogRegistry()
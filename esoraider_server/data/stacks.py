@@ -3,7 +3,13 @@ from esoraider_server.data.classes.dragonknight.debuffs import (
 )
 from esoraider_server.data.classes.templar.debuffs import TEMPLAR_DEBUFFS
 from esoraider_server.data.classes.warden.debuffs import WARDEN_DEBUFFS
-from esoraider_server.data.core import Buff, Debuff, EsoEnum, Stack
+from esoraider_server.data.core import (
+    Buff,
+    Debuff,
+    EsoEnum,
+    Stack,
+    bahseis_mania_stacks,
+)
 from esoraider_server.data.debuffs import DEBUFFS
 from esoraider_server.esologs.consts import DataType
 
@@ -110,7 +116,7 @@ class STACKS(EsoEnum):
         icon='https://assets.rpglogs.com/img/eso/abilities/ability_mage_065.png',
         max_stacks=15,
         type_=DataType.RESOURCES,
-        modifier=lambda x: round((100 - x) * 0.15),
+        modifier=bahseis_mania_stacks,
     )
 
     #
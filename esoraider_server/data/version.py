@@ -0,0 +1,39 @@
+"""Version of the data catalog."""
+
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+PACKAGE = 'esoraider_server.data'
+# Modules shared by every catalog version, dataclasses of the catalog
+# must stay the same for pickling & isinstance checks
+STATIC_MODULES = frozenset((
+    PACKAGE,
+    '{0}.catalog'.format(PACKAGE),
+    '{0}.core'.format(PACKAGE),
+    '{0}.registry'.format(PACKAGE),
+    '{0}.version'.format(PACKAGE),
+))
+
+
+def _module(package: Path, path: Path) -> str:
+    parts = path.relative_to(package).with_suffix('').parts
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join((PACKAGE,) + parts)
+
+
+@lru_cache(maxsize=None)
+def catalog_version() -> str:
+    """Hash of data modules, changes whenever the catalog does.
+
+    Static modules are left out, they are never reloaded
+    """
+    digest = hashlib.sha256()
+    package = Path(__file__).parent
+    for path in sorted(package.rglob('*.py')):
+        if _module(package, path) in STATIC_MODULES:
+            continue
+        digest.update(str(path.relative_to(package)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
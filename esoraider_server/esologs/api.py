@@ -1,5 +1,8 @@
 import asyncio
-from typing import Dict, List, Optional, Union
+import json
+from collections import Counter
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
 import backoff  # type: ignore
 from gql import Client  # type: ignore
@@ -9,12 +12,15 @@ from gql.transport.exceptions import (  # type: ignore
     TransportClosed,
     TransportQueryError,
 )
+from graphql import DocumentNode, print_ast  # type: ignore
 from loguru import logger
 from oauthlib.oauth2 import BackendApplicationClient  # type: ignore
 from requests_oauthlib import OAuth2Session  # type: ignore
 
+from esoraider_server.esologs.cache import ResponseCache
 from esoraider_server.esologs.consts import DataType, HostilityType
 from esoraider_server.esologs.responses.base import BaseResponseData
+from esoraider_server.esologs.responses.rate_limit import RateLimitData
 from esoraider_server.esologs.responses.report_data.casts import CastsTableData
 from esoraider_server.esologs.responses.report_data.effects import (
     EffectsTableData,
@@ -28,11 +34,63 @@ from esoraider_server.esologs.responses.report_data.summary import (
     SummaryTableData,
 )
 from esoraider_server.esologs.responses.world_data.encounter import Encounter
-from esoraider_server.settings import CLIENT_ID, CLIENT_SECRET
+from esoraider_server.settings import (
+    CACHE_SIZE,
+    CACHE_TTL,
+    CLIENT_ID,
+    CLIENT_SECRET,
+    LOG_CACHE_TTL,
+    NEGATIVE_CACHE_TTL,
+)
 
 WAIT_FOR = 300
 TIMEOUT = 10.0
 
+TABLE_TYPES = MappingProxyType({
+    'Summary': SummaryTableData,
+    'DamageDone': CastsTableData,
+    'Casts': CastsTableData,
+    'Buffs': EffectsTableData,
+    'Debuffs': EffectsTableData,
+})
+# Parts of API error messages on reports which don't exist or are private,
+# i.e. "This report does not exist." or "You do not have permission..."
+MISSING_MARKERS = ('does not exist', 'permission', 'private')
+
+
+def _event_key(event: Dict) -> str:
+    return json.dumps(event, sort_keys=True)
+
+
+def _is_missing(ex: TransportQueryError) -> bool:
+    """Whether an API error means a missing or private report."""
+    message = str(ex).lower()
+    return any(marker in message for marker in MISSING_MARKERS)
+
+
+class LogNotFoundException(Exception):
+    def __init__(self) -> None:
+        super().__init__("This log is either private or doesn't exist")
+
+
+class FightNotFoundException(Exception):
+    def __init__(self, fight_id: int) -> None:
+        super().__init__("Fight {0} doesn't exist in this log".format(
+            fight_id,
+        ))
+
+
+class EventsPaginationException(Exception):
+    def __init__(self, timestamp: int) -> None:
+        super().__init__(
+            'Events pages are not moving past {0}'.format(timestamp),
+        )
+
+
+class ApiNotReadyException(Exception):
+    def __init__(self) -> None:
+        super().__init__('Not connected to ESO Logs API yet, try again later')
+
 
 class ApiWrapper:
     # https://github.com/graphql-python/gql/issues/179#issuecomment-749044193
@@ -48,6 +106,14 @@ class ApiWrapper:
         )
         self._session = None
         self._connect_task = None
+        self._cache = ResponseCache(max_size=CACHE_SIZE, ttl=CACHE_TTL)
+        # Requests being executed, shared by everyone asking the same
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Private & missing logs and fights, remembered for a short while
+        # in case they are made public or uploaded later
+        self._missing = ResponseCache(
+            max_size=CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL,
+        )
 
         self._close_request_event: Optional[asyncio.Event] = None
         self._reconnect_request_event: Optional[asyncio.Event] = None
@@ -78,7 +144,7 @@ class ApiWrapper:
                     self._session = session
                     self.ds = DSLSchema(self._client.schema)
                     logger.info('Connected to API')
-                    self._connected_event.set()
+                    self._connection_event().set()
 
                     # Wait for the close or reconnect event
                     self._close_request_event.clear()
@@ -109,6 +175,7 @@ class ApiWrapper:
                     # then we disconnect and connect again
             finally:
                 self._session = None
+                self._connection_event().clear()
                 logger.info('Disconnected from API')
         logger.info('Connection closed')
         self._closed_event.set()
@@ -117,18 +184,37 @@ class ApiWrapper:
         self._close_request_event = asyncio.Event()
         self._reconnect_request_event = asyncio.Event()
 
-        self._connected_event = asyncio.Event()
         self._closed_event = asyncio.Event()
 
         logger.info('Opening connection')
         if self._connect_task:
             logger.info('Already connected')
         else:
-            self._connected_event.clear()
             self._connect_task = asyncio.create_task(self._connection_loop())
+            await self.wait_connected(TIMEOUT)
+
+    @property
+    def connected(self) -> bool:
+        """Connected with the schema fetched, ready for queries."""
+        return self._session is not None and self.ds is not None
+
+    async def wait_connected(self, timeout: float):
+        """Wait for a connection, i.e. while starting or reconnecting."""
+        if self.connected:
+            return
+        try:
             await asyncio.wait_for(
-                self._connected_event.wait(), timeout=TIMEOUT,
+                self._connection_event().wait(), timeout=timeout,
             )
+        except asyncio.TimeoutError:
+            raise ApiNotReadyException()
+
+    def _connection_event(self) -> asyncio.Event:
+        # Created within the running loop, requests may wait for it
+        # before the connection is even opened
+        if self._connected_event is None:
+            self._connected_event = asyncio.Event()
+        return self._connected_event
 
     async def close(self):
         logger.info('Disconnecting')
@@ -137,8 +223,75 @@ class ApiWrapper:
         self._close_request_event.set()
         await asyncio.wait_for(self._closed_event.wait(), timeout=TIMEOUT)
 
+    async def execute(
+        self,
+        document: DocumentNode,
+        ttl: Optional[float] = None,
+        **kwargs,
+    ):
+        # Same query document means same data - finished fights never
+        # change, so repeated queries (i.e. full fight tables) are served
+        # from memory. Queries of a whole log pass a shorter `ttl`, as new
+        # fights are added to logs uploaded live
+        key = print_ast(document)
+        answer = self._cache.get(key)
+        if answer is not None:
+            logger.debug('Cache hit')
+            return answer
+
+        # Concurrent reports often need the same fight tables & times,
+        # they wait for a single request instead of making their own
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = asyncio.create_task(
+                self._execute_and_cache(key, document, ttl, **kwargs),
+            )
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(
+                lambda _: self._in_flight.pop(key, None),
+            )
+        else:
+            logger.debug('Joining request in flight')
+        # One of waiters going away doesn't cancel it for others
+        return await asyncio.shield(in_flight)
+
+    async def _execute_and_cache(
+        self,
+        key: str,
+        document: DocumentNode,
+        ttl: Optional[float],
+        **kwargs,
+    ):
+        await self.wait_connected(TIMEOUT)
+        answer = await self._execute(document, **kwargs)
+        if isinstance(answer, TransportQueryError):
+            # Other errors (i.e. timeouts or rate limits) may be gone
+            # with the next request, they are not remembered
+            if _is_missing(answer):
+                self._cache.set(key, answer, ttl=NEGATIVE_CACHE_TTL)
+        else:
+            self._cache.set(key, answer, ttl=ttl)
+        return answer
+
+    def check_missing(self, log: str, fight_id: Optional[int] = None):
+        """Raise right away if a log or a fight is known to be missing."""
+        for key in ((log, None), (log, fight_id)):
+            missing = self._missing.get(key)
+            if missing is not None:
+                logger.debug('Known missing {0}'.format(key))
+                raise missing.with_traceback(None)
+
+    def _set_missing(
+        self,
+        log: str,
+        fight_id: Optional[int],
+        ex: Union[LogNotFoundException, FightNotFoundException],
+    ):
+        logger.info('Remembering {0} as missing'.format((log, fight_id)))
+        self._missing.set((log, fight_id), ex)
+
     @backoff.on_exception(backoff.expo, Exception, max_tries=3)
-    async def execute(self, *args, **kwargs):
+    async def _execute(self, *args, **kwargs):
         try:
             answer = await self._session.execute(*args, **kwargs)
         except TransportClosed:
@@ -174,8 +327,24 @@ class ApiWrapper:
             await self.execute(dsl_gql(DSLQuery(query))),
         ).world_data.encounter
 
+    async def query_rate_limit(self) -> Optional[RateLimitData]:
+        logger.info('Requesting rate limit')
+        await self.wait_connected(TIMEOUT)
+        query = self.ds.Query.rateLimitData.select(
+            self.ds.RateLimitData.limitPerHour,
+            self.ds.RateLimitData.pointsSpentThisHour,
+            self.ds.RateLimitData.pointsResetIn,
+        )
+
+        # Points are spent all the time, so it's never cached
+        response = await self._execute(dsl_gql(DSLQuery(query)))
+        if isinstance(response, TransportQueryError):
+            return None
+        return BaseResponseData.from_dict(response).rate_limit_data
+
     async def query_log(self, log: str):
         logger.info('Requesting log {0}'.format(log))
+        self.check_missing(log)
         query = self.ds.Query.reportData
 
         report = self.ds.ReportData.report(code=log)
@@ -201,7 +370,34 @@ class ApiWrapper:
         )
 
         query.select(report_fields)
-        return await self.execute(dsl_gql(DSLQuery(query)))
+        response = await self.execute(
+            dsl_gql(DSLQuery(query)), ttl=LOG_CACHE_TTL,
+        )
+        if isinstance(response, TransportQueryError) and _is_missing(response):
+            self._set_missing(log, None, LogNotFoundException())
+        return response
+
+    async def query_abilities(self, log: str) -> Dict[int, str]:
+        """Names of every ability seen in a log, by their ids."""
+        logger.info('Requesting abilities of log {0}'.format(log))
+        query = self.ds.Query.reportData
+        report = self.ds.ReportData.report(code=log)
+        abilities = self.ds.ReportMasterData.abilities.select(
+            self.ds.ReportAbility.gameID,
+            self.ds.ReportAbility.name,
+        )
+        query.select(report.select(
+            self.ds.Report.masterData.select(abilities),
+        ))
+
+        response = await self.execute(dsl_gql(DSLQuery(query)))
+        if isinstance(response, TransportQueryError):
+            return {}
+        master_data = response['reportData']['report']['masterData']
+        return {
+            ability['gameID']: ability['name']
+            for ability in master_data['abilities'] or []
+        }
 
     async def query_fight_times(self, log: str, fight_id: int):
         logger.info('Requesting fight times of log = {0}, fight = {1}'.format(
@@ -217,7 +413,9 @@ class ApiWrapper:
         report_fields = report.select(fight_fields)
 
         query.select(report_fields)
-        return await self.execute(dsl_gql(DSLQuery(query)))
+        return await self.execute(
+            dsl_gql(DSLQuery(query)), ttl=LOG_CACHE_TTL,
+        )
 
     async def query_table(
         self,
@@ -241,9 +439,10 @@ class ApiWrapper:
         logger.info('Source ID = {0}'.format(source_id))
         logger.info('Target ID = {0}'.format(target_id))
         logger.info('Filter = {0}'.format(filter_exp))
+        self.check_missing(log, fight_id)
 
         if (start_time is None) and (end_time is None):
-            start_time, end_time = await self._get_fight_times(log, fight_id)
+            start_time, end_time = await self.get_fight_times(log, fight_id)
 
         query = self.ds.Query.reportData
 
@@ -265,22 +464,72 @@ class ApiWrapper:
             await self.execute(dsl_gql(DSLQuery(query))),
         )
 
-        types = {
-            'Summary': SummaryTableData,
-            'DamageDone': CastsTableData,
-            'Casts': CastsTableData,
-            'Buffs': EffectsTableData,
-            'Debuffs': EffectsTableData,
-        }
-        table_data = types[data_type]
+        table_data = TABLE_TYPES[data_type]
 
         return table_data.from_dict(response.report_data.report.table.data)
 
+    async def query_tables(
+        self,
+        log: str,
+        tables: Dict[str, DSLField],
+    ) -> Dict[str, Union[SummaryTableData, CastsTableData, EffectsTableData]]:
+        logger.info('Requesting {0} tables'.format(len(tables)))
+        logger.info('Log = {0}'.format(log))
+
+        query = self.ds.Query.reportData
+
+        report = self.ds.ReportData.report(code=log)
+        report_fields = report.select(**tables)
+
+        query.select(report_fields)
+
+        response = await self.execute(dsl_gql(DSLQuery(query)))
+        response = response.get('reportData')
+        response = response.get('report')
+
+        return {
+            alias: TABLE_TYPES[alias.split('_')[0]].from_dict(
+                table.get('data'),
+            )
+            for alias, table in response.items()
+        }
+
+    async def partial_query_table(
+        self,
+        key: str,
+        start_time: int,
+        end_time: int,
+        data_type: str = 'Summary',
+        hostility_type: str = 'Friendlies',
+        source_id: int = None,
+        target_id: int = None,
+        filter_exp: str = None,
+    ) -> Dict[str, DSLField]:
+        logger.info('Building partial table request')
+        logger.info('Key = {0}'.format(key))
+        logger.info('Data Type = {0}'.format(data_type))
+        logger.info('Hostility Type = {0}'.format(hostility_type))
+        logger.info('Source ID = {0}'.format(source_id))
+        logger.info('Target ID = {0}'.format(target_id))
+        logger.info('Filter = {0}'.format(filter_exp))
+
+        return {
+            '{0}_{1}'.format(data_type, key): self.ds.Report.table(
+                startTime=start_time,
+                endTime=end_time,
+                dataType=data_type,
+                hostilityType=hostility_type,
+                sourceID=source_id,
+                targetID=target_id,
+                filterExpression=filter_exp,
+            ),
+        }
+
     async def query_char_table(
         self,
         log: str,
         fight_id: int,
-        char_id: int,
+        char_id: Optional[int] = None,
         start_time: int = None,
         end_time: int = None,
     ) -> Report:
@@ -290,9 +539,10 @@ class ApiWrapper:
         logger.info('Char ID = {0}'.format(char_id))
         logger.info('Start Time = {0}'.format(start_time))
         logger.info('End Time = {0}'.format(end_time))
+        self.check_missing(log, fight_id)
 
         if (start_time is None) and (end_time is None):
-            start_time, end_time = await self._get_fight_times(log, fight_id)
+            start_time, end_time = await self.get_fight_times(log, fight_id)
 
         query = self.ds.Query.reportData
 
@@ -321,7 +571,7 @@ class ApiWrapper:
     async def query_events(
         self,
         log: str,
-        char_id: int,
+        char_id: Optional[int],
         start_time: int,
         end_time: int,
         data_type: str = 'CombatantInfo',
@@ -362,6 +612,95 @@ class ApiWrapper:
             for event in response.report_data.report.events.data
         ]
 
+    async def stream_events(
+        self,
+        log: str,
+        data_type: DataType,
+        start_time: int,
+        end_time: int,
+        hostility_type: HostilityType = HostilityType.FRIENDLIES,
+        source_id: Optional[int] = None,
+        target_id: Optional[int] = None,
+        filter_exp: Optional[str] = None,
+    ) -> AsyncIterator[List[Dict]]:
+        """Yield raw events page by page, as the API paginates them.
+
+        Pages are requested one at a time and are not cached, so a consumer
+        processes a page while holding no more than it in memory
+        """
+        logger.info('Streaming {0} events of log {1}'.format(
+            data_type.value, log,
+        ))
+        self.check_missing(log)
+        # Same forbidden magic as for `query_events`, for the first page
+        # only. Events before the start are dropped below instead
+        page_start = start_time - 1000
+        # Events of a page at the start of the next one, which may come
+        # again with the next page
+        boundary: Counter = Counter()
+        pages = 0
+        while True:
+            paginator = await self._events_page(log, self.ds.Report.events(
+                startTime=page_start,
+                endTime=end_time,
+                dataType=data_type.value,
+                hostilityType=hostility_type.value,
+                sourceID=source_id,
+                targetID=target_id,
+                filterExpression=filter_exp,
+            ))
+            pages += 1
+
+            page = []
+            for event in paginator.get('data') or []:
+                if not start_time <= event['timestamp'] <= end_time:
+                    continue
+                key = _event_key(event)
+                if event['timestamp'] == page_start and boundary[key]:
+                    boundary[key] -= 1
+                    continue
+                page.append(event)
+            yield page
+
+            next_page = paginator.get('nextPageTimestamp')
+            if next_page is None:
+                break
+            if next_page <= page_start:
+                # Same page again would never end
+                raise EventsPaginationException(page_start)
+            boundary = Counter(
+                _event_key(event)
+                for event in page
+                if event['timestamp'] == next_page
+            )
+            page_start = next_page
+        logger.info('Got {0} pages of {1} events'.format(
+            pages, data_type.value,
+        ))
+
+    async def _events_page(self, log: str, events: DSLField) -> Dict:
+        query = self.ds.Query.reportData
+        report = self.ds.ReportData.report(code=log)
+        query.select(report.select(events.select(
+            self.ds.ReportEventPaginator.data,
+            self.ds.ReportEventPaginator.nextPageTimestamp,
+        )))
+
+        # Pages bypass the cache & requests in flight, they are used once
+        await self.wait_connected(TIMEOUT)
+        response = await self._execute(dsl_gql(DSLQuery(query)))
+        if isinstance(response, TransportQueryError):
+            if not _is_missing(response):
+                raise response
+            ex = LogNotFoundException()
+            self._set_missing(log, None, ex)
+            raise ex
+
+        report_data = (response.get('reportData') or {}).get('report')
+        if report_data is None:
+            raise LogNotFoundException()
+        return report_data.get('events') or {}
+
     async def query_graph(
         self,
         log: str,
@@ -385,7 +724,7 @@ class ApiWrapper:
         logger.info('Hostility Type = {0}'.format(hostility_type))
 
         if (start_time is None) and (end_time is None):
-            start_time, end_time = await self._get_fight_times(log, fight_id)
+            start_time, end_time = await self.get_fight_times(log, fight_id)
 
         query = self.ds.Query.reportData
 
@@ -415,6 +754,30 @@ class ApiWrapper:
             for id_, graph in response.items()
         }
 
+    async def query_graphs(
+        self,
+        log: str,
+        graphs: Dict[str, DSLField],
+    ) -> Dict[str, GraphData]:
+        logger.info('Requesting {0} graphs'.format(len(graphs)))
+        logger.info('Log = {0}'.format(log))
+
+        query = self.ds.Query.reportData
+
+        report = self.ds.ReportData.report(code=log)
+        report_fields = report.select(**graphs)
+
+        query.select(report_fields)
+
+        response = await self.execute(dsl_gql(DSLQuery(query)))
+        response = response.get('reportData')
+        response = response.get('report')
+
+        return {
+            alias: GraphData.from_dict(graph.get('data'))
+            for alias, graph in response.items()
+        }
+
     async def partial_query_graph(
         self,
         data_type: DataType,
@@ -447,7 +810,22 @@ class ApiWrapper:
             ),
         }
 
-    async def _get_fight_times(self, log: str, fight_id: int):
+    async def get_fight_times(
+        self, log: str, fight_id: int,
+    ) -> Tuple[int, int]:
+        self.check_missing(log, fight_id)
         response = await self.query_fight_times(log, fight_id)
-        response = response.get('reportData').get('report').get('fights')[0]
-        return response.get('startTime'), response.get('endTime')
+        if isinstance(response, TransportQueryError):
+            if not _is_missing(response):
+                raise response
+            ex = LogNotFoundException()
+            self._set_missing(log, None, ex)
+            raise ex
+
+        fights = response.get('reportData').get('report').get('fights')
+        if not fights:
+            ex = FightNotFoundException(fight_id)
+            self._set_missing(log, fight_id, ex)
+            raise ex
+
+        return fights[0].get('startTime'), fights[0].get('endTime')
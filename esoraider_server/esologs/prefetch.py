@@ -0,0 +1,119 @@
+"""Speculative prefetch of API responses."""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from esoraider_server.esologs.api import ApiWrapper
+
+
+class Prefetcher(object):
+    """Requests data a user is likely to open next, in the background.
+
+    Responses end up in the API wrapper cache, so the next step of a user
+    doesn't wait for the API. Prefetch has a low priority: only a few
+    requests are made at once, the queue is bounded and nothing is
+    requested once too much of the hourly API points budget is spent.
+    Every prefetch is keyed by a tuple starting with its log code
+    """
+
+    def __init__(
+        self,
+        api: ApiWrapper,
+        enabled: bool,
+        concurrency: int,
+        max_queued: int,
+        budget: float,
+        budget_check_interval: float = 30,
+    ) -> None:
+        self._api = api
+        self._enabled = enabled
+        self._concurrency = concurrency
+        self._max_queued = max_queued
+        # Share of hourly API points prefetch may be done within
+        self._budget = budget
+        self._budget_check_interval = budget_check_interval
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[Tuple, asyncio.Task] = {}
+        self._budget_checked_at: Optional[float] = None
+        self._within_budget = False
+
+        self.fetched = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def schedule(
+        self, key: Tuple, fetch: Callable[[], Awaitable],
+    ) -> bool:
+        """Schedule a fetch unless it's already scheduled or queue is full."""
+        if not self._enabled or key in self._tasks:
+            return False
+        if len(self._tasks) >= self._max_queued:
+            self.dropped += 1
+            return False
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        task = asyncio.get_event_loop().create_task(self._prefetch(key, fetch))
+        # Tasks cancelled before they start never run their own cleanup
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        self._tasks[key] = task
+        return True
+
+    def cancel(self, log: Optional[str] = None):
+        """Cancel prefetch of a log, or of every log."""
+        for key, task in list(self._tasks.items()):
+            if log is None or key[0] == log:
+                task.cancel()
+
+    def close(self):
+        self.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self._enabled,
+            'queued': len(self._tasks),
+            'fetched': self.fetched,
+            'skipped': self.skipped,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
+
+    async def _prefetch(self, key: Tuple, fetch: Callable[[], Awaitable]):
+        try:
+            async with self._semaphore:
+                if not await self._check_budget():
+                    self.skipped += 1
+                    return
+                logger.info('Prefetching {0}'.format(key))
+                await fetch()
+                self.fetched += 1
+        except asyncio.CancelledError:
+            logger.info('Prefetch of {0} cancelled'.format(key))
+            raise
+        except Exception as ex:
+            # Nobody waits for it, the user request will fail on its own
+            self.failed += 1
+            logger.info('Prefetch of {0} failed: {1}'.format(key, ex))
+
+    async def _check_budget(self) -> bool:
+        now = time.monotonic()
+        if (
+            self._budget_checked_at is not None
+            and now - self._budget_checked_at < self._budget_check_interval
+        ):
+            return self._within_budget
+
+        self._budget_checked_at = now
+        rate_limit = await self._api.query_rate_limit()
+        self._within_budget = rate_limit is not None and (
+            rate_limit.points_spent_this_hour
+            < rate_limit.limit_per_hour * self._budget
+        )
+        if not self._within_budget:
+            logger.info('Prefetch is paused, API points budget is spent')
+        return self._within_budget
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 from esoraider_server.esologs.responses.core import EsoLogsDataClass
+from esoraider_server.esologs.responses.rate_limit import RateLimitData
 from esoraider_server.esologs.responses.report_data.report import Report
 from esoraider_server.esologs.responses.world_data.encounter import Encounter
 
@@ -22,3 +23,4 @@ class WorldData(EsoLogsDataClass):
 class BaseResponseData(EsoLogsDataClass):
     report_data: Optional[ReportData] = None
     world_data: Optional[WorldData] = None
+    rate_limit_data: Optional[RateLimitData] = None
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+from esoraider_server.esologs.responses.core import EsoLogsDataClass
+
+
+@dataclass
+class RateLimitData(EsoLogsDataClass):
+    limit_per_hour: int
+    points_spent_this_hour: float
+    points_reset_in: int
@@ -9,3 +9,77 @@ CLIENT_ID = os.environ.get('CLIENT_ID')
 CLIENT_SECRET = os.environ.get('CLIENT_SECRET')
 DEBUG = os.environ.get('DEBUG') == 'True'
 SHOW_ERROR_DETAILS = os.environ.get('SHOW_ERROR_DETAILS') == 'True'
+
+# Raw API responses cache
+CACHE_SIZE = int(os.environ.get('CACHE_SIZE', 1024))
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 600))
+# Logs & fight times change while a log is being uploaded live,
+# so they are cached for a short while only
+LOG_CACHE_TTL = float(os.environ.get('LOG_CACHE_TTL', 15))
+
+# Max number of fights analyzed at once for a char history
+HISTORY_CONCURRENCY = int(os.environ.get('HISTORY_CONCURRENCY', 4))
+
+# Worker processes for uptimes calculation, 0 means calculating in place
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0))
+# Max number of calculations running or waiting for a worker at once
+ANALYSIS_MAX_PENDING = int(os.environ.get('ANALYSIS_MAX_PENDING', 8))
+
+# Serialized reports cache, keyed by request and data catalog version
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 256))
+REPORT_CACHE_TTL = float(os.environ.get('REPORT_CACHE_TTL', 3600))
+
+# How long private & missing logs and fights are remembered as such
+NEGATIVE_CACHE_TTL = float(os.environ.get('NEGATIVE_CACHE_TTL', 60))
+
+# Seconds between checks of data files for changes, 0 disables watching.
+# Catalog is reloaded on SIGHUP either way
+CATALOG_WATCH_INTERVAL = float(os.environ.get('CATALOG_WATCH_INTERVAL', 0))
+
+# Background prefetch of fights & targets a user is likely to open next
+PREFETCH = os.environ.get('PREFETCH') == 'True'
+# Max number of prefetch requests made at once & waiting their turn
+PREFETCH_CONCURRENCY = int(os.environ.get('PREFETCH_CONCURRENCY', 2))
+PREFETCH_MAX_QUEUED = int(os.environ.get('PREFETCH_MAX_QUEUED', 32))
+# Prefetch is paused once this share of hourly API points is spent
+PREFETCH_BUDGET = float(os.environ.get('PREFETCH_BUDGET', 0.5))
+
+# Whole log analysis jobs running at once & fights of a job analyzed at once
+JOBS_CONCURRENCY = int(os.environ.get('JOBS_CONCURRENCY', 1))
+JOBS_FIGHT_CONCURRENCY = int(os.environ.get('JOBS_FIGHT_CONCURRENCY', 2))
+# SQLite file jobs are kept in to survive a restart, kept in memory if unset
+JOBS_DB = os.environ.get('JOBS_DB')
+# Seconds a running job isn't touched for to be taken as one of a process
+# gone away, and to be queued again
+JOBS_STALE_AFTER = float(os.environ.get('JOBS_STALE_AFTER', 300))
+
+# SQLite file uptime percentiles of analyzed reports are kept in,
+# kept in memory if unset
+PERCENTILES_DB = os.environ.get('PERCENTILES_DB')
+
+# Max number of char reports in a batch & reports of a batch built at once
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 50))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 4))
+
+# Response bodies smaller than this are sent uncompressed, compressed with
+# brotli if it's installed or gzip otherwise
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+# Max number of reports built at once, in total & for a single client.
+# A client can also have as many reports waiting for their turn
+ADMISSION_MAX_ACTIVE = int(os.environ.get('ADMISSION_MAX_ACTIVE', 8))
+ADMISSION_MAX_PER_CLIENT = int(os.environ.get('ADMISSION_MAX_PER_CLIENT', 4))
+# Max number of reports waiting & seconds they wait before a 429 response
+ADMISSION_MAX_QUEUED = int(os.environ.get('ADMISSION_MAX_QUEUED', 32))
+ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', 10))
+# Header with client address set by a reverse proxy, i.e. X-Forwarded-For.
+# Last address of the header is taken, the one the proxy appends
+ADMISSION_CLIENT_HEADER = os.environ.get('ADMISSION_CLIENT_HEADER', '')
+
+# Seconds a request waits for the API connection while starting or
+# reconnecting before a 503 response
+API_READY_TIMEOUT = float(os.environ.get('API_READY_TIMEOUT', 10))
+
+# Take buffs, debuffs & their stacks from paginated events instead of
+# tables & graphs
+UPTIMES_FROM_EVENTS = os.environ.get('UPTIMES_FROM_EVENTS') == 'True'
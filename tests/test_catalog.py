@@ -0,0 +1,19 @@
+import pytest
+
+from esoraider_server.data.buffs import BUFFS
+from esoraider_server.data.catalog import check_snapshot
+
+
+def test_snapshot_matches_data_modules():
+    assert check_snapshot() == []
+
+
+def test_lookup_by_id():
+    member = next(iter(BUFFS))
+
+    assert BUFFS(member.value.id) is member
+
+
+def test_missing_id_raises_stop_iteration():
+    with pytest.raises(StopIteration):
+        BUFFS(-1)
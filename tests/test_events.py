@@ -0,0 +1,106 @@
+import asyncio
+import re
+
+import pytest
+
+from gql.dsl import DSLSchema  # type: ignore
+from graphql import build_schema, print_ast  # type: ignore
+
+from esoraider_server.analysis.cadence import CastCadence
+from esoraider_server.esologs.api import (
+    ApiWrapper,
+    EventsPaginationException,
+)
+from esoraider_server.esologs.cache import ResponseCache
+from esoraider_server.esologs.consts import DataType
+
+SCHEMA = """
+scalar JSON
+
+type Query {
+    reportData: ReportData
+}
+
+type ReportData {
+    report(code: String): Report
+}
+
+type Report {
+    events(
+        startTime: Float
+        endTime: Float
+        dataType: String
+        hostilityType: String
+        sourceID: Int
+        targetID: Int
+        filterExpression: String
+    ): ReportEventPaginator
+}
+
+type ReportEventPaginator {
+    data: JSON
+    nextPageTimestamp: Float
+}
+"""
+
+
+def _cast(timestamp: int, ability_id: int) -> dict:
+    return {
+        'timestamp': timestamp,
+        'type': 'cast',
+        'sourceID': 1,
+        'abilityGameID': ability_id,
+    }
+
+
+class _Api(ApiWrapper):
+    def __init__(self, pages) -> None:
+        self._missing = ResponseCache(max_size=10, ttl=60)
+        self.ds = DSLSchema(build_schema(SCHEMA))
+        self.pages = list(pages)
+        self.starts = []
+
+    async def wait_connected(self, timeout: float):
+        return None
+
+    async def _execute(self, document, *args, **kwargs):
+        # Requests wrap the document with newer gql
+        document = getattr(document, 'document', document)
+        start = re.search(r'startTime: (-?[\d.]+)', print_ast(document))
+        self.starts.append(float(start.group(1)))
+        return {'reportData': {'report': {'events': self.pages.pop(0)}}}
+
+
+def test_overlapping_pages_are_fed_once():
+    api = _Api([
+        {
+            'data': [_cast(500, 1), _cast(1000, 2), _cast(2000, 3)],
+            'nextPageTimestamp': 2000,
+        },
+        {
+            'data': [_cast(2000, 3), _cast(2000, 4), _cast(3000, 5)],
+            'nextPageTimestamp': None,
+        },
+    ])
+    cadence = CastCadence([], {}, 1000, 4000)
+
+    asyncio.run(cadence.consume(
+        api.stream_events('log', DataType.CASTS, 1000, 4000),
+    ))
+
+    assert api.starts == [0, 2000]
+    assert cadence.casts == 4
+
+
+def test_stuck_pages_raise():
+    api = _Api([
+        {'data': [_cast(1000, 1)], 'nextPageTimestamp': 1000},
+        {'data': [_cast(1000, 1)], 'nextPageTimestamp': 1000},
+    ])
+    cadence = CastCadence([], {}, 1000, 4000)
+
+    with pytest.raises(EventsPaginationException):
+        asyncio.run(cadence.consume(
+            api.stream_events('log', DataType.CASTS, 1000, 4000),
+        ))
+    assert cadence.casts == 1
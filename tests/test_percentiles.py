@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from esoraider_server.analysis.percentiles import TDigest
+
+
+def _digest(values) -> TDigest:
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    return digest
+
+
+def test_uniform_quantiles():
+    values = list(range(10000))
+    random.Random(0).shuffle(values)
+    digest = _digest(values)
+
+    for value in (100, 2500, 5000, 7500, 9900):
+        assert digest.cdf(value) == pytest.approx(value / 10000, abs=0.01)
+    assert digest.cdf(-1) == 0
+    assert digest.cdf(10000) == 1
+
+
+def test_constant_values():
+    digest = _digest([80.0] * 12)
+
+    assert digest.cdf(79) == 0
+    assert digest.cdf(80) == 0.5
+    assert digest.cdf(90) == 1
+
+
+def test_everyone_at_full_uptime():
+    digest = _digest([100.0] * 50)
+
+    assert digest.cdf(0) == 0
+
+
+def test_empty_digest():
+    assert TDigest().cdf(50) != TDigest().cdf(50)  # NaN
+
+
+def test_json_round_trip():
+    rng = random.Random(1)
+    digest = _digest(rng.gauss(75, 15) for _ in range(5000))
+    restored = TDigest.from_json(digest.to_json())
+
+    assert restored.count == digest.count
+    assert restored.min == digest.min
+    assert restored.max == digest.max
+    for value in (40, 60, 75, 90):
+        assert restored.cdf(value) == digest.cdf(value)
@@ -0,0 +1,15 @@
+import pickle
+
+from esoraider_server.data.registry import CatalogRegistry
+from esoraider_server.data.stacks import STACKS
+
+
+def test_stacks_pickle_after_reload():
+    stack = STACKS.BAHSEIS_MANIA.value
+    registry = CatalogRegistry()
+
+    assert registry.reload()
+
+    unpickled = pickle.loads(pickle.dumps(stack))
+    assert unpickled == stack
+    assert unpickled.modifier(40) == 9
@@ -0,0 +1,27 @@
+from esoraider_server.analysis.window import clip_aura
+from esoraider_server.esologs.responses.report_data.effects import Aura, Band
+
+
+def test_bands_crossing_window_edges():
+    aura = Aura(
+        name='Major Brutality',
+        total_uptime=9000,
+        total_uses=4,
+        bands=[
+            Band(start_time=0, end_time=2000),
+            Band(start_time=3000, end_time=6000),
+            Band(start_time=7000, end_time=8000),
+            Band(start_time=9000, end_time=12000),
+        ],
+    )
+
+    clipped = clip_aura(aura, 4000, 10000)
+
+    assert clipped.bands == [
+        Band(start_time=4000, end_time=6000),
+        Band(start_time=7000, end_time=8000),
+        Band(start_time=9000, end_time=10000),
+    ]
+    assert clipped.total_uptime == 4000
+    # Band applied before the window is not a use within it
+    assert clipped.total_uses == 2